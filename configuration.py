@@ -6,7 +6,7 @@ Módulo de configuración del sistema de agua potable
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-from database import get_db_manager
+from database import get_db_manager, MIGRACIONES
 from typing import Dict, List
 
 class ConfigurationWindow:
@@ -434,6 +434,48 @@ class ConfigurationWindow:
             fg='#7f8c8d'
         )
         backup_info.pack(pady=(10, 0))
+        
+        self.create_maintenance_section(security_frame)
+    
+    def create_maintenance_section(self, parent):
+        """Crea la sección de mantenimiento de archivos y datos derivados"""
+        maintenance_frame = tk.LabelFrame(parent, text="Mantenimiento", font=('Arial', 12, 'bold'))
+        maintenance_frame.pack(fill=tk.X, padx=10, pady=10)
+        
+        maintenance_inner = tk.Frame(maintenance_frame)
+        maintenance_inner.pack(fill=tk.X, padx=10, pady=10)
+        
+        prune_btn = tk.Button(
+            maintenance_inner,
+            text="Limpiar Recibos",
+            command=self.prune_receipts,
+            bg='#3498db',
+            fg='white',
+            font=('Arial', 11, 'bold')
+        )
+        prune_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
+        rebuild_btn = tk.Button(
+            maintenance_inner,
+            text="Reconstruir Meses Pagados",
+            command=self.rebuild_paid_months,
+            bg='#8e44ad',
+            fg='white',
+            font=('Arial', 11, 'bold')
+        )
+        rebuild_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
+        maintenance_info = tk.Label(
+            maintenance_inner,
+            text="Limpiar elimina las copias de recibos que ya no corresponden a ningún pago. " +
+                 "Reconstruir vuelve a calcular los meses pagados de cada usuario a partir " +
+                 "de los pagos registrados.",
+            font=('Arial', 9),
+            fg='#7f8c8d',
+            wraplength=350,
+            justify=tk.LEFT
+        )
+        maintenance_info.pack(side=tk.LEFT)
     
     def create_main_buttons(self, parent):
         """Crea los botones principales"""
@@ -459,19 +501,19 @@ class ConfigurationWindow:
         try:
             db = get_db_manager()
             
-            # Cargar cuota mensual
-            monthly_fee = db.obtener_configuracion('cuota_mensual')
-            if monthly_fee:
-                self.current_fee_label.config(text=f"${float(monthly_fee):.2f}")
-            
-            # Cargar información del comité
+            # Cargar cuota mensual e información del comité de una sola vez
             committee_fields = [
                 'committee_name', 'committee_address', 'committee_phone',
                 'committee_president', 'committee_treasurer'
             ]
+            values = db.obtener_configuraciones(['cuota_mensual'] + committee_fields)
+            
+            monthly_fee = values['cuota_mensual']
+            if monthly_fee:
+                self.current_fee_label.config(text=f"${float(monthly_fee):.2f}")
             
             for field in committee_fields:
-                value = db.obtener_configuracion(field)
+                value = values[field]
                 if field in self.committee_vars and value:
                     self.committee_vars[field].set(value)
                     
@@ -511,10 +553,11 @@ class ConfigurationWindow:
         try:
             db = get_db_manager()
             
-            # Actualizar cada campo
-            for field_name, var in self.committee_vars.items():
-                value = var.get().strip()
-                db.actualizar_configuracion(field_name, value)
+            # Actualizar todos los campos en una sola transacción
+            db.actualizar_configuraciones({
+                field_name: var.get().strip()
+                for field_name, var in self.committee_vars.items()
+            })
             
             messagebox.showinfo("Éxito", "Información del comité actualizada correctamente")
             
@@ -698,6 +741,9 @@ class ConfigurationWindow:
             )
             
             if backup_path:
+                # Volcar el registro WAL para que el archivo esté completo
+                get_db_manager().checkpoint()
+                
                 # Copiar la base de datos
                 shutil.copy2("agua_potable.db", backup_path)
                 messagebox.showinfo("Éxito", f"Respaldo creado correctamente en:\n{backup_path}")
@@ -705,6 +751,37 @@ class ConfigurationWindow:
         except Exception as e:
             messagebox.showerror("Error", f"Error al crear respaldo: {str(e)}")
     
+    def prune_receipts(self):
+        """Elimina los archivos de recibos que ya no están registrados"""
+        try:
+            from receipt_generator import get_receipt_generator
+            
+            eliminados = get_receipt_generator().prune_receipts()
+            messagebox.showinfo("Limpieza Completa",
+                                f"Se eliminaron {eliminados} archivos de recibos obsoletos.")
+            
+        except Exception as e:
+            messagebox.showerror("Error", f"Error al limpiar recibos: {str(e)}")
+    
+    def rebuild_paid_months(self):
+        """Vuelve a calcular los meses pagados de todos los usuarios desde los pagos"""
+        if not messagebox.askyesno("Confirmar",
+                                   "¿Reconstruir los meses pagados de todos los usuarios?\n\n" +
+                                   "Úselo si el calendario de pagos no coincide con los pagos registrados."):
+            return
+        
+        try:
+            db = get_db_manager()
+            if db.reconstruir_estado_mensual():
+                # Los reportes y calendarios en memoria se calcularon con los datos anteriores
+                db.invalidar_caches()
+                messagebox.showinfo("Éxito", "Meses pagados reconstruidos correctamente")
+            else:
+                messagebox.showerror("Error", "No se pudieron reconstruir los meses pagados")
+                
+        except Exception as e:
+            messagebox.showerror("Error", f"Error al reconstruir meses pagados: {str(e)}")
+    
     def restore_backup(self):
         """Restaura un respaldo de la base de datos"""
         try:
@@ -730,8 +807,24 @@ class ConfigurationWindow:
                 if messagebox.askyesno("Última Confirmación",
                                      "¿Confirma restaurar el respaldo?\n\n" +
                                      "Esta acción NO se puede deshacer."):
+                    # Volcar el WAL y liberar las conexiones del pool antes de
+                    # reemplazar el archivo
+                    db = get_db_manager()
+                    db.checkpoint()
+                    db.close()
+                    db.invalidar_caches()
+                    
                     # Restaurar la base de datos
                     shutil.copy2(backup_path, "agua_potable.db")
+                    
+                    # Un respaldo anterior puede no tener las tablas de las
+                    # migraciones recientes (p. ej. estado_mensual)
+                    if db.aplicar_migraciones() < MIGRACIONES[-1][0]:
+                        messagebox.showwarning("Advertencia",
+                                               "El respaldo se restauró, pero no se pudo actualizar " +
+                                               "su estructura. Reinicie la aplicación.")
+                        return
+                    
                     messagebox.showinfo("Éxito", 
                                       "Respaldo restaurado correctamente.\n\n" +
                                       "Se recomienda reiniciar la aplicación.")
@@ -4,42 +4,222 @@
 Utilidad para importar datos desde CSV al sistema de agua potable
 """
 
+import codecs
 import csv
 import os
+import queue
+import threading
+import time
+from typing import Callable, Iterator, List, Optional, Tuple
 from database import get_db_manager
 from tkinter import messagebox
 import tkinter as tk
-from tkinter import filedialog
+from tkinter import filedialog, ttk
+
+# Filas que se leen y se insertan por transacción durante las importaciones
+TAMANO_BLOQUE = 500
+
+# Caracteres leídos al inicio del archivo para detectar el delimitador
+TAMANO_MUESTRA = 64 * 1024
+
+# Delimitadores aceptados (Excel en español exporta con ';')
+DELIMITADORES = ',;\t|'
+
+# Campos de usuario que se comparan al combinar con los datos existentes
+CAMPOS_USUARIO = ('nombre', 'direccion', 'telefono', 'email')
+
+
+def detectar_codificacion(csv_path: str) -> str:
+    """
+    Detecta la codificación de un archivo CSV
+    
+    Primero se revisa la marca BOM; si no existe, el archivo se valida como
+    UTF-8 leyéndolo por partes (memoria constante). Si no es UTF-8 válido se
+    asume cp1252, como exporta Excel en Windows, y latin-1 como último recurso.
+    
+    Args:
+        csv_path: Ruta al archivo CSV
+        
+    Returns:
+        str: Nombre de la codificación para open()
+    """
+    with open(csv_path, 'rb') as file:
+        inicio = file.read(4)
+        if inicio.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        if inicio.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            return 'utf-16'
+        
+        for encoding in ('utf-8', 'cp1252'):
+            file.seek(0)
+            decoder = codecs.getincrementaldecoder(encoding)()
+            try:
+                while True:
+                    datos = file.read(1024 * 1024)
+                    if not datos:
+                        decoder.decode(b'', final=True)
+                        return encoding
+                    decoder.decode(datos)
+            except UnicodeDecodeError:
+                continue
+    
+    # latin-1 acepta cualquier secuencia de bytes
+    return 'latin-1'
+
+
+def detectar_delimitador(muestra: str) -> str:
+    """
+    Detecta el delimitador de un CSV a partir de una muestra de texto
+    
+    Args:
+        muestra: Texto inicial del archivo
+        
+    Returns:
+        str: Delimitador detectado (',' si no se puede determinar)
+    """
+    # Descartar la última línea, que puede estar incompleta
+    lineas = muestra.splitlines()
+    if len(lineas) > 1 and not muestra.endswith(('\n', '\r')):
+        lineas = lineas[:-1]
+    lineas = lineas[:100]
+    
+    if not lineas:
+        return ','
+    
+    try:
+        return csv.Sniffer().sniff('\n'.join(lineas), delimiters=DELIMITADORES).delimiter
+    except csv.Error:
+        pass
+    
+    # Si el sniffer no decide, usar el delimitador más frecuente del encabezado
+    conteos = {delimitador: lineas[0].count(delimitador) for delimitador in DELIMITADORES}
+    mejor = max(conteos, key=conteos.get)
+    return mejor if conteos[mejor] else ','
+
+
+class ChunkedCSVReader:
+    """
+    Lector de CSV por bloques con detección de codificación y delimitador
+    
+    Las filas se leen de forma continua y se entregan en bloques de tamaño
+    fijo, por lo que la memoria usada no depende del tamaño del archivo.
+    Se usa como administrador de contexto:
+    
+        with ChunkedCSVReader(ruta) as lector:
+            for bloque in lector.bloques():
+                for row_num, row in bloque:
+                    ...
+    """
+    
+    def __init__(self, csv_path: str, tamano_bloque: int = TAMANO_BLOQUE,
+                 encoding: Optional[str] = None):
+        """
+        Args:
+            csv_path: Ruta al archivo CSV
+            tamano_bloque: Filas por bloque
+            encoding: Codificación a usar (se detecta si es None)
+        """
+        self.csv_path = csv_path
+        self.tamano_bloque = tamano_bloque
+        self.encoding = encoding or detectar_codificacion(csv_path)
+        self.bytes_totales = os.path.getsize(csv_path)
+        self.delimiter = ','
+        self.fieldnames: List[str] = []
+        self._file = None
+        self._reader = None
+    
+    def __enter__(self):
+        self._file = open(self.csv_path, 'r', encoding=self.encoding, newline='')
+        self.delimiter = detectar_delimitador(self._file.read(TAMANO_MUESTRA))
+        self._file.seek(0)
+        
+        self._reader = csv.DictReader(self._file, delimiter=self.delimiter)
+        self.fieldnames = self._reader.fieldnames or []
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._file.close()
+        return False
+    
+    def bytes_leidos(self) -> int:
+        """Bytes del archivo consumidos hasta el momento"""
+        return self._file.buffer.tell()
+    
+    def bloques(self) -> Iterator[List[Tuple[int, dict]]]:
+        """
+        Recorre el archivo en bloques de filas
+        
+        Yields:
+            List[Tuple[int, dict]]: Filas del bloque como (número de fila, fila)
+        """
+        bloque = []
+        for row_num, row in enumerate(self._reader, start=2):  # Empezar en 2 por el header
+            bloque.append((row_num, row))
+            if len(bloque) >= self.tamano_bloque:
+                yield bloque
+                bloque = []
+        
+        if bloque:
+            yield bloque
+
 
 class CSVImporter:
     def __init__(self):
         self.db = get_db_manager()
+        # Estadísticas de la última importación (filas, tiempo, velocidad)
+        self.estadisticas = {}
         
-    def import_users_from_csv(self, csv_path: str) -> tuple:
+    def import_users_from_csv(self, csv_path: str, tamano_bloque: int = TAMANO_BLOQUE,
+                              progreso: Optional[Callable[[int, int, int], None]] = None,
+                              cancelar: Optional[threading.Event] = None,
+                              simular: bool = False, combinar: bool = False) -> tuple:
         """
         Importa usuarios desde un archivo CSV
         
+        El archivo se lee con ChunkedCSVReader en bloques de tamano_bloque
+        filas; los números ya registrados se detectan contra un conjunto
+        precargado y los usuarios válidos de cada bloque se insertan en una
+        sola transacción. Las estadísticas de tiempo quedan en
+        self.estadisticas.
+        
+        Si se cancela, el bloque pendiente se descarta y los bloques
+        anteriores permanecen guardados.
+        
+        Con simular=True el archivo se valida completo contra una copia en
+        memoria de los usuarios sin escribir en la base de datos; en
+        self.estadisticas quedan los usuarios nuevos, los existentes con y
+        sin cambios y los números repetidos dentro del archivo.
+        
+        Con combinar=True los números existentes no son error: los usuarios
+        se insertan o actualizan con ON CONFLICT(numero), comparando cada
+        fila contra un mapa precargado para escribir sólo las que cambiaron.
+        Las columnas que no vienen en el archivo conservan su valor actual.
+        
         Args:
             csv_path: Ruta al archivo CSV
+            tamano_bloque: Filas por transacción
+            progreso: Función opcional llamada con (filas, bytes_leidos, bytes_totales)
+            cancelar: Evento opcional que detiene la importación al activarse
+            simular: Solo validar el archivo, sin guardar
+            combinar: Actualizar los usuarios existentes en lugar de rechazarlos
             
         Returns:
-            tuple: (usuarios_importados, errores)
+            tuple: (usuarios insertados o actualizados (o que lo serían), errores)
         """
         if not os.path.exists(csv_path):
             return 0, ["Archivo no encontrado"]
         
         usuarios_importados = 0
         errores = []
+        filas_leidas = 0
+        cancelado = False
+        diferencias = {'actualizados': 0, 'sin_cambios': 0, 'duplicados': 0}
+        inicio = time.perf_counter()
         
         try:
-            with open(csv_path, 'r', encoding='utf-8', newline='') as file:
-                # Intentar detectar el delimitador
-                sample = file.read(1024)
-                file.seek(0)
-                sniffer = csv.Sniffer()
-                delimiter = sniffer.sniff(sample).delimiter
-                
-                reader = csv.DictReader(file, delimiter=delimiter)
+            with ChunkedCSVReader(csv_path, tamano_bloque) as lector:
+                if not lector.fieldnames:
+                    return 0, ["El archivo CSV está vacío"]
                 
                 # Mapear nombres de columnas comunes
                 field_mapping = {
@@ -51,78 +231,201 @@ class CSVImporter:
                 }
                 
                 # Obtener los nombres reales de las columnas
-                columns = [col.lower().strip() for col in reader.fieldnames]
+                columns = [col.lower().strip() for col in lector.fieldnames]
                 mapped_fields = {}
                 
                 for field, possible_names in field_mapping.items():
                     for possible in possible_names:
                         if possible in columns:
-                            mapped_fields[field] = reader.fieldnames[columns.index(possible)]
+                            mapped_fields[field] = lector.fieldnames[columns.index(possible)]
                             break
                 
                 # Verificar que al menos tengamos número y nombre
                 if 'numero' not in mapped_fields or 'nombre' not in mapped_fields:
                     return 0, ["El archivo CSV debe contener al menos las columnas 'numero' y 'nombre'"]
                 
-                for row_num, row in enumerate(reader, start=2):  # Empezar en 2 por el header
-                    try:
-                        # Extraer datos
-                        numero_str = str(row.get(mapped_fields['numero'], '')).strip()
-                        nombre = str(row.get(mapped_fields['nombre'], '')).strip()
-                        direccion = str(row.get(mapped_fields.get('direccion', ''), '')).strip()
-                        telefono = str(row.get(mapped_fields.get('telefono', ''), '')).strip()
-                        email = str(row.get(mapped_fields.get('email', ''), '')).strip()
-                        
-                        # Validar datos obligatorios
-                        if not numero_str or not nombre:
-                            errores.append(f"Fila {row_num}: Número y nombre son obligatorios")
-                            continue
-                        
+                # Números ya registrados y los vistos en el archivo para
+                # detectar duplicados sin consultar la base de datos
+                numeros_existentes = self.db.obtener_numeros_usuarios()
+                numeros_archivo = set()
+                
+                # Datos actuales por número para detectar cambios
+                datos_existentes = None
+                if simular or combinar:
+                    datos_existentes = {
+                        usuario['numero']: tuple(usuario.get(campo) or '' for campo in CAMPOS_USUARIO)
+                        for usuario in self.db.directorio_usuarios().todos()
+                    }
+                
+                for filas in lector.bloques():
+                    filas_leidas += len(filas)
+                    bloque = []
+                    
+                    for row_num, row in filas:
                         try:
-                            numero = int(numero_str)
-                        except ValueError:
-                            errores.append(f"Fila {row_num}: Número '{numero_str}' no es válido")
-                            continue
-                        
-                        # Intentar crear el usuario
-                        if self.db.crear_usuario(numero, nombre, direccion, telefono, email):
-                            usuarios_importados += 1
-                        else:
-                            errores.append(f"Fila {row_num}: Ya existe un usuario con el número {numero}")
+                            # Extraer datos
+                            numero_str = str(row.get(mapped_fields['numero'], '')).strip()
+                            nombre = str(row.get(mapped_fields['nombre'], '')).strip()
+                            direccion = str(row.get(mapped_fields.get('direccion', ''), '')).strip()
+                            telefono = str(row.get(mapped_fields.get('telefono', ''), '')).strip()
+                            email = str(row.get(mapped_fields.get('email', ''), '')).strip()
+                            
+                            # Validar datos obligatorios
+                            if not numero_str or not nombre:
+                                errores.append(f"Fila {row_num}: Número y nombre son obligatorios")
+                                continue
+                            
+                            try:
+                                numero = int(numero_str)
+                            except ValueError:
+                                errores.append(f"Fila {row_num}: Número '{numero_str}' no es válido")
+                                continue
+                            
+                            if numero in numeros_archivo:
+                                diferencias['duplicados'] += 1
+                                errores.append(f"Fila {row_num}: El número {numero} está repetido en el archivo")
+                                continue
+                            numeros_archivo.add(numero)
                             
-                    except Exception as e:
-                        errores.append(f"Fila {row_num}: Error al procesar - {str(e)}")
+                            datos = (nombre, direccion, telefono, email)
+                            existente = numero in numeros_existentes
+                            
+                            if existente:
+                                if not combinar:
+                                    errores.append(f"Fila {row_num}: Ya existe un usuario con el número {numero}")
+                                if datos_existentes is None:
+                                    continue
+                                
+                                # Las columnas ausentes del archivo conservan su valor
+                                actuales = datos_existentes[numero]
+                                datos = tuple(
+                                    valor if campo in mapped_fields else actual
+                                    for campo, valor, actual in zip(CAMPOS_USUARIO, datos, actuales)
+                                )
+                                if datos == actuales:
+                                    diferencias['sin_cambios'] += 1
+                                    continue
+                                if not combinar:
+                                    diferencias['actualizados'] += 1
+                                    continue
+                            
+                            bloque.append((row_num, (numero,) + datos, existente))
+                                
+                        except Exception as e:
+                            errores.append(f"Fila {row_num}: Error al procesar - {str(e)}")
+                    
+                    if cancelar is not None and cancelar.is_set():
+                        cancelado = True
+                        self._registrar_cancelacion(bloque, errores)
+                        break
+                    
+                    if simular:
+                        guardados = len(bloque)
+                    else:
+                        guardados = self._guardar_bloque_usuarios(bloque, errores, combinar)
+                    
+                    if guardados:
+                        usuarios_importados += guardados
+                        diferencias['actualizados'] += sum(1 for _, _, existente in bloque if existente)
+                    if progreso:
+                        progreso(filas_leidas, lector.bytes_leidos(), lector.bytes_totales)
                         
         except Exception as e:
             errores.append(f"Error al leer el archivo CSV: {str(e)}")
         
+        self._registrar_estadisticas(filas_leidas, usuarios_importados, errores, inicio)
+        self.estadisticas['cancelado'] = cancelado
+        self.estadisticas['simulacion'] = simular
+        self.estadisticas['combinar'] = combinar
+        if simular or combinar:
+            nuevos = usuarios_importados - (diferencias['actualizados'] if combinar else 0)
+            self.estadisticas['nuevos'] = nuevos
+            self.estadisticas.update(diferencias)
         return usuarios_importados, errores
     
-    def import_payments_from_csv(self, csv_path: str, year: int) -> tuple:
+    def _guardar_bloque_usuarios(self, bloque: list, errores: list, combinar: bool = False) -> int:
+        """Inserta (o combina) un bloque de usuarios validados en una sola transacción"""
+        if not bloque:
+            return 0
+        
+        usuarios = [usuario for _, usuario, _ in bloque]
+        try:
+            if combinar:
+                return self.db.combinar_usuarios_lote(usuarios)
+            return self.db.insertar_usuarios_lote(usuarios)
+        except Exception as e:
+            errores.append(f"Filas {bloque[0][0]}-{bloque[-1][0]}: Error al guardar - {str(e)}")
+            return 0
+    
+    def _registrar_cancelacion(self, bloque: list, errores: list):
+        """Registra la cancelación descartando el bloque que no se llegó a guardar"""
+        mensaje = "Importación cancelada por el usuario; los bloques anteriores ya quedaron guardados"
+        if bloque:
+            mensaje += f" (se descartaron {len(bloque)} filas pendientes desde la fila {bloque[0][0]})"
+        errores.append(mensaje)
+    
+    def _registrar_estadisticas(self, filas_leidas: int, importados: int, errores: list,
+                                inicio: float):
+        """Guarda las estadísticas de tiempo de la última importación"""
+        segundos = time.perf_counter() - inicio
+        self.estadisticas = {
+            'filas_leidas': filas_leidas,
+            'importados': importados,
+            'errores': len(errores),
+            'segundos': segundos,
+            'filas_por_segundo': filas_leidas / segundos if segundos > 0 else 0.0,
+        }
+    
+    def import_payments_from_csv(self, csv_path: str, year: int,
+                                 tamano_bloque: int = TAMANO_BLOQUE,
+                                 progreso: Optional[Callable[[int, int, int], None]] = None,
+                                 cancelar: Optional[threading.Event] = None,
+                                 simular: bool = False) -> tuple:
         """
         Importa pagos desde un archivo CSV
         
+        Los números de usuario se resuelven con un mapa cargado en una sola
+        consulta y los meses ya pagados del año se omiten comparándolos con
+        un conjunto precargado. Los pagos se registran en bloques de
+        tamano_bloque filas por transacción.
+        
+        Si se cancela, el bloque pendiente se descarta y los bloques
+        anteriores permanecen guardados.
+        
+        Con simular=True el archivo se valida completo contra los datos
+        precargados sin escribir en la base de datos; en self.estadisticas
+        quedan los pagos y meses nuevos y los meses que ya estaban pagados.
+        
         Args:
             csv_path: Ruta al archivo CSV
             year: Año de los pagos
+            tamano_bloque: Filas por transacción
+            progreso: Función opcional llamada con (filas, bytes_leidos, bytes_totales)
+            cancelar: Evento opcional que detiene la importación al activarse
+            simular: Solo validar el archivo, sin guardar
             
         Returns:
-            tuple: (pagos_importados, errores)
+            tuple: (pagos_importados o que se importarían, errores)
         """
         if not os.path.exists(csv_path):
             return 0, ["Archivo no encontrado"]
         
         pagos_importados = 0
         errores = []
+        filas_leidas = 0
+        meses_omitidos = 0
+        meses_nuevos = 0
+        cancelado = False
+        inicio = time.perf_counter()
         
         try:
-            with open(csv_path, 'r', encoding='utf-8', newline='') as file:
-                reader = csv.DictReader(file)
-                columns = [col.lower().strip() for col in reader.fieldnames]
+            with ChunkedCSVReader(csv_path, tamano_bloque) as lector:
+                if not lector.fieldnames:
+                    return 0, ["El archivo CSV está vacío"]
                 
                 # Buscar columna de número de usuario
                 numero_col = None
-                for col in reader.fieldnames:
+                for col in lector.fieldnames:
                     if col.lower().strip() in ['numero', 'num', 'usuario', 'id']:
                         numero_col = col
                         break
@@ -133,62 +436,107 @@ class CSVImporter:
                 # Buscar columnas de meses (1-12)
                 month_cols = {}
                 for i in range(1, 13):
-                    for col in reader.fieldnames:
+                    for col in lector.fieldnames:
                         col_lower = col.lower().strip()
                         if (str(i) in col_lower and any(word in col_lower for word in ['mes', 'month', str(i)])) or \
                            col_lower == str(i):
                             month_cols[i] = col
                             break
                 
-                for row_num, row in enumerate(reader, start=2):
-                    try:
-                        # Obtener número de usuario
-                        numero_str = str(row.get(numero_col, '')).strip()
-                        if not numero_str:
-                            errores.append(f"Fila {row_num}: Número de usuario vacío")
-                            continue
-                        
+                # Datos precargados: número -> ID y meses ya pagados del año
+                usuarios_por_numero = self.db.obtener_mapa_numeros_usuarios()
+                meses_pagados_anio = self.db.obtener_meses_pagados_anio(year)
+                observaciones = f"Importado desde CSV: {os.path.basename(csv_path)}"
+                
+                for filas in lector.bloques():
+                    filas_leidas += len(filas)
+                    bloque = []
+                    
+                    for row_num, row in filas:
                         try:
-                            numero = int(numero_str)
-                        except ValueError:
-                            errores.append(f"Fila {row_num}: Número '{numero_str}' no es válido")
-                            continue
-                        
-                        # Buscar el usuario
-                        usuario = self.db.buscar_usuario_por_numero(numero)
-                        if not usuario:
-                            errores.append(f"Fila {row_num}: No existe usuario con número {numero}")
-                            continue
-                        
-                        # Identificar meses pagados
-                        meses_pagados = []
-                        for mes, col in month_cols.items():
-                            valor = str(row.get(col, '')).strip().lower()
-                            # Considerar como pagado si hay un valor que indique pago
-                            if valor and valor not in ['0', 'no', 'false', '', 'n']:
-                                meses_pagados.append(mes)
-                        
-                        if meses_pagados:
-                            # Registrar el pago
-                            pago_id = self.db.registrar_pago(
-                                usuario_id=usuario['id'],
-                                meses_pagados=meses_pagados,
-                                anio=year,
-                                observaciones=f"Importado desde CSV: {os.path.basename(csv_path)}"
-                            )
+                            # Obtener número de usuario
+                            numero_str = str(row.get(numero_col, '')).strip()
+                            if not numero_str:
+                                errores.append(f"Fila {row_num}: Número de usuario vacío")
+                                continue
                             
-                            if pago_id > 0:
-                                pagos_importados += 1
-                            else:
-                                errores.append(f"Fila {row_num}: Error al registrar pago para usuario {numero}")
-                        
-                    except Exception as e:
-                        errores.append(f"Fila {row_num}: Error al procesar - {str(e)}")
+                            try:
+                                numero = int(numero_str)
+                            except ValueError:
+                                errores.append(f"Fila {row_num}: Número '{numero_str}' no es válido")
+                                continue
+                            
+                            # Buscar el usuario
+                            usuario_id = usuarios_por_numero.get(numero)
+                            if usuario_id is None:
+                                errores.append(f"Fila {row_num}: No existe usuario con número {numero}")
+                                continue
+                            
+                            # Identificar meses pagados que aún no estén registrados
+                            meses_pagados = []
+                            for mes, col in month_cols.items():
+                                valor = str(row.get(col, '')).strip().lower()
+                                # Considerar como pagado si hay un valor que indique pago
+                                if valor and valor not in ['0', 'no', 'false', '', 'n']:
+                                    if (usuario_id, mes) in meses_pagados_anio:
+                                        meses_omitidos += 1
+                                    else:
+                                        meses_pagados.append(mes)
+                            
+                            if meses_pagados:
+                                meses_nuevos += len(meses_pagados)
+                                meses_pagados_anio.update((usuario_id, mes) for mes in meses_pagados)
+                                bloque.append((row_num, numero, {
+                                    'usuario_id': usuario_id,
+                                    'meses_pagados': meses_pagados,
+                                    'anio': year,
+                                    'observaciones': observaciones,
+                                }))
+                            
+                        except Exception as e:
+                            errores.append(f"Fila {row_num}: Error al procesar - {str(e)}")
+                    
+                    if cancelar is not None and cancelar.is_set():
+                        cancelado = True
+                        self._registrar_cancelacion(bloque, errores)
+                        break
+                    
+                    if simular:
+                        pagos_importados += len(bloque)
+                    else:
+                        pagos_importados += self._guardar_bloque_pagos(bloque, errores)
+                    if progreso:
+                        progreso(filas_leidas, lector.bytes_leidos(), lector.bytes_totales)
                         
         except Exception as e:
             errores.append(f"Error al leer el archivo CSV: {str(e)}")
         
+        self._registrar_estadisticas(filas_leidas, pagos_importados, errores, inicio)
+        self.estadisticas['meses_omitidos'] = meses_omitidos
+        self.estadisticas['cancelado'] = cancelado
+        self.estadisticas['simulacion'] = simular
+        if simular:
+            self.estadisticas['nuevos'] = pagos_importados
+            self.estadisticas['meses_nuevos'] = meses_nuevos
+            self.estadisticas['duplicados'] = meses_omitidos
         return pagos_importados, errores
+    
+    def _guardar_bloque_pagos(self, bloque: list, errores: list) -> int:
+        """Registra un bloque de pagos en una sola transacción"""
+        if not bloque:
+            return 0
+        
+        resultados = self.db.registrar_pagos_lote(
+            [pago for _, _, pago in bloque], perfil='bulk-import'
+        )
+        
+        importados = 0
+        for (row_num, numero, _), (pago_id, error) in zip(bloque, resultados):
+            if pago_id > 0:
+                importados += 1
+            else:
+                errores.append(f"Fila {row_num}: Error al registrar pago para usuario {numero} - {error}")
+        return importados
 
 
 class ImporterGUI:
@@ -199,7 +547,17 @@ class ImporterGUI:
         self.root.resizable(True, True)
         
         self.importer = CSVImporter()
+        
+        # Estado de la importación en segundo plano
+        self.cola_eventos = queue.Queue()
+        self.cancelar_evento = None
+        self.hilo_importacion = None
+        self.inicio_importacion = 0.0
+        
         self.setup_ui()
+        
+        # Al cerrar se cancela la importación en curso
+        self.root.protocol("WM_DELETE_WINDOW", self.close_window)
     
     def setup_ui(self):
         """Configura la interfaz de usuario"""
@@ -214,7 +572,17 @@ class ImporterGUI:
             font=('Arial', 16, 'bold'),
             fg='#2c3e50'
         )
-        title_label.pack(pady=(0, 20))
+        title_label.pack(pady=(0, 10))
+        
+        # Modo simulación: validar sin guardar
+        self.simular_var = tk.BooleanVar(value=False)
+        simular_check = tk.Checkbutton(
+            main_frame,
+            text="Validar (simulación): revisar el archivo sin guardar cambios",
+            variable=self.simular_var,
+            font=('Arial', 10)
+        )
+        simular_check.pack(anchor='w', pady=(0, 10))
         
         # Sección importar usuarios
         self.create_users_import_section(main_frame)
@@ -226,6 +594,9 @@ class ImporterGUI:
         # Sección importar pagos
         self.create_payments_import_section(main_frame)
         
+        # Avance de la importación en curso
+        self.create_progress_section(main_frame)
+        
         # Área de resultados
         self.create_results_area(main_frame)
         
@@ -233,7 +604,7 @@ class ImporterGUI:
         close_btn = tk.Button(
             main_frame,
             text="Cerrar",
-            command=self.root.destroy,
+            command=self.close_window,
             bg='#95a5a6',
             fg='white',
             font=('Arial', 12)
@@ -258,7 +629,7 @@ class ImporterGUI:
         button_frame = tk.Frame(users_frame)
         button_frame.pack(fill=tk.X, padx=10, pady=10)
         
-        select_users_btn = tk.Button(
+        self.select_users_btn = tk.Button(
             button_frame,
             text="Seleccionar Archivo CSV de Usuarios",
             command=self.import_users,
@@ -266,7 +637,16 @@ class ImporterGUI:
             fg='white',
             font=('Arial', 11, 'bold')
         )
-        select_users_btn.pack(side=tk.LEFT)
+        self.select_users_btn.pack(side=tk.LEFT)
+        
+        self.combinar_var = tk.BooleanVar(value=False)
+        combinar_check = tk.Checkbutton(
+            button_frame,
+            text="Actualizar usuarios existentes",
+            variable=self.combinar_var,
+            font=('Arial', 10)
+        )
+        combinar_check.pack(side=tk.LEFT, padx=(15, 0))
     
     def create_payments_import_section(self, parent):
         """Crea la sección de importación de pagos"""
@@ -293,7 +673,7 @@ class ImporterGUI:
         year_entry = tk.Entry(controls_frame, textvariable=self.year_var, width=8, font=('Arial', 10))
         year_entry.pack(side=tk.LEFT, padx=(5, 15))
         
-        select_payments_btn = tk.Button(
+        self.select_payments_btn = tk.Button(
             controls_frame,
             text="Seleccionar Archivo CSV de Pagos",
             command=self.import_payments,
@@ -301,7 +681,32 @@ class ImporterGUI:
             fg='white',
             font=('Arial', 11, 'bold')
         )
-        select_payments_btn.pack(side=tk.LEFT)
+        self.select_payments_btn.pack(side=tk.LEFT)
+    
+    def create_progress_section(self, parent):
+        """Crea la barra de progreso y el botón para cancelar"""
+        progress_frame = tk.Frame(parent)
+        progress_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        self.progress_bar = ttk.Progressbar(progress_frame, mode='determinate', maximum=100)
+        self.progress_bar.pack(fill=tk.X)
+        
+        status_frame = tk.Frame(progress_frame)
+        status_frame.pack(fill=tk.X, pady=(5, 0))
+        
+        self.progress_label = tk.Label(status_frame, text="", font=('Arial', 9), fg='#7f8c8d')
+        self.progress_label.pack(side=tk.LEFT)
+        
+        self.cancel_btn = tk.Button(
+            status_frame,
+            text="Cancelar",
+            command=self.cancel_import,
+            bg='#e74c3c',
+            fg='white',
+            font=('Arial', 10),
+            state=tk.DISABLED
+        )
+        self.cancel_btn.pack(side=tk.RIGHT)
     
     def create_results_area(self, parent):
         """Crea el área de resultados"""
@@ -335,23 +740,8 @@ class ImporterGUI:
             return
         
         self.add_result(f"Importando usuarios desde: {os.path.basename(file_path)}")
-        
-        try:
-            usuarios_importados, errores = self.importer.import_users_from_csv(file_path)
-            
-            self.add_result(f"✓ Usuarios importados exitosamente: {usuarios_importados}")
-            
-            if errores:
-                self.add_result(f"⚠ Errores encontrados ({len(errores)}):")
-                for error in errores[:10]:  # Mostrar máximo 10 errores
-                    self.add_result(f"  • {error}")
-                if len(errores) > 10:
-                    self.add_result(f"  ... y {len(errores) - 10} errores más")
-            
-            self.add_result("-" * 50)
-            
-        except Exception as e:
-            self.add_result(f"✗ Error al importar usuarios: {str(e)}")
+        self.start_import('usuarios', self.importer.import_users_from_csv, file_path,
+                          combinar=self.combinar_var.get())
     
     def import_payments(self):
         """Importa pagos desde CSV"""
@@ -375,23 +765,173 @@ class ImporterGUI:
             return
         
         self.add_result(f"Importando pagos desde: {os.path.basename(file_path)} (Año: {year})")
+        self.start_import('pagos', self.importer.import_payments_from_csv, file_path, year)
+    
+    def start_import(self, tipo: str, funcion, *args, **kwargs):
+        """
+        Ejecuta una importación en un hilo de trabajo
+        
+        El hilo sólo se comunica con la interfaz a través de self.cola_eventos,
+        que se vacía periódicamente desde el hilo de Tk con root.after.
+        
+        Args:
+            tipo: 'usuarios' o 'pagos'
+            funcion: Método del importador a ejecutar
+            *args: Argumentos posicionales para la función
+            **kwargs: Argumentos adicionales para la función
+        """
+        if self.hilo_importacion is not None and self.hilo_importacion.is_alive():
+            messagebox.showwarning("Importación en curso", "Espere a que termine la importación actual")
+            return
+        
+        self.cancelar_evento = threading.Event()
+        self.inicio_importacion = time.perf_counter()
+        simular = self.simular_var.get()
+        self.set_importing(True)
+        
+        def progreso(filas, bytes_leidos, bytes_totales):
+            self.cola_eventos.put(('progreso', filas, bytes_leidos, bytes_totales))
+        
+        def trabajo():
+            try:
+                importados, errores = funcion(*args, progreso=progreso,
+                                              cancelar=self.cancelar_evento,
+                                              simular=simular, **kwargs)
+                self.cola_eventos.put(('fin', tipo, importados, errores))
+            except Exception as e:
+                self.cola_eventos.put(('error', tipo, str(e)))
+        
+        self.hilo_importacion = threading.Thread(target=trabajo, daemon=True)
+        self.hilo_importacion.start()
+        self.root.after(100, self.process_events)
+    
+    def process_events(self):
+        """Procesa los eventos enviados por el hilo de importación"""
+        terminado = False
+        ultimo_progreso = None
         
         try:
-            pagos_importados, errores = self.importer.import_payments_from_csv(file_path, year)
-            
-            self.add_result(f"✓ Pagos importados exitosamente: {pagos_importados}")
-            
-            if errores:
-                self.add_result(f"⚠ Errores encontrados ({len(errores)}):")
-                for error in errores[:10]:  # Mostrar máximo 10 errores
-                    self.add_result(f"  • {error}")
-                if len(errores) > 10:
-                    self.add_result(f"  ... y {len(errores) - 10} errores más")
-            
-            self.add_result("-" * 50)
-            
-        except Exception as e:
-            self.add_result(f"✗ Error al importar pagos: {str(e)}")
+            while True:
+                evento = self.cola_eventos.get_nowait()
+                if evento[0] == 'progreso':
+                    # Sólo interesa el avance más reciente
+                    ultimo_progreso = evento
+                elif evento[0] == 'fin':
+                    self.show_import_results(*evento[1:])
+                    terminado = True
+                elif evento[0] == 'error':
+                    self.add_result(f"✗ Error al importar {evento[1]}: {evento[2]}")
+                    self.add_result("-" * 50)
+                    terminado = True
+        except queue.Empty:
+            pass
+        
+        if terminado:
+            self.set_importing(False)
+        else:
+            if ultimo_progreso:
+                self.update_progress(*ultimo_progreso[1:])
+            self.root.after(100, self.process_events)
+    
+    def update_progress(self, filas: int, bytes_leidos: int, bytes_totales: int):
+        """Actualiza la barra de progreso con la velocidad y el tiempo restante"""
+        fraccion = bytes_leidos / bytes_totales if bytes_totales else 0.0
+        self.progress_bar['value'] = min(fraccion, 1.0) * 100
+        
+        segundos = time.perf_counter() - self.inicio_importacion
+        velocidad = filas / segundos if segundos > 0 else 0.0
+        texto = f"{filas} filas - {velocidad:.0f} filas/s"
+        if 0 < fraccion < 1:
+            restante = segundos * (1 - fraccion) / fraccion
+            texto += f" - quedan aprox. {restante:.0f} s"
+        self.progress_label.config(text=texto)
+    
+    def show_import_results(self, tipo: str, importados: int, errores: list):
+        """Muestra el resultado de una importación terminada"""
+        stats = self.importer.estadisticas
+        if stats.get('simulacion'):
+            self.show_simulation_summary(tipo, stats)
+        elif stats.get('cancelado'):
+            self.add_result(f"⚠ Importación cancelada. {tipo.capitalize()} importados: {importados}")
+        else:
+            self.add_result(f"✓ {tipo.capitalize()} importados exitosamente: {importados}")
+        
+        if stats.get('combinar') and not stats.get('simulacion'):
+            self.add_result(
+                f"  Insertados: {stats['nuevos']}, actualizados: {stats['actualizados']}, "
+                f"sin cambios: {stats['sin_cambios']}"
+            )
+        
+        meses_omitidos = stats.get('meses_omitidos', 0)
+        if meses_omitidos:
+            self.add_result(f"  Meses omitidos por estar ya pagados: {meses_omitidos}")
+        self.add_statistics()
+        
+        if errores:
+            self.add_result(f"⚠ Errores encontrados ({len(errores)}):")
+            for error in errores[:10]:  # Mostrar máximo 10 errores
+                self.add_result(f"  • {error}")
+            if len(errores) > 10:
+                self.add_result(f"  ... y {len(errores) - 10} errores más")
+        
+        self.add_result("-" * 50)
+    
+    def show_simulation_summary(self, tipo: str, stats: dict):
+        """Muestra lo que haría la importación sin haber guardado nada"""
+        encabezado = "Simulación cancelada" if stats.get('cancelado') else "Simulación terminada"
+        self.add_result(f"✓ {encabezado} (no se guardó ningún cambio)")
+        
+        if tipo == 'usuarios':
+            self.add_result(f"  Usuarios nuevos a insertar: {stats['nuevos']}")
+            self.add_result(f"  Usuarios existentes con datos distintos: {stats['actualizados']}"
+                            + (" (se actualizarían)" if stats.get('combinar') else ""))
+            self.add_result(f"  Usuarios existentes sin cambios: {stats['sin_cambios']}")
+            self.add_result(f"  Números repetidos en el archivo: {stats['duplicados']}")
+        else:
+            self.add_result(
+                f"  Pagos a registrar: {stats['nuevos']} ({stats['meses_nuevos']} meses)"
+            )
+    
+    def set_importing(self, activo: bool):
+        """Habilita o deshabilita los controles mientras se importa"""
+        estado_botones = tk.DISABLED if activo else tk.NORMAL
+        self.select_users_btn.config(state=estado_botones)
+        self.select_payments_btn.config(state=estado_botones)
+        self.cancel_btn.config(state=tk.NORMAL if activo else tk.DISABLED)
+        
+        if activo:
+            self.progress_bar['value'] = 0
+            self.progress_label.config(text="Iniciando importación...")
+        else:
+            self.progress_label.config(text="")
+    
+    def cancel_import(self):
+        """Solicita detener la importación en curso"""
+        if self.cancelar_evento is not None:
+            self.cancelar_evento.set()
+            self.cancel_btn.config(state=tk.DISABLED)
+            self.progress_label.config(text="Cancelando...")
+    
+    def close_window(self):
+        """Cierra el importador, cancelando antes la importación en curso"""
+        if self.hilo_importacion is not None and self.hilo_importacion.is_alive():
+            if not messagebox.askyesno("Importación en curso",
+                                       "Hay una importación en curso. ¿Desea cancelarla y cerrar?",
+                                       parent=self.root):
+                return
+            if self.cancelar_evento is not None:
+                self.cancelar_evento.set()
+        
+        self.root.destroy()
+    
+    def add_statistics(self):
+        """Muestra el tiempo y la velocidad de la última importación"""
+        stats = self.importer.estadisticas
+        if stats:
+            self.add_result(
+                f"  Tiempo: {stats['segundos']:.2f} s "
+                f"({stats['filas_leidas']} filas, {stats['filas_por_segundo']:.0f} filas/s)"
+            )
     
     def add_result(self, text):
         """Agrega texto al área de resultados"""
@@ -399,7 +939,6 @@ class ImporterGUI:
         self.results_text.insert(tk.END, text + "\n")
         self.results_text.config(state=tk.DISABLED)
         self.results_text.see(tk.END)
-        self.root.update()
     
     def run(self):
         """Ejecuta la interfaz"""
@@ -6,126 +6,964 @@ Módulo de gestión de base de datos SQLite para el sistema de agua potable
 
 import sqlite3
 import os
+import bisect
+import threading
+import time
+import unicodedata
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, Iterator, List, Dict, Optional, Tuple
 
-class DatabaseManager:
-    def __init__(self, db_path: str = "agua_potable.db"):
+
+class ConnectionPool:
+    """
+    Pool de conexiones SQLite reutilizables
+
+    Las conexiones se abren una sola vez y se devuelven al pool al terminar
+    cada operación, de modo que el costo por llamada se reduce a la consulta.
+    Dentro de un mismo hilo las adquisiciones anidadas reutilizan la misma
+    conexión (por ejemplo, registrar_pago consultando la cuota mensual).
+    """
+
+    def __init__(self, factory: Callable[[], sqlite3.Connection], size: int = 5,
+                 timeout: float = 10.0, health_check_interval: float = 30.0):
         """
-        Inicializa el gestor de base de datos
-        
+        Inicializa el pool
+
         Args:
-            db_path: Ruta al archivo de la base de datos SQLite
+            factory: Función que abre una conexión nueva
+            size: Número máximo de conexiones abiertas simultáneamente
+            timeout: Segundos a esperar por una conexión libre
+            health_check_interval: Segundos de inactividad tras los cuales se
+                verifica la conexión antes de entregarla
         """
-        self.db_path = db_path
-        self.init_database()
+        if size < 1:
+            raise ValueError("El tamaño del pool debe ser al menos 1")
+        
+        self.factory = factory
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        
+        self._lock = threading.Lock()
+        self._disponibles = threading.BoundedSemaphore(size)
+        self._inactivas = []  # Lista de tuplas (conexión, último uso, generación)
+        self._generacion = 0
+        self._local = threading.local()
     
-    def get_connection(self) -> sqlite3.Connection:
-        """Obtiene una conexión a la base de datos"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # Para obtener resultados como diccionarios
+    def acquire(self) -> sqlite3.Connection:
+        """Obtiene una conexión del pool (o la que ya tiene el hilo actual)"""
+        actual = getattr(self._local, 'conn', None)
+        if actual is not None:
+            self._local.depth += 1
+            return actual
+        
+        if not self._disponibles.acquire(timeout=self.timeout):
+            raise sqlite3.OperationalError(
+                f"No hay conexiones disponibles en el pool (tamaño {self.size})")
+        
+        try:
+            with self._lock:
+                generacion = self._generacion
+            conn = self._take_idle()
+            if conn is None:
+                conn = self.factory()
+        except Exception:
+            self._disponibles.release()
+            raise
+        
+        self._local.conn = conn
+        self._local.depth = 1
+        self._local.generacion = generacion
         return conn
     
-    def init_database(self):
-        """Inicializa las tablas de la base de datos"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def release(self, conn: sqlite3.Connection):
+        """Devuelve una conexión al pool"""
+        if getattr(self._local, 'conn', None) is not conn:
+            raise ValueError("La conexión no pertenece a este hilo")
         
+        self._local.depth -= 1
+        if self._local.depth > 0:
+            return
+        
+        self._local.conn = None
         try:
-            # Tabla de usuarios
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS usuarios (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    numero INTEGER UNIQUE NOT NULL,
-                    nombre TEXT NOT NULL,
-                    direccion TEXT,
-                    telefono TEXT,
-                    email TEXT,
-                    estado TEXT DEFAULT 'Activo' CHECK (estado IN ('Activo', 'Cancelado')),
-                    fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
+            # Nunca devolver una conexión con una transacción abierta
+            if conn.in_transaction:
+                conn.rollback()
+            with self._lock:
+                vigente = self._local.generacion == self._generacion
+                if vigente:
+                    self._inactivas.append((conn, time.monotonic(), self._generacion))
+            if not vigente:
+                self._close_quietly(conn)
+        except sqlite3.Error:
+            self._close_quietly(conn)
+        finally:
+            self._disponibles.release()
+    
+    def profundidad(self) -> int:
+        """Número de adquisiciones anidadas vigentes en el hilo actual (0 = ninguna)"""
+        if getattr(self._local, 'conn', None) is None:
+            return 0
+        return self._local.depth
+    
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Context manager que adquiere y libera una conexión"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+    
+    def close_all(self):
+        """Cierra las conexiones inactivas; las que están en uso se conservan"""
+        with self._lock:
+            inactivas, self._inactivas = self._inactivas, []
+        for conn, _, _ in inactivas:
+            self._close_quietly(conn)
+    
+    def reset(self):
+        """
+        Descarta todas las conexiones: las inactivas se cierran ahora y las
+        que están en uso se cierran al devolverse, de modo que las siguientes
+        se abran de nuevo con la configuración vigente
+        """
+        with self._lock:
+            self._generacion += 1
+        self.close_all()
+    
+    def _take_idle(self) -> Optional[sqlite3.Connection]:
+        """Toma la conexión inactiva más reciente que siga sana"""
+        while True:
+            with self._lock:
+                if not self._inactivas:
+                    return None
+                conn, ultimo_uso, _ = self._inactivas.pop()
             
-            # Tabla de configuración del sistema
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS configuracion (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    clave TEXT UNIQUE NOT NULL,
-                    valor TEXT NOT NULL,
-                    descripcion TEXT,
-                    fecha_modificacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
+            if time.monotonic() - ultimo_uso < self.health_check_interval:
+                return conn
+            if self._is_healthy(conn):
+                return conn
+            self._close_quietly(conn)
+    
+    @staticmethod
+    def _is_healthy(conn: sqlite3.Connection) -> bool:
+        """Verifica que la conexión siga respondiendo"""
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+    
+    @staticmethod
+    def _close_quietly(conn: sqlite3.Connection):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+
+class UserDirectory:
+    """
+    Directorio de usuarios en memoria
+    
+    Mantiene los usuarios indexados por id y por número, más un índice de
+    nombres normalizados ordenado, para resolver búsquedas y filtros de
+    estado sin consultar SQLite. El DatabaseManager lo carga una sola vez y
+    lo actualiza en cada alta o modificación de usuario.
+    """
+    
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._por_id = {}
+        self._por_numero = {}
+        self._nombres = []  # Lista ordenada de tuplas (nombre normalizado, id)
+        self._texto = None  # Nombres concatenados para búsquedas por subcadena
+        self._inicios = []  # Posición de cada nombre dentro de _texto
+        self.cargado = False
+    
+    def cargar(self, usuarios: List[Dict]):
+        """Reemplaza el contenido del directorio"""
+        with self._lock:
+            self._por_id = {u['id']: dict(u) for u in usuarios}
+            self._por_numero = {u['numero']: u for u in self._por_id.values()}
+            self._nombres = sorted(
+                (normalizar_texto(u['nombre']), u['id']) for u in self._por_id.values()
+            )
+            self._texto = None
+            self.cargado = True
+    
+    def invalidar(self):
+        """Descarta el contenido; se recargará en el siguiente uso"""
+        with self._lock:
+            self._por_id = {}
+            self._por_numero = {}
+            self._nombres = []
+            self._texto = None
+            self.cargado = False
+    
+    def guardar(self, usuario: Dict):
+        """Agrega o actualiza un usuario"""
+        with self._lock:
+            if not self.cargado:
+                return
             
-            # Tabla de conceptos de cobro
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS conceptos_cobro (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nombre TEXT UNIQUE NOT NULL,
-                    precio REAL NOT NULL,
-                    activo BOOLEAN DEFAULT 1,
-                    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
+            self._quitar(usuario['id'])
+            usuario = dict(usuario)
+            self._por_id[usuario['id']] = usuario
+            self._por_numero[usuario['numero']] = usuario
+            bisect.insort(self._nombres, (normalizar_texto(usuario['nombre']), usuario['id']))
+            self._texto = None
+    
+    def _quitar(self, usuario_id: int):
+        """Elimina un usuario de todos los índices"""
+        anterior = self._por_id.pop(usuario_id, None)
+        if anterior is None:
+            return
+        
+        if self._por_numero.get(anterior['numero']) is anterior:
+            del self._por_numero[anterior['numero']]
+        
+        clave = (normalizar_texto(anterior['nombre']), usuario_id)
+        posicion = bisect.bisect_left(self._nombres, clave)
+        if posicion < len(self._nombres) and self._nombres[posicion] == clave:
+            del self._nombres[posicion]
+    
+    def obtener_por_id(self, usuario_id: int) -> Optional[Dict]:
+        """Obtiene un usuario por su ID"""
+        with self._lock:
+            usuario = self._por_id.get(usuario_id)
+            return dict(usuario) if usuario else None
+    
+    def obtener_por_numero(self, numero: int) -> Optional[Dict]:
+        """Obtiene un usuario por su número"""
+        with self._lock:
+            usuario = self._por_numero.get(numero)
+            return dict(usuario) if usuario else None
+    
+    def todos(self, estado: Optional[str] = None) -> List[Dict]:
+        """Obtiene todos los usuarios ordenados por número, opcionalmente filtrados por estado"""
+        with self._lock:
+            return [
+                dict(self._por_numero[numero]) for numero in sorted(self._por_numero)
+                if estado is None or self._por_numero[numero]['estado'] == estado
+            ]
+    
+    def buscar(self, texto: str, estado: Optional[str] = None,
+               limit: Optional[int] = None) -> List[Dict]:
+        """
+        Busca usuarios por nombre sin distinguir acentos ni mayúsculas
+        
+        Primero devuelve los nombres que empiezan con el texto (búsqueda por
+        prefijo en el índice ordenado) y después los que contienen todas las
+        palabras buscadas, ambos grupos en orden alfabético.
+        
+        Args:
+            texto: Texto a buscar
+            estado: Filtrar por estado ('Activo'/'Cancelado'), None = todos
+            limit: Número máximo de resultados (None = todos)
+        """
+        normalizado = normalizar_texto(texto).strip()
+        terminos = normalizado.split()
+        
+        with self._lock:
+            resultado = []
+            vistos = set()
             
-            # Tabla de pagos
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS pagos (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    usuario_id INTEGER NOT NULL,
-                    fecha_pago TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    total REAL NOT NULL,
-                    observaciones TEXT,
-                    FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
-                )
-            ''')
+            def agregar(usuario_id):
+                usuario = self._por_id[usuario_id]
+                if estado is not None and usuario['estado'] != estado:
+                    return True
+                vistos.add(usuario_id)
+                resultado.append(dict(usuario))
+                return limit is None or len(resultado) < limit
             
-            # Tabla detalle de pagos (mensualidades y otros conceptos)
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS detalle_pagos (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    pago_id INTEGER NOT NULL,
-                    concepto TEXT NOT NULL,
-                    mes INTEGER NULL,  -- NULL para conceptos que no son mensualidades
-                    anio INTEGER NOT NULL,
-                    precio REAL NOT NULL,
-                    cantidad INTEGER DEFAULT 1,
-                    FOREIGN KEY (pago_id) REFERENCES pagos (id)
-                )
-            ''')
+            # Coincidencias por prefijo: rango contiguo del índice ordenado
+            posicion = bisect.bisect_left(self._nombres, (normalizado,))
+            while posicion < len(self._nombres):
+                nombre, usuario_id = self._nombres[posicion]
+                if not nombre.startswith(normalizado):
+                    break
+                if not agregar(usuario_id):
+                    return resultado
+                posicion += 1
             
-            # Insertar configuración inicial si no existe
-            cursor.execute('''
-                INSERT OR IGNORE INTO configuracion (clave, valor, descripcion)
-                VALUES ('cuota_mensual', '50.0', 'Cuota mensual del servicio de agua')
-            ''')
+            if not terminos:
+                return resultado
             
-            cursor.execute('''
-                INSERT OR IGNORE INTO configuracion (clave, valor, descripcion)
-                VALUES ('pin_acceso', '1234', 'PIN de acceso al sistema')
+            # Coincidencias por subcadena: se busca la palabra menos frecuente
+            # en el texto concatenado (búsqueda en C) y se verifican las demás
+            self._construir_texto()
+            principal = min(terminos, key=self._texto.count) if len(terminos) > 1 else terminos[0]
+            inicio = self._texto.find(principal)
+            while inicio != -1:
+                indice = bisect.bisect_right(self._inicios, inicio) - 1
+                nombre, usuario_id = self._nombres[indice]
+                if usuario_id not in vistos and all(t in nombre for t in terminos):
+                    if not agregar(usuario_id):
+                        break
+                
+                # Continuar en el siguiente nombre
+                if indice + 1 >= len(self._inicios):
+                    break
+                inicio = self._texto.find(principal, self._inicios[indice + 1])
+            
+            return resultado
+    
+    def refinar(self, usuarios: List[Dict], texto: str, estado: Optional[str] = None,
+                limit: Optional[int] = None) -> List[Dict]:
+        """
+        Filtra en memoria los resultados de una búsqueda anterior
+        
+        Sirve cuando el texto nuevo solo agrega caracteres al anterior: los
+        resultados son los mismos que daría buscar(), en el mismo orden,
+        pero revisando solo los usuarios ya encontrados.
+        
+        Args:
+            usuarios: Resultados de buscar() o todos() con un texto más corto
+            texto: Texto a buscar
+            estado: Filtrar por estado ('Activo'/'Cancelado'), None = todos
+            limit: Número máximo de resultados (None = todos)
+        """
+        normalizado = normalizar_texto(texto).strip()
+        terminos = normalizado.split()
+        
+        prefijo = []
+        subcadena = []
+        for usuario in usuarios:
+            if estado is not None and usuario['estado'] != estado:
+                continue
+            nombre = normalizar_texto(usuario['nombre'])
+            if nombre.startswith(normalizado):
+                prefijo.append((nombre, usuario['id'], usuario))
+            elif terminos and all(t in nombre for t in terminos):
+                subcadena.append((nombre, usuario['id'], usuario))
+        
+        prefijo.sort(key=lambda fila: fila[:2])
+        subcadena.sort(key=lambda fila: fila[:2])
+        resultado = [fila[2] for fila in prefijo + subcadena]
+        return resultado if limit is None else resultado[:limit]
+    
+    def _construir_texto(self):
+        """Reconstruye el texto concatenado de nombres si cambió el índice"""
+        if self._texto is not None:
+            return
+        
+        inicios = []
+        posicion = 0
+        for nombre, _ in self._nombres:
+            inicios.append(posicion)
+            posicion += len(nombre) + 1
+        
+        self._inicios = inicios
+        self._texto = '\x00'.join(nombre for nombre, _ in self._nombres)
+
+
+# Perfiles de PRAGMA aplicados al abrir cada conexión. El modo WAL permite
+# que las lecturas no bloqueen a las escrituras y que cada commit solo
+# sincronice el registro WAL en lugar del archivo completo.
+PERFILES_PRAGMA = {
+    'cashier': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -8000,       # KiB (≈8 MB)
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+        'wal_autocheckpoint': 1000,
+        'mmap_max': 64 * 1024 * 1024,
+    },
+    'bulk-import': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -65536,      # KiB (≈64 MB)
+        'temp_store': 'MEMORY',
+        'busy_timeout': 30000,
+        'wal_autocheckpoint': 10000,
+        'mmap_max': 256 * 1024 * 1024,
+    },
+    'reporting': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -32768,      # KiB (≈32 MB)
+        'temp_store': 'MEMORY',
+        'busy_timeout': 10000,
+        'wal_autocheckpoint': 1000,
+        'mmap_max': 256 * 1024 * 1024,
+    },
+}
+
+PERFIL_PRAGMA_DEFAULT = 'cashier'
+
+
+def normalizar_texto(texto: Optional[str]) -> Optional[str]:
+    """
+    Normaliza un texto para búsquedas: sin acentos y sin distinguir
+    mayúsculas ("José" -> "jose")
+    """
+    if texto is None:
+        return None
+    descompuesto = unicodedata.normalize('NFKD', str(texto))
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c)).casefold()
+
+
+def _escapar_like(texto: str) -> str:
+    """Escapa los comodines de LIKE (se usa con ESCAPE '\\')"""
+    return texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _con_nombre_busqueda(usuarios: List[Tuple[int, str, str, str, str]]) -> Iterator[Tuple]:
+    """Agrega el nombre normalizado a tuplas (numero, nombre, direccion, telefono, email)"""
+    for numero, nombre, direccion, telefono, email in usuarios:
+        yield numero, nombre, normalizar_texto(nombre), direccion, telefono, email
+
+
+def mascara_de_meses(meses: List[int]) -> int:
+    """Convierte una lista de meses (1-12) en una máscara de bits (bit mes - 1)"""
+    mascara = 0
+    for mes in meses:
+        if 1 <= mes <= 12:
+            mascara |= 1 << (mes - 1)
+    return mascara
+
+
+def meses_de_mascara(mascara: int) -> List[int]:
+    """Convierte una máscara de bits en la lista ordenada de meses (1-12)"""
+    return [mes for mes in range(1, 13) if mascara >> (mes - 1) & 1]
+
+
+# === MIGRACIONES DE ESQUEMA ===
+
+def _migracion_indices_consultas(cursor: sqlite3.Cursor):
+    """Índices para el calendario de pagos, el historial y la búsqueda de usuarios"""
+    # Historial y calendario: pagos de un usuario ordenados por fecha
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_pagos_usuario_fecha
+        ON pagos (usuario_id, fecha_pago)
+    ''')
+    
+    # Detalles de un pago; incluye anio y mes para cubrir la consulta de
+    # meses pagados sin leer la tabla
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_detalle_pagos_pago
+        ON detalle_pagos (pago_id, anio, mes)
+    ''')
+    
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_detalle_pagos_periodo
+        ON detalle_pagos (anio, mes)
+    ''')
+    
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_usuarios_nombre
+        ON usuarios (nombre)
+    ''')
+    
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_usuarios_estado_numero
+        ON usuarios (estado, numero)
+    ''')
+
+
+def _migracion_busqueda_nombres(cursor: sqlite3.Cursor):
+    """
+    Índice FTS5 de trigramas sobre los nombres normalizados de usuarios
+    
+    El nombre sin acentos ni mayúsculas se guarda en usuarios.nombre_busqueda,
+    que la aplicación escribe desde Python; los triggers solo copian esa
+    columna al índice con funciones propias de SQLite, así que cualquier
+    cliente puede modificar usuarios. Si otro programa da de alta o renombra
+    un usuario sin escribir la columna, se indexa el nombre tal cual.
+    
+    Con SQLite 3.45 o posterior el tokenizador también ignora acentos. Si
+    SQLite no incluye FTS5 con trigramas no se crea el índice y la búsqueda
+    recurre a LIKE sobre la columna.
+    """
+    columnas = {row[1] for row in cursor.execute('PRAGMA table_info(usuarios)')}
+    if 'nombre_busqueda' not in columnas:
+        cursor.execute('ALTER TABLE usuarios ADD COLUMN nombre_busqueda TEXT')
+    
+    usuarios = cursor.execute('SELECT id, nombre FROM usuarios').fetchall()
+    cursor.executemany('UPDATE usuarios SET nombre_busqueda = ? WHERE id = ?',
+                       [(normalizar_texto(nombre), usuario_id) for usuario_id, nombre in usuarios])
+    
+    for tokenizador in ('trigram remove_diacritics 1', 'trigram'):
+        try:
+            cursor.execute(f'''
+                CREATE VIRTUAL TABLE IF NOT EXISTS usuarios_busqueda
+                USING fts5(nombre, tokenize = '{tokenizador}')
             ''')
+            break
+        except sqlite3.OperationalError:
+            continue
+    else:
+        return
+    
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS usuarios_busqueda_insert
+        AFTER INSERT ON usuarios
+        BEGIN
+            INSERT INTO usuarios_busqueda (rowid, nombre)
+            VALUES (new.id, COALESCE(new.nombre_busqueda, new.nombre));
+        END
+    ''')
+    
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS usuarios_busqueda_update
+        AFTER UPDATE OF nombre, nombre_busqueda ON usuarios
+        BEGIN
+            UPDATE usuarios_busqueda SET nombre = CASE
+                WHEN new.nombre IS NOT old.nombre AND new.nombre_busqueda IS old.nombre_busqueda
+                THEN new.nombre
+                ELSE COALESCE(new.nombre_busqueda, new.nombre)
+            END
+            WHERE rowid = old.id;
+        END
+    ''')
+    
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS usuarios_busqueda_delete
+        AFTER DELETE ON usuarios
+        BEGIN
+            DELETE FROM usuarios_busqueda WHERE rowid = old.id;
+        END
+    ''')
+    
+    cursor.execute('DELETE FROM usuarios_busqueda')
+    cursor.execute('''
+        INSERT INTO usuarios_busqueda (rowid, nombre)
+        SELECT id, COALESCE(nombre_busqueda, nombre) FROM usuarios
+    ''')
+
+
+def _migracion_recibos_generados(cursor: sqlite3.Cursor):
+    """
+    Registro de recibos en PDF ya generados
+    
+    Guarda por pago el archivo y la huella de los datos y la plantilla con
+    que se generó, para reutilizarlo mientras nada cambie.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS recibos_generados (
+            pago_id INTEGER PRIMARY KEY,
+            huella TEXT NOT NULL,
+            archivo TEXT NOT NULL,
+            fecha_generacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (pago_id) REFERENCES pagos (id) ON DELETE CASCADE
+        )
+    ''')
+
+
+def _migracion_indice_fecha_pagos(cursor: sqlite3.Cursor):
+    """Índice por fecha de pago para los reportes de ingresos por período"""
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_pagos_fecha
+        ON pagos (fecha_pago)
+    ''')
+
+
+# Reconstruye estado_mensual desde detalle_pagos. SUM(DISTINCT) sobre los
+# bits de cada mes equivale a un OR, aunque un mes se haya pagado dos veces.
+_SQL_RECONSTRUIR_ESTADO_MENSUAL = '''
+    INSERT INTO estado_mensual (usuario_id, anio, meses_bitmap)
+    SELECT p.usuario_id, dp.anio, SUM(DISTINCT 1 << (dp.mes - 1))
+    FROM detalle_pagos dp
+    JOIN pagos p ON dp.pago_id = p.id
+    WHERE dp.mes BETWEEN 1 AND 12
+    GROUP BY p.usuario_id, dp.anio
+'''
+
+
+def _migracion_estado_mensual(cursor: sqlite3.Cursor):
+    """
+    Tabla materializada con los meses pagados por usuario y año
+    
+    Cada fila guarda los 12 meses en una máscara de bits (bit mes - 1), así
+    que consultar el calendario de un usuario es una lectura por clave
+    primaria. Se mantiene en _insertar_pago dentro de la misma transacción.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS estado_mensual (
+            usuario_id INTEGER NOT NULL,
+            anio INTEGER NOT NULL,
+            meses_bitmap INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (usuario_id, anio)
+        ) WITHOUT ROWID
+    ''')
+    
+    cursor.execute('DELETE FROM estado_mensual')
+    cursor.execute(_SQL_RECONSTRUIR_ESTADO_MENSUAL)
+
+
+def _migracion_busqueda_sin_funciones(cursor: sqlite3.Cursor):
+    """
+    Rehace el índice de nombres en las bases creadas con su primera versión
+    
+    Aquellos triggers llamaban a normalizar(), una función que solo existía
+    en las conexiones de esta aplicación, así que cualquier otro cliente de
+    SQLite fallaba al modificar usuarios.
+    """
+    antiguos = cursor.execute('''
+        SELECT 1 FROM sqlite_master
+        WHERE type = 'trigger' AND tbl_name = 'usuarios' AND sql LIKE '%normalizar(%'
+    ''').fetchone()
+    if not antiguos:
+        return
+    
+    cursor.execute('DROP TRIGGER IF EXISTS usuarios_busqueda_insert')
+    cursor.execute('DROP TRIGGER IF EXISTS usuarios_busqueda_update')
+    cursor.execute('DROP TRIGGER IF EXISTS usuarios_busqueda_delete')
+    cursor.execute('DROP TABLE IF EXISTS usuarios_busqueda')
+    _migracion_busqueda_nombres(cursor)
+
+
+# Migraciones en orden de versión. La versión aplicada se guarda en
+# PRAGMA user_version, de modo que las instalaciones existentes se
+# actualizan al iniciar.
+MIGRACIONES = [
+    (1, "Índices para consultas de pagos y usuarios", _migracion_indices_consultas),
+    (2, "Índice de búsqueda de nombres por trigramas", _migracion_busqueda_nombres),
+    (3, "Registro de recibos generados", _migracion_recibos_generados),
+    (4, "Índice de pagos por fecha", _migracion_indice_fecha_pagos),
+    (5, "Estado mensual de pagos materializado", _migracion_estado_mensual),
+    (6, "Índice de búsqueda de nombres sin funciones de la aplicación", _migracion_busqueda_sin_funciones),
+]
+
+
+# Sentencias de inserción de pagos. Usar siempre el mismo texto permite que
+# sqlite3 reutilice la sentencia preparada de su caché en cada conexión.
+_SQL_INSERTAR_PAGO = '''
+    INSERT INTO pagos (usuario_id, total, observaciones)
+    VALUES (?, ?, ?)
+'''
+
+_SQL_INSERTAR_DETALLE = '''
+    INSERT INTO detalle_pagos (pago_id, concepto, mes, anio, precio)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+_SQL_MARCAR_MESES_PAGADOS = '''
+    INSERT INTO estado_mensual (usuario_id, anio, meses_bitmap)
+    VALUES (?, ?, ?)
+    ON CONFLICT (usuario_id, anio)
+    DO UPDATE SET meses_bitmap = meses_bitmap | excluded.meses_bitmap
+'''
+
+
+class DatabaseManager:
+    def __init__(self, db_path: str = "agua_potable.db", pool_size: int = 5,
+                 pragma_profile: str = PERFIL_PRAGMA_DEFAULT):
+        """
+        Inicializa el gestor de base de datos
+        
+        Args:
+            db_path: Ruta al archivo de la base de datos SQLite
+            pool_size: Número máximo de conexiones reutilizables
+            pragma_profile: Perfil de PRAGMA a aplicar (ver PERFILES_PRAGMA)
+        """
+        if pragma_profile not in PERFILES_PRAGMA:
+            raise ValueError(f"Perfil de PRAGMA desconocido: {pragma_profile}")
+        
+        self.db_path = db_path
+        self.pragma_profile = pragma_profile
+        self._busqueda_fts = None  # Se determina al primer uso
+        self._configuracion = None  # Tabla de configuración en memoria
+        self.directorio = UserDirectory()
+        self._observadores_pagos = []  # Ver agregar_observador_pagos
+        self._observadores_usuarios = []  # Ver agregar_observador_usuarios
+        self._observadores_caches = []  # Ver agregar_observador_caches
+        self.pool = ConnectionPool(self.get_connection, size=pool_size)
+        self.init_database()
+    
+    def get_connection(self) -> sqlite3.Connection:
+        """Abre una conexión nueva a la base de datos (usada por el pool)"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row  # Para obtener resultados como diccionarios
+        self._aplicar_pragmas(conn, self.pragma_profile)
+        return conn
+    
+    @contextmanager
+    def connection(self, perfil: Optional[str] = None) -> Iterator[sqlite3.Connection]:
+        """
+        Obtiene una conexión del pool como context manager
+        
+        Args:
+            perfil: Perfil de PRAGMA a usar solo durante este bloque; al salir
+                se restaura el perfil activo. Dentro de otro bloque del mismo
+                hilo se ignora y se conserva el perfil del bloque externo.
+        
+        Ejemplo:
+            with db.connection() as conn:
+                conn.execute(...)
+        """
+        with self.pool.connection() as conn:
+            # Un bloque anidado comparte la conexión y quizá una transacción
+            # abierta: no se puede cambiar synchronous dentro de ella, y
+            # revertirla al salir descartaría los cambios del bloque externo
+            if perfil is None or perfil == self.pragma_profile or self.pool.profundidad() > 1:
+                yield conn
+                return
             
-            # Insertar algunos conceptos de cobro predeterminados
-            conceptos_default = [
-                ('Cooperación Anual', 100.0),
-                ('Toma Nueva', 500.0),
-                ('Multa por Inasistencia', 25.0),
-                ('Multa por Desperdicio', 75.0),
-            ]
+            self._aplicar_pragmas(conn, perfil)
+            try:
+                yield conn
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+                self._aplicar_pragmas(conn, self.pragma_profile)
+    
+    def close(self):
+        """Cierra las conexiones inactivas del pool"""
+        self.pool.close_all()
+    
+    def invalidar_caches(self):
+        """Descarta los datos en memoria (p. ej. tras restaurar un respaldo)"""
+        self.directorio.invalidar()
+        self._busqueda_fts = None
+        self._configuracion = None
+        self._notificar(self._observadores_caches, "caches descartadas")
+    
+    def agregar_observador_caches(self, observador: Callable[[], None]):
+        """Registra una función a llamar cuando se descartan los datos en memoria"""
+        if observador not in self._observadores_caches:
+            self._observadores_caches.append(observador)
+    
+    def agregar_observador_usuarios(self, observador: Callable[[], None]):
+        """
+        Registra una función a llamar después de crear o modificar usuarios
+        
+        Se llama en el hilo que hizo el cambio, después del commit.
+        """
+        if observador not in self._observadores_usuarios:
+            self._observadores_usuarios.append(observador)
+    
+    def _notificar(self, observadores: List[Callable], descripcion: str, *args):
+        """Llama a los observadores dados sin que un error interrumpa a los demás"""
+        for observador in list(observadores):
+            try:
+                observador(*args)
+            except Exception as e:
+                print(f"Error al notificar {descripcion}: {e}")
+    
+    # === PERFILES DE PRAGMA ===
+    
+    def _aplicar_pragmas(self, conn: sqlite3.Connection, perfil: str):
+        """Aplica un perfil de PRAGMA a una conexión"""
+        if perfil not in PERFILES_PRAGMA:
+            raise ValueError(f"Perfil de PRAGMA desconocido: {perfil}")
+        
+        config = PERFILES_PRAGMA[perfil]
+        
+        # El modo de journal no puede cambiarse dentro de una transacción
+        if not conn.in_transaction:
+            conn.execute(f"PRAGMA journal_mode = {config['journal_mode']}")
+        
+        for pragma in ('synchronous', 'cache_size', 'temp_store',
+                       'busy_timeout', 'wal_autocheckpoint'):
+            if pragma in config:
+                conn.execute(f"PRAGMA {pragma} = {config[pragma]}")
+        
+        conn.execute(f"PRAGMA mmap_size = {self._calcular_mmap(config['mmap_max'])}")
+    
+    def _calcular_mmap(self, maximo: int) -> int:
+        """
+        Calcula el tamaño del mapeo en memoria según el tamaño de la base de
+        datos: el archivo actual más un 25% de margen, sin exceder el máximo
+        """
+        try:
+            tamano = os.path.getsize(self.db_path)
+        except OSError:
+            tamano = 0
+        
+        mb = 1024 * 1024
+        deseado = max(tamano + tamano // 4, 8 * mb)
+        deseado = -(-deseado // mb) * mb  # Redondear al MB superior
+        return min(deseado, maximo)
+    
+    def set_pragma_profile(self, perfil: str):
+        """
+        Cambia el perfil de PRAGMA activo
+        
+        Las conexiones del pool se descartan para que las siguientes se abran
+        con el nuevo perfil.
+        """
+        if perfil not in PERFILES_PRAGMA:
+            raise ValueError(f"Perfil de PRAGMA desconocido: {perfil}")
+        
+        self.pragma_profile = perfil
+        self.pool.reset()
+    
+    def checkpoint(self):
+        """Vuelca el registro WAL al archivo principal (p. ej. antes de copiarlo)"""
+        with self.connection() as conn:
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    
+    def obtener_perfil_pragmas(self) -> Dict:
+        """
+        Reporta el perfil de PRAGMA activo y los valores efectivos
+        
+        Returns:
+            Dict: Nombre del perfil y valor actual de cada PRAGMA
+        """
+        with self.connection() as conn:
+            info = {'perfil': self.pragma_profile}
+            for pragma in ('journal_mode', 'synchronous', 'cache_size', 'temp_store',
+                           'mmap_size', 'busy_timeout', 'wal_autocheckpoint'):
+                row = conn.execute(f"PRAGMA {pragma}").fetchone()
+                info[pragma] = row[0] if row else None
+            return info
+    
+    def init_database(self):
+        """Inicializa las tablas de la base de datos"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
             
-            for concepto, precio in conceptos_default:
+            try:
+                # Tabla de usuarios
                 cursor.execute('''
-                    INSERT OR IGNORE INTO conceptos_cobro (nombre, precio)
-                    VALUES (?, ?)
-                ''', (concepto, precio))
+                    CREATE TABLE IF NOT EXISTS usuarios (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        numero INTEGER UNIQUE NOT NULL,
+                        nombre TEXT NOT NULL,
+                        direccion TEXT,
+                        telefono TEXT,
+                        email TEXT,
+                        estado TEXT DEFAULT 'Activo' CHECK (estado IN ('Activo', 'Cancelado')),
+                        fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                
+                # Tabla de configuración del sistema
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS configuracion (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        clave TEXT UNIQUE NOT NULL,
+                        valor TEXT NOT NULL,
+                        descripcion TEXT,
+                        fecha_modificacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                
+                # Tabla de conceptos de cobro
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS conceptos_cobro (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        nombre TEXT UNIQUE NOT NULL,
+                        precio REAL NOT NULL,
+                        activo BOOLEAN DEFAULT 1,
+                        fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                
+                # Tabla de pagos
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS pagos (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        usuario_id INTEGER NOT NULL,
+                        fecha_pago TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        total REAL NOT NULL,
+                        observaciones TEXT,
+                        FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
+                    )
+                ''')
+                
+                # Tabla detalle de pagos (mensualidades y otros conceptos)
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS detalle_pagos (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        pago_id INTEGER NOT NULL,
+                        concepto TEXT NOT NULL,
+                        mes INTEGER NULL,  -- NULL para conceptos que no son mensualidades
+                        anio INTEGER NOT NULL,
+                        precio REAL NOT NULL,
+                        cantidad INTEGER DEFAULT 1,
+                        FOREIGN KEY (pago_id) REFERENCES pagos (id)
+                    )
+                ''')
+                
+                # Insertar configuración inicial si no existe
+                cursor.execute('''
+                    INSERT OR IGNORE INTO configuracion (clave, valor, descripcion)
+                    VALUES ('cuota_mensual', '50.0', 'Cuota mensual del servicio de agua')
+                ''')
+                
+                cursor.execute('''
+                    INSERT OR IGNORE INTO configuracion (clave, valor, descripcion)
+                    VALUES ('pin_acceso', '1234', 'PIN de acceso al sistema')
+                ''')
+                
+                cursor.execute('''
+                    INSERT OR IGNORE INTO configuracion (clave, valor, descripcion)
+                    VALUES ('motor_recibos', 'platypus', 'Motor de generación de recibos (canvas o platypus)')
+                ''')
+                
+                # Insertar algunos conceptos de cobro predeterminados
+                conceptos_default = [
+                    ('Cooperación Anual', 100.0),
+                    ('Toma Nueva', 500.0),
+                    ('Multa por Inasistencia', 25.0),
+                    ('Multa por Desperdicio', 75.0),
+                ]
+                
+                for concepto, precio in conceptos_default:
+                    cursor.execute('''
+                        INSERT OR IGNORE INTO conceptos_cobro (nombre, precio)
+                        VALUES (?, ?)
+                    ''', (concepto, precio))
+                
+                conn.commit()
+                
+            except sqlite3.Error as e:
+                print(f"Error al inicializar la base de datos: {e}")
+                conn.rollback()
+                return
+        
+        self.aplicar_migraciones()
+    
+    def obtener_version_esquema(self) -> int:
+        """Obtiene la versión de esquema registrada en la base de datos"""
+        with self.connection() as conn:
+            return conn.execute('PRAGMA user_version').fetchone()[0]
+    
+    def aplicar_migraciones(self) -> int:
+        """
+        Aplica las migraciones de esquema pendientes
+        
+        Cada migración se ejecuta en su propia transacción junto con la
+        actualización de la versión, así que una falla deja la base de datos
+        en la última versión completa.
+        
+        Returns:
+            int: Versión de esquema resultante
+        """
+        with self.connection() as conn:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            aplicadas = 0
             
-            conn.commit()
+            for numero, descripcion, migracion in MIGRACIONES:
+                if numero <= version:
+                    continue
+                
+                cursor = conn.cursor()
+                try:
+                    cursor.execute('BEGIN')
+                    migracion(cursor)
+                    cursor.execute(f'PRAGMA user_version = {numero}')
+                    conn.commit()
+                except sqlite3.Error as e:
+                    print(f"Error al aplicar la migración {numero} ({descripcion}): {e}")
+                    conn.rollback()
+                    break
+                
+                version = numero
+                aplicadas += 1
             
-        except sqlite3.Error as e:
-            print(f"Error al inicializar la base de datos: {e}")
-            conn.rollback()
-        finally:
-            conn.close()
+            if aplicadas:
+                # Actualizar las estadísticas del planificador con los nuevos índices
+                conn.execute('PRAGMA optimize')
+            
+            return version
     
     # === GESTIÓN DE USUARIOS ===
     
@@ -137,58 +975,215 @@ class DatabaseManager:
         Returns:
             bool: True si se creó exitosamente, False si ya existe el número
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            try:
+                cursor.execute('''
+                    INSERT INTO usuarios (numero, nombre, nombre_busqueda, direccion, telefono, email)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (numero, nombre, normalizar_texto(nombre), direccion, telefono, email))
+                conn.commit()
+                self._refrescar_en_directorio(cursor, cursor.lastrowid)
+                return True
+            except sqlite3.IntegrityError:
+                return False  # El número ya existe
+    
+    def obtener_numeros_usuarios(self) -> set:
+        """Obtiene el conjunto de números de usuario registrados"""
+        with self.connection() as conn:
+            return {row[0] for row in conn.execute('SELECT numero FROM usuarios')}
+    
+    def insertar_usuarios_lote(self, usuarios: List[Tuple[int, str, str, str, str]]) -> int:
+        """
+        Inserta muchos usuarios en una sola transacción
         
-        try:
-            cursor.execute('''
-                INSERT INTO usuarios (numero, nombre, direccion, telefono, email)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (numero, nombre, direccion, telefono, email))
-            conn.commit()
-            return True
-        except sqlite3.IntegrityError:
-            return False  # El número ya existe
-        finally:
-            conn.close()
+        Args:
+            usuarios: Tuplas (numero, nombre, direccion, telefono, email)
+            
+        Returns:
+            int: Número de usuarios insertados
+            
+        Raises:
+            sqlite3.Error: Si falla la inserción; el lote completo se descarta
+        """
+        if not usuarios:
+            return 0
+        
+        with self.connection(perfil='bulk-import') as conn:
+            cursor = conn.cursor()
+            
+            try:
+                cursor.executemany('''
+                    INSERT INTO usuarios (numero, nombre, nombre_busqueda, direccion, telefono, email)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', _con_nombre_busqueda(usuarios))
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            finally:
+                # El directorio se recarga completo en el siguiente uso
+                self.directorio.invalidar()
+                self._notificar(self._observadores_usuarios, "usuarios modificados")
+            
+            return len(usuarios)
+    
+    def combinar_usuarios_lote(self, usuarios: List[Tuple[int, str, str, str, str]]) -> int:
+        """
+        Inserta o actualiza muchos usuarios en una sola transacción
+        
+        Los números que ya existen se actualizan con ON CONFLICT(numero);
+        las filas cuyos datos no cambiaron no se reescriben.
+        
+        Args:
+            usuarios: Tuplas (numero, nombre, direccion, telefono, email)
+            
+        Returns:
+            int: Número de usuarios procesados
+            
+        Raises:
+            sqlite3.Error: Si falla la operación; el lote completo se descarta
+        """
+        if not usuarios:
+            return 0
+        
+        with self.connection(perfil='bulk-import') as conn:
+            cursor = conn.cursor()
+            
+            try:
+                cursor.executemany('''
+                    INSERT INTO usuarios (numero, nombre, nombre_busqueda, direccion, telefono, email)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(numero) DO UPDATE SET
+                        nombre = excluded.nombre,
+                        nombre_busqueda = excluded.nombre_busqueda,
+                        direccion = excluded.direccion,
+                        telefono = excluded.telefono,
+                        email = excluded.email
+                    WHERE (usuarios.nombre, usuarios.nombre_busqueda, usuarios.direccion,
+                           usuarios.telefono, usuarios.email)
+                        IS NOT (excluded.nombre, excluded.nombre_busqueda, excluded.direccion,
+                                excluded.telefono, excluded.email)
+                ''', _con_nombre_busqueda(usuarios))
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            finally:
+                # El directorio se recarga completo en el siguiente uso
+                self.directorio.invalidar()
+                self._notificar(self._observadores_usuarios, "usuarios modificados")
+            
+            return len(usuarios)
+    
+    def directorio_usuarios(self) -> UserDirectory:
+        """Obtiene el directorio de usuarios en memoria, cargándolo si hace falta"""
+        if not self.directorio.cargado:
+            with self.connection() as conn:
+                rows = conn.execute('SELECT * FROM usuarios').fetchall()
+                self.directorio.cargar([dict(row) for row in rows])
+        return self.directorio
+    
+    def _refrescar_en_directorio(self, cursor: sqlite3.Cursor, usuario_id: int):
+        """Vuelve a leer un usuario recién escrito y lo actualiza en el directorio"""
+        if self.directorio.cargado:
+            cursor.execute('SELECT * FROM usuarios WHERE id = ?', (usuario_id,))
+            row = cursor.fetchone()
+            if row:
+                self.directorio.guardar(dict(row))
+        
+        self._notificar(self._observadores_usuarios, "usuarios modificados")
     
     def buscar_usuario_por_numero(self, numero: int) -> Optional[Dict]:
         """Busca un usuario por su número"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        return self.directorio_usuarios().obtener_por_numero(numero)
+    
+    def buscar_usuarios_por_nombre(self, nombre: str, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Busca usuarios por nombre (búsqueda parcial)
         
-        try:
-            cursor.execute('SELECT * FROM usuarios WHERE numero = ?', (numero,))
-            row = cursor.fetchone()
-            return dict(row) if row else None
-        finally:
-            conn.close()
+        No distingue acentos ni mayúsculas y acepta varias palabras en
+        cualquier orden. Los nombres que empiezan con el texto buscado
+        aparecen primero. Consulta el índice de trigramas en SQLite, sin
+        cargar el directorio en memoria.
+        
+        Args:
+            nombre: Texto a buscar
+            limit: Número máximo de resultados (None = todos)
+        """
+        terminos = normalizar_texto(nombre).split()
+        if not terminos:
+            return self._consultar_usuarios('SELECT * FROM usuarios ORDER BY nombre', [], limit)
+        
+        prefijo = _escapar_like(terminos[0]) + '%'
+        largos = [t for t in terminos if len(t) >= 3]
+        
+        if largos and self._busqueda_fts_disponible():
+            # Los trigramas solo indexan términos de 3 o más caracteres; los
+            # más cortos se filtran con LIKE sobre los candidatos
+            match = ' '.join('"' + t.replace('"', '""') + '"' for t in largos)
+            condiciones = ['usuarios_busqueda MATCH ?']
+            parametros = [match]
+            for termino in terminos:
+                if len(termino) < 3:
+                    condiciones.append("b.nombre LIKE ? ESCAPE '\\'")
+                    parametros.append(f'%{_escapar_like(termino)}%')
+            parametros.append(prefijo)
+            
+            consulta = f'''
+                SELECT u.* FROM usuarios_busqueda b
+                JOIN usuarios u ON u.id = b.rowid
+                WHERE {' AND '.join(condiciones)}
+                ORDER BY b.nombre LIKE ? ESCAPE '\\' DESC, b.rank, u.nombre
+            '''
+        else:
+            condiciones = ["COALESCE(nombre_busqueda, nombre) LIKE ? ESCAPE '\\'"] * len(terminos)
+            parametros = [f'%{_escapar_like(t)}%' for t in terminos]
+            parametros.append(prefijo)
+            
+            consulta = f'''
+                SELECT * FROM usuarios
+                WHERE {' AND '.join(condiciones)}
+                ORDER BY COALESCE(nombre_busqueda, nombre) LIKE ? ESCAPE '\\' DESC, nombre
+            '''
+        
+        return self._consultar_usuarios(consulta, parametros, limit)
     
-    def buscar_usuarios_por_nombre(self, nombre: str) -> List[Dict]:
-        """Busca usuarios por nombre (búsqueda parcial)"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def _consultar_usuarios(self, consulta: str, parametros: list,
+                            limit: Optional[int] = None) -> List[Dict]:
+        """Ejecuta una consulta de usuarios aplicando el límite opcional"""
+        if limit is not None:
+            consulta += ' LIMIT ?'
+            parametros = list(parametros) + [limit]
         
-        try:
-            cursor.execute('''
-                SELECT * FROM usuarios 
-                WHERE nombre LIKE ? 
-                ORDER BY nombre
-            ''', (f'%{nombre}%',))
-            rows = cursor.fetchall()
-            return [dict(row) for row in rows]
-        finally:
-            conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(consulta, parametros)
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def _busqueda_fts_disponible(self) -> bool:
+        """Indica si existe el índice de trigramas de nombres"""
+        if self._busqueda_fts is None:
+            with self.connection() as conn:
+                row = conn.execute('''
+                    SELECT 1 FROM sqlite_master
+                    WHERE type = 'table' AND name = 'usuarios_busqueda'
+                ''').fetchone()
+                self._busqueda_fts = row is not None
+        return self._busqueda_fts
     
     def actualizar_usuario(self, usuario_id: int, **kwargs) -> bool:
         """Actualiza los datos de un usuario"""
         if not kwargs:
             return False
         
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        if 'nombre' in kwargs:
+            kwargs['nombre_busqueda'] = normalizar_texto(kwargs['nombre'])
         
-        try:
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
             # Construir la consulta dinámicamente
             campos = list(kwargs.keys())
             valores = list(kwargs.values())
@@ -203,9 +1198,10 @@ class DatabaseManager:
             ''', valores)
             
             conn.commit()
-            return cursor.rowcount > 0
-        finally:
-            conn.close()
+            actualizado = cursor.rowcount > 0
+            if actualizado:
+                self._refrescar_en_directorio(cursor, usuario_id)
+            return actualizado
     
     def cambiar_estado_usuario(self, usuario_id: int, estado: str) -> bool:
         """Cambia el estado de un usuario (Activo/Cancelado)"""
@@ -214,24 +1210,8 @@ class DatabaseManager:
         return self.actualizar_usuario(usuario_id, estado=estado)
     
     def obtener_todos_usuarios(self, solo_activos: bool = False) -> List[Dict]:
-        """Obtiene todos los usuarios"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        try:
-            if solo_activos:
-                cursor.execute('''
-                    SELECT * FROM usuarios 
-                    WHERE estado = 'Activo' 
-                    ORDER BY numero
-                ''')
-            else:
-                cursor.execute('SELECT * FROM usuarios ORDER BY numero')
-            
-            rows = cursor.fetchall()
-            return [dict(row) for row in rows]
-        finally:
-            conn.close()
+        """Obtiene todos los usuarios ordenados por número"""
+        return self.directorio_usuarios().todos('Activo' if solo_activos else None)
     
     # === GESTIÓN DE PAGOS ===
     
@@ -242,22 +1222,27 @@ class DatabaseManager:
         Returns:
             List[int]: Lista de meses pagados (1-12)
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute('''
-                SELECT DISTINCT mes 
-                FROM detalle_pagos dp
-                JOIN pagos p ON dp.pago_id = p.id
-                WHERE p.usuario_id = ? AND dp.anio = ? AND dp.mes IS NOT NULL
-                ORDER BY mes
-            ''', (usuario_id, anio))
+        with self.connection() as conn:
+            row = conn.execute('''
+                SELECT meses_bitmap FROM estado_mensual
+                WHERE usuario_id = ? AND anio = ?
+            ''', (usuario_id, anio)).fetchone()
             
-            rows = cursor.fetchall()
-            return [row[0] for row in rows]
-        finally:
-            conn.close()
+            return meses_de_mascara(row[0]) if row else []
+    
+    def obtener_calendario_pagos_usuario(self, usuario_id: int) -> Dict[int, int]:
+        """
+        Obtiene los meses pagados de un usuario en todos los años, con una sola consulta
+        
+        Returns:
+            Dict[int, int]: Año -> máscara de meses pagados (ver meses_de_mascara)
+        """
+        with self.connection() as conn:
+            cursor = conn.execute('''
+                SELECT anio, meses_bitmap FROM estado_mensual
+                WHERE usuario_id = ?
+            ''', (usuario_id,))
+            return {row[0]: row[1] for row in cursor}
     
     def registrar_pago(self, usuario_id: int, meses_pagados: List[int], anio: int,
                       conceptos_adicionales: List[Tuple[str, float]] = None,
@@ -275,90 +1260,352 @@ class DatabaseManager:
         Returns:
             int: ID del pago registrado, 0 si hay error
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            try:
+                # Obtener la cuota mensual actual
+                cuota_mensual = self.obtener_configuracion_float('cuota_mensual', 50.0)
+                
+                pago_id = self._insertar_pago(cursor, usuario_id, meses_pagados, anio,
+                                              conceptos_adicionales, observaciones, cuota_mensual)
+                
+                conn.commit()
+                self._notificar_pagos(cursor, [pago_id])
+                return pago_id
+                
+            except sqlite3.Error as e:
+                print(f"Error al registrar pago: {e}")
+                conn.rollback()
+                return 0
+    
+    def registrar_pagos_lote(self, pagos: List[Dict],
+                             perfil: Optional[str] = None) -> List[Tuple[int, Optional[str]]]:
+        """
+        Registra muchos pagos en una sola transacción (p. ej. un día de asamblea)
         
-        try:
-            # Obtener la cuota mensual actual
-            cuota_mensual = self.obtener_configuracion('cuota_mensual')
-            cuota_mensual = float(cuota_mensual) if cuota_mensual else 50.0
+        Cada pago se inserta dentro de un SAVEPOINT, así que un pago inválido
+        se descarta sin afectar a los demás. Al final se hace un único commit.
+        
+        Args:
+            pagos: Lista de diccionarios con las claves de registrar_pago:
+                usuario_id, meses_pagados, anio y opcionalmente
+                conceptos_adicionales y observaciones
+            perfil: Perfil de PRAGMA para la transacción (p. ej. 'bulk-import')
             
-            # Calcular total
-            total = len(meses_pagados) * cuota_mensual
-            if conceptos_adicionales:
-                total += sum(precio for _, precio in conceptos_adicionales)
+        Returns:
+            List[Tuple[int, Optional[str]]]: Por cada pago, en el mismo orden,
+                (pago_id, None) si se registró o (0, mensaje) si hubo error
+        """
+        resultados = []
+        if not pagos:
+            return resultados
+        
+        with self.connection(perfil=perfil) as conn:
+            cursor = conn.cursor()
+            cuota_mensual = self.obtener_configuracion_float('cuota_mensual', 50.0)
             
-            # Insertar el pago principal
+            try:
+                cursor.execute('BEGIN')
+                
+                for pago in pagos:
+                    try:
+                        meses = pago.get('meses_pagados') or []
+                        conceptos = pago.get('conceptos_adicionales') or []
+                        if not meses and not conceptos:
+                            raise ValueError("No hay meses ni conceptos a pagar")
+                        if any(not 1 <= mes <= 12 for mes in meses):
+                            raise ValueError(f"Mes fuera de rango en {meses}")
+                        
+                        cursor.execute('SAVEPOINT pago_lote')
+                        try:
+                            pago_id = self._insertar_pago(
+                                cursor, pago['usuario_id'], meses, pago['anio'], conceptos,
+                                pago.get('observaciones', ""), cuota_mensual
+                            )
+                        except sqlite3.Error:
+                            cursor.execute('ROLLBACK TO pago_lote')
+                            raise
+                        finally:
+                            cursor.execute('RELEASE pago_lote')
+                        
+                        resultados.append((pago_id, None))
+                        
+                    except KeyError as e:
+                        resultados.append((0, f"Falta el dato {e}"))
+                    except (ValueError, TypeError, sqlite3.Error) as e:
+                        resultados.append((0, str(e)))
+                
+                conn.commit()
+                self._notificar_pagos(cursor, [pago_id for pago_id, _ in resultados if pago_id])
+                return resultados
+                
+            except sqlite3.Error as e:
+                print(f"Error al registrar lote de pagos: {e}")
+                conn.rollback()
+                return [(0, f"Lote descartado: {e}") for _ in pagos]
+    
+    def agregar_observador_pagos(self, observador: Callable[[set], None]):
+        """
+        Registra una función a llamar después de guardar pagos nuevos
+        
+        Args:
+            observador: Recibe un set de tuplas (fecha 'AAAA-MM-DD' del pago,
+                año de los detalles) con los períodos afectados. Se llama
+                en el hilo que registró los pagos, después del commit.
+        """
+        if observador not in self._observadores_pagos:
+            self._observadores_pagos.append(observador)
+    
+    def quitar_observador_pagos(self, observador: Callable[[set], None]):
+        """Deja de notificar a un observador de pagos"""
+        if observador in self._observadores_pagos:
+            self._observadores_pagos.remove(observador)
+    
+    def _notificar_pagos(self, cursor: sqlite3.Cursor, pago_ids: List[int]):
+        """Avisa a los observadores qué períodos cambiaron con los pagos dados"""
+        if not self._observadores_pagos or not pago_ids:
+            return
+        
+        periodos = set()
+        for inicio in range(0, len(pago_ids), 500):
+            lote = pago_ids[inicio:inicio + 500]
+            marcadores = ','.join('?' * len(lote))
+            cursor.execute(f'''
+                SELECT DISTINCT substr(p.fecha_pago, 1, 10), dp.anio
+                FROM pagos p
+                JOIN detalle_pagos dp ON dp.pago_id = p.id
+                WHERE p.id IN ({marcadores})
+            ''', lote)
+            periodos.update((row[0], row[1]) for row in cursor.fetchall())
+        
+        self._notificar(self._observadores_pagos, "pagos registrados", periodos)
+    
+    def obtener_mapa_numeros_usuarios(self) -> Dict[int, int]:
+        """Obtiene el mapa número de usuario -> ID con una sola consulta"""
+        with self.connection() as conn:
+            return {row[0]: row[1] for row in conn.execute('SELECT numero, id FROM usuarios')}
+    
+    def obtener_meses_pagados_anio(self, anio: int) -> set:
+        """
+        Obtiene todos los meses pagados de un año, de todos los usuarios
+        
+        Returns:
+            set: Tuplas (usuario_id, mes)
+        """
+        with self.connection() as conn:
+            cursor = conn.execute('''
+                SELECT usuario_id, meses_bitmap FROM estado_mensual WHERE anio = ?
+            ''', (anio,))
+            return {
+                (row[0], mes) for row in cursor for mes in meses_de_mascara(row[1])
+            }
+    
+    def obtener_estado_mensual_rango(self, anio_inicio: int, anio_fin: int) -> List[Tuple[int, int, int]]:
+        """
+        Obtiene los meses pagados de todos los usuarios en un rango de años
+        
+        Returns:
+            List[Tuple[int, int, int]]: Tuplas (usuario_id, anio, meses_bitmap),
+                una por usuario y año con algún pago
+        """
+        with self.connection(perfil='reporting') as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None  # Tuplas simples, sin construir sqlite3.Row
             cursor.execute('''
-                INSERT INTO pagos (usuario_id, total, observaciones)
-                VALUES (?, ?, ?)
-            ''', (usuario_id, total, observaciones))
-            
-            pago_id = cursor.lastrowid
+                SELECT usuario_id, anio, meses_bitmap
+                FROM estado_mensual
+                WHERE anio BETWEEN ? AND ?
+            ''', (anio_inicio, anio_fin))
+            return cursor.fetchall()
+    
+    def obtener_primeros_meses_pagados(self) -> Dict[int, int]:
+        """
+        Obtiene el primer mes pagado de cada usuario, en cualquier año
+        
+        Returns:
+            Dict[int, int]: usuario_id -> índice del mes (anio * 12 + mes - 1)
+        """
+        with self.connection(perfil='reporting') as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            # Con MIN(), SQLite toma meses_bitmap de la misma fila del año mínimo
+            cursor.execute('''
+                SELECT usuario_id, MIN(anio), meses_bitmap
+                FROM estado_mensual
+                WHERE meses_bitmap <> 0
+                GROUP BY usuario_id
+            ''')
+            return {
+                usuario_id: anio * 12 + (mascara & -mascara).bit_length() - 1
+                for usuario_id, anio, mascara in cursor
+            }
+    
+    def reconstruir_estado_mensual(self) -> bool:
+        """Vuelve a calcular estado_mensual completo desde detalle_pagos"""
+        with self.connection(perfil='bulk-import') as conn:
+            try:
+                conn.execute('BEGIN')
+                conn.execute('DELETE FROM estado_mensual')
+                conn.execute(_SQL_RECONSTRUIR_ESTADO_MENSUAL)
+                conn.commit()
+                return True
+            except sqlite3.Error as e:
+                print(f"Error al reconstruir el estado mensual: {e}")
+                conn.rollback()
+                return False
+    
+    def _insertar_pago(self, cursor: sqlite3.Cursor, usuario_id: int, meses_pagados: List[int],
+                       anio: int, conceptos_adicionales: Optional[List[Tuple[str, float]]],
+                       observaciones: str, cuota_mensual: float) -> int:
+        """
+        Inserta un pago y sus detalles dentro de la transacción en curso
+        
+        Returns:
+            int: ID del pago insertado
+        """
+        conceptos_adicionales = conceptos_adicionales or []
+        
+        # Calcular total
+        total = len(meses_pagados) * cuota_mensual
+        total += sum(precio for _, precio in conceptos_adicionales)
+        
+        # Insertar el pago principal
+        cursor.execute(_SQL_INSERTAR_PAGO, (usuario_id, total, observaciones))
+        pago_id = cursor.lastrowid
+        
+        # Insertar mensualidades y conceptos adicionales con una sola sentencia
+        detalles = [(pago_id, 'Mensualidad', mes, anio, cuota_mensual) for mes in meses_pagados]
+        detalles.extend(
+            (pago_id, concepto, None, anio, precio) for concepto, precio in conceptos_adicionales
+        )
+        cursor.executemany(_SQL_INSERTAR_DETALLE, detalles)
+        
+        mascara = mascara_de_meses(meses_pagados)
+        if mascara:
+            cursor.execute(_SQL_MARCAR_MESES_PAGADOS, (usuario_id, anio, mascara))
+        
+        return pago_id
+    
+    def obtener_historial_pagos_usuario(self, usuario_id: int, limit: Optional[int] = None,
+                                        before_date: Optional[str] = None,
+                                        before_id: Optional[int] = None) -> List[Dict]:
+        """
+        Obtiene el historial de pagos de un usuario, del más reciente al más antiguo
+        
+        Args:
+            usuario_id: ID del usuario
+            limit: Número máximo de pagos a devolver (None = todos)
+            before_date: Solo pagos anteriores a esta fecha (para paginar)
+            before_id: ID del último pago de la página anterior; desempata
+                pagos registrados en el mismo segundo que before_date
             
-            # Insertar detalles de mensualidades
-            for mes in meses_pagados:
-                cursor.execute('''
-                    INSERT INTO detalle_pagos (pago_id, concepto, mes, anio, precio)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (pago_id, 'Mensualidad', mes, anio, cuota_mensual))
+        Returns:
+            List[Dict]: Pagos con su lista de 'detalles'
+        """
+        condiciones = ['p.usuario_id = ?']
+        parametros = [usuario_id]
+        
+        if before_date is not None:
+            if before_id is not None:
+                condiciones.append('(p.fecha_pago < ? OR (p.fecha_pago = ? AND p.id < ?))')
+                parametros.extend([before_date, before_date, before_id])
+            else:
+                condiciones.append('p.fecha_pago < ?')
+                parametros.append(before_date)
+        
+        consulta = f'''
+            SELECT p.*, u.nombre, u.numero
+            FROM pagos p
+            JOIN usuarios u ON p.usuario_id = u.id
+            WHERE {' AND '.join(condiciones)}
+            ORDER BY p.fecha_pago DESC, p.id DESC
+        '''
+        if limit is not None:
+            consulta += ' LIMIT ?'
+            parametros.append(limit)
+        
+        with self.connection() as conn:
+            cursor = conn.cursor()
             
-            # Insertar conceptos adicionales
-            if conceptos_adicionales:
-                for concepto, precio in conceptos_adicionales:
-                    cursor.execute('''
-                        INSERT INTO detalle_pagos (pago_id, concepto, mes, anio, precio)
-                        VALUES (?, ?, NULL, ?, ?)
-                    ''', (pago_id, concepto, anio, precio))
+            cursor.execute(consulta, parametros)
+            pagos = [dict(row) for row in cursor.fetchall()]
             
-            conn.commit()
-            return pago_id
+            self._adjuntar_detalles(cursor, pagos)
+            return pagos
+    
+    def obtener_ids_pagos_periodo(self, fecha_inicio: str, fecha_fin: str) -> List[int]:
+        """
+        Obtiene los IDs de los pagos registrados en un rango de fechas
+        
+        Args:
+            fecha_inicio: Fecha inicial 'AAAA-MM-DD' (inclusive)
+            fecha_fin: Fecha final 'AAAA-MM-DD' (exclusiva)
             
-        except sqlite3.Error as e:
-            print(f"Error al registrar pago: {e}")
-            conn.rollback()
-            return 0
-        finally:
-            conn.close()
+        Returns:
+            List[int]: IDs en orden de registro
+        """
+        with self.connection() as conn:
+            cursor = conn.execute('''
+                SELECT id FROM pagos
+                WHERE fecha_pago >= ? AND fecha_pago < ?
+                ORDER BY fecha_pago, id
+            ''', (fecha_inicio, fecha_fin))
+            return [row[0] for row in cursor]
     
-    def obtener_historial_pagos_usuario(self, usuario_id: int) -> List[Dict]:
-        """Obtiene el historial de pagos de un usuario"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def iterar_historial_pagos_usuario(self, usuario_id: int,
+                                       tamano_pagina: int = 50) -> Iterator[List[Dict]]:
+        """
+        Recorre el historial de pagos de un usuario por páginas, empezando por
+        los más recientes
         
-        try:
-            cursor.execute('''
-                SELECT p.*, u.nombre, u.numero
-                FROM pagos p
-                JOIN usuarios u ON p.usuario_id = u.id
-                WHERE p.usuario_id = ?
-                ORDER BY p.fecha_pago DESC
-            ''', (usuario_id,))
+        Yields:
+            List[Dict]: Página de pagos con sus detalles
+        """
+        before_date = None
+        before_id = None
+        
+        while True:
+            pagina = self.obtener_historial_pagos_usuario(
+                usuario_id, limit=tamano_pagina,
+                before_date=before_date, before_id=before_id
+            )
+            if not pagina:
+                return
             
-            rows = cursor.fetchall()
-            pagos = [dict(row) for row in rows]
+            yield pagina
             
-            # Obtener detalles de cada pago
-            for pago in pagos:
-                cursor.execute('''
-                    SELECT * FROM detalle_pagos 
-                    WHERE pago_id = ?
-                    ORDER BY mes
-                ''', (pago['id'],))
-                
-                detalles = cursor.fetchall()
-                pago['detalles'] = [dict(detalle) for detalle in detalles]
+            if len(pagina) < tamano_pagina:
+                return
+            before_date = pagina[-1]['fecha_pago']
+            before_id = pagina[-1]['id']
+    
+    def _adjuntar_detalles(self, cursor: sqlite3.Cursor, pagos: List[Dict]):
+        """Agrega la lista de 'detalles' a cada pago con una consulta por lote"""
+        por_pago = {}
+        for pago in pagos:
+            pago['detalles'] = []
+            por_pago[pago['id']] = pago['detalles']
+        
+        ids = list(por_pago)
+        # Respetar el límite de parámetros de SQLite en consultas IN (...)
+        for inicio in range(0, len(ids), 500):
+            lote = ids[inicio:inicio + 500]
+            marcadores = ', '.join('?' * len(lote))
+            cursor.execute(f'''
+                SELECT * FROM detalle_pagos
+                WHERE pago_id IN ({marcadores})
+                ORDER BY pago_id, mes, concepto, id
+            ''', lote)
             
-            return pagos
-        finally:
-            conn.close()
+            for detalle in cursor.fetchall():
+                por_pago[detalle['pago_id']].append(dict(detalle))
     
     def obtener_detalle_pago(self, pago_id: int) -> Dict:
         """Obtiene el detalle completo de un pago para generar recibo"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        try:
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
             # Obtener información del pago y usuario
             cursor.execute('''
                 SELECT p.*, u.nombre, u.numero, u.direccion
@@ -377,46 +1624,184 @@ class DatabaseManager:
             cursor.execute('''
                 SELECT * FROM detalle_pagos 
                 WHERE pago_id = ?
-                ORDER BY mes, concepto
+                ORDER BY mes, concepto, id
             ''', (pago_id,))
             
             detalles = cursor.fetchall()
             pago['detalles'] = [dict(detalle) for detalle in detalles]
             
             return pago
-        finally:
-            conn.close()
+    
+    def obtener_detalles_pagos(self, pago_ids: List[int]) -> Dict[int, Dict]:
+        """
+        Obtiene el detalle completo de varios pagos para generar recibos
+        
+        Args:
+            pago_ids: IDs de los pagos
+            
+        Returns:
+            Dict[int, Dict]: Pagos encontrados por ID, con el mismo formato
+            que obtener_detalle_pago
+        """
+        pagos = []
+        ids = list(dict.fromkeys(pago_ids))
+        
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Respetar el límite de parámetros de SQLite en consultas IN (...)
+            for inicio in range(0, len(ids), 500):
+                lote = ids[inicio:inicio + 500]
+                marcadores = ', '.join('?' * len(lote))
+                cursor.execute(f'''
+                    SELECT p.*, u.nombre, u.numero, u.direccion
+                    FROM pagos p
+                    JOIN usuarios u ON p.usuario_id = u.id
+                    WHERE p.id IN ({marcadores})
+                ''', lote)
+                pagos.extend(dict(row) for row in cursor.fetchall())
+            
+            self._adjuntar_detalles(cursor, pagos)
+        
+        return {pago['id']: pago for pago in pagos}
+    
+    # === RECIBOS GENERADOS ===
+    
+    def obtener_recibos_generados(self, pago_ids: Optional[List[int]] = None) -> Dict[int, Dict]:
+        """
+        Obtiene los recibos registrados como generados
+        
+        Args:
+            pago_ids: IDs de los pagos a consultar (todos si es None)
+            
+        Returns:
+            Dict[int, Dict]: Registro por ID de pago, con 'huella' y 'archivo'
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            if pago_ids is None:
+                cursor.execute('SELECT pago_id, huella, archivo FROM recibos_generados')
+                return {row['pago_id']: dict(row) for row in cursor.fetchall()}
+            
+            recibos = {}
+            ids = list(dict.fromkeys(pago_ids))
+            # Respetar el límite de parámetros de SQLite en consultas IN (...)
+            for inicio in range(0, len(ids), 500):
+                lote = ids[inicio:inicio + 500]
+                marcadores = ', '.join('?' * len(lote))
+                cursor.execute(f'''
+                    SELECT pago_id, huella, archivo FROM recibos_generados
+                    WHERE pago_id IN ({marcadores})
+                ''', lote)
+                recibos.update((row['pago_id'], dict(row)) for row in cursor.fetchall())
+            return recibos
+    
+    def registrar_recibos_generados(self, recibos: List[Tuple[int, str, str]]) -> bool:
+        """
+        Registra (o reemplaza) recibos generados
+        
+        Args:
+            recibos: Tuplas (pago_id, huella, archivo)
+            
+        Returns:
+            bool: True si se guardaron correctamente
+        """
+        if not recibos:
+            return True
+        
+        with self.connection() as conn:
+            try:
+                conn.executemany('''
+                    INSERT INTO recibos_generados (pago_id, huella, archivo)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT(pago_id) DO UPDATE SET
+                        huella = excluded.huella,
+                        archivo = excluded.archivo,
+                        fecha_generacion = CURRENT_TIMESTAMP
+                ''', recibos)
+                conn.commit()
+                return True
+            except sqlite3.Error as e:
+                print(f"Error al registrar recibos generados: {e}")
+                conn.rollback()
+                return False
+    
+    def eliminar_recibos_generados(self, pago_ids: List[int]) -> bool:
+        """Quita del registro los recibos de los pagos indicados"""
+        if not pago_ids:
+            return True
+        
+        with self.connection() as conn:
+            try:
+                conn.executemany('DELETE FROM recibos_generados WHERE pago_id = ?',
+                                 [(pago_id,) for pago_id in pago_ids])
+                conn.commit()
+                return True
+            except sqlite3.Error as e:
+                print(f"Error al eliminar recibos generados: {e}")
+                conn.rollback()
+                return False
     
     # === GESTIÓN DE CONFIGURACIÓN ===
     
+    def _configuracion_actual(self) -> Dict[str, str]:
+        """Obtiene la tabla de configuración en memoria, cargándola en una sola consulta"""
+        configuracion = self._configuracion
+        if configuracion is None:
+            with self.connection() as conn:
+                rows = conn.execute('SELECT clave, valor FROM configuracion').fetchall()
+            configuracion = {row['clave']: row['valor'] for row in rows}
+            self._configuracion = configuracion
+        return configuracion
+    
     def obtener_configuracion(self, clave: str) -> Optional[str]:
         """Obtiene un valor de configuración"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
+        return self._configuracion_actual().get(clave)
+    
+    def obtener_configuracion_float(self, clave: str, predeterminado: float) -> float:
+        """Obtiene un valor de configuración numérico, o el predeterminado si falta o no es válido"""
+        valor = self.obtener_configuracion(clave)
         try:
-            cursor.execute('SELECT valor FROM configuracion WHERE clave = ?', (clave,))
-            row = cursor.fetchone()
-            return row[0] if row else None
-        finally:
-            conn.close()
+            return float(valor) if valor else predeterminado
+        except ValueError:
+            return predeterminado
+    
+    def obtener_configuraciones(self, claves: List[str]) -> Dict[str, Optional[str]]:
+        """Obtiene varios valores de configuración (None para las claves inexistentes)"""
+        configuracion = self._configuracion_actual()
+        return {clave: configuracion.get(clave) for clave in claves}
     
     def actualizar_configuracion(self, clave: str, valor: str) -> bool:
         """Actualiza un valor de configuración"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        return self.actualizar_configuraciones({clave: valor})
+    
+    def actualizar_configuraciones(self, valores: Dict[str, str]) -> bool:
+        """
+        Actualiza varios valores de configuración en una sola transacción
         
-        try:
-            cursor.execute('''
-                UPDATE configuracion 
-                SET valor = ?, fecha_modificacion = CURRENT_TIMESTAMP
-                WHERE clave = ?
-            ''', (valor, clave))
+        Returns:
+            bool: True si existían y se actualizaron todas las claves
+        """
+        if not valores:
+            return False
+        
+        with self.connection() as conn:
+            cursor = conn.cursor()
             
-            conn.commit()
-            return cursor.rowcount > 0
-        finally:
-            conn.close()
+            try:
+                cursor.executemany('''
+                    UPDATE configuracion 
+                    SET valor = ?, fecha_modificacion = CURRENT_TIMESTAMP
+                    WHERE clave = ?
+                ''', [(valor, clave) for clave, valor in valores.items()])
+                actualizadas = cursor.rowcount
+                conn.commit()
+            finally:
+                # Se recarga completa en el siguiente uso
+                self._configuracion = None
+            
+            return actualizadas == len(valores)
     
     def verificar_pin(self, pin: str) -> bool:
         """Verifica si el PIN ingresado es correcto"""
@@ -427,10 +1812,9 @@ class DatabaseManager:
     
     def obtener_conceptos_cobro(self, solo_activos: bool = True) -> List[Dict]:
         """Obtiene todos los conceptos de cobro"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        try:
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
             if solo_activos:
                 cursor.execute('''
                     SELECT * FROM conceptos_cobro 
@@ -442,25 +1826,21 @@ class DatabaseManager:
             
             rows = cursor.fetchall()
             return [dict(row) for row in rows]
-        finally:
-            conn.close()
     
     def crear_concepto_cobro(self, nombre: str, precio: float) -> bool:
         """Crea un nuevo concepto de cobro"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute('''
-                INSERT INTO conceptos_cobro (nombre, precio)
-                VALUES (?, ?)
-            ''', (nombre, precio))
-            conn.commit()
-            return True
-        except sqlite3.IntegrityError:
-            return False  # Ya existe
-        finally:
-            conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            try:
+                cursor.execute('''
+                    INSERT INTO conceptos_cobro (nombre, precio)
+                    VALUES (?, ?)
+                ''', (nombre, precio))
+                conn.commit()
+                return True
+            except sqlite3.IntegrityError:
+                return False  # Ya existe
     
     def actualizar_concepto_cobro(self, concepto_id: int, nombre: str = None, 
                                  precio: float = None, activo: bool = None) -> bool:
@@ -477,10 +1857,9 @@ class DatabaseManager:
         if not campos_actualizar:
             return False
         
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        try:
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
             campos = list(campos_actualizar.keys())
             valores = list(campos_actualizar.values())
             valores.append(concepto_id)
@@ -495,8 +1874,6 @@ class DatabaseManager:
             
             conn.commit()
             return cursor.rowcount > 0
-        finally:
-            conn.close()
     
     def eliminar_concepto_cobro(self, concepto_id: int) -> bool:
         """Desactiva un concepto de cobro (no lo elimina físicamente)"""
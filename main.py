@@ -12,6 +12,7 @@ from auth import authenticate
 from user_management import UserManagementWindow
 from payment_registration import PaymentRegistrationWindow
 from configuration import ConfigurationWindow
+from reports import ReportsWindow
 
 class MainApplication:
     def __init__(self):
@@ -211,12 +212,12 @@ class MainApplication:
             1, 0
         )
         
-        # Módulo 4: Reportes (placeholder)
+        # Módulo 4: Reportes
         self.create_module_button(
             buttons_frame,
             "📊\nReportes y\nEstadísticas",
             "Generas reportes de pagos\ny estadísticas del sistema",
-            self.show_reports_placeholder,
+            self.open_reports,
             "#9b59b6",
             1, 1
         )
@@ -332,18 +333,12 @@ class MainApplication:
         except Exception as e:
             messagebox.showerror("Error", f"Error al abrir configuración: {str(e)}")
     
-    def show_reports_placeholder(self):
-        """Muestra un placeholder para el módulo de reportes"""
-        messagebox.showinfo(
-            "Módulo en Desarrollo",
-            "El módulo de Reportes y Estadísticas estará disponible en una próxima actualización.\n\n" +
-            "Características planificadas:\n" +
-            "• Reportes de pagos por período\n" +
-            "• Estadísticas de ingresos\n" +
-            "• Listados de usuarios morosos\n" +
-            "• Gráficos de tendencias\n" +
-            "• Exportación a Excel/PDF"
-        )
+    def open_reports(self):
+        """Abre el módulo de reportes y estadísticas"""
+        try:
+            ReportsWindow(self.root)
+        except Exception as e:
+            messagebox.showerror("Error", f"Error al abrir reportes: {str(e)}")
     
     def show_main_window(self):
         """Muestra la ventana principal"""
@@ -4,9 +4,12 @@
 Módulo de registro de pagos para el sistema de agua potable
 """
 
+import os
+import queue
 import tkinter as tk
 from tkinter import ttk, messagebox
-from database import get_db_manager
+from database import get_db_manager, mascara_de_meses, meses_de_mascara
+from search_controller import DebouncedSearch
 from datetime import datetime
 from typing import Dict, List, Tuple, Optional
 
@@ -27,12 +30,22 @@ class PaymentRegistrationWindow:
         self.current_user = None
         self.current_year = datetime.now().year
         self.paid_months = []
+        self.payment_calendar = {}  # Año -> máscara de meses pagados del usuario actual
         self.selected_months = []
         self.additional_concepts = []
         self.month_buttons = {}
         
+        # Recibos que se generan en segundo plano
+        self.receipt_results = queue.Queue()
+        self.pending_receipts = 0
+        
         # Configurar la interfaz
         self.setup_ui()
+        
+        # Sugerencias de nombres mientras se escribe
+        self.name_search = DebouncedSearch(self.root, self.search_users_by_name,
+                                           self.show_name_suggestions,
+                                           refinar=self.narrow_users_by_name)
     
     def setup_ui(self):
         """Configura la interfaz de usuario"""
@@ -487,13 +500,28 @@ class PaymentRegistrationWindow:
         """Maneja los cambios en la búsqueda por nombre"""
         name = self.search_name_var.get().strip()
         if len(name) < 2:
+            self.name_search.cancelar()
             self.name_suggestions.pack_forget()
             return
         
+        self.name_search.solicitar(name)
+    
+    def search_users_by_name(self, name: str, contexto=None) -> List[Dict]:
+        """
+        Busca usuarios por nombre (corre fuera del hilo de la interfaz)
+        
+        Devuelve todas las coincidencias, no solo las sugerencias visibles,
+        para poder refinarlas en memoria si el nombre sigue creciendo.
+        """
+        return get_db_manager().directorio_usuarios().buscar(name)
+    
+    def narrow_users_by_name(self, users: List[Dict], name: str, contexto=None) -> List[Dict]:
+        """Filtra en memoria la búsqueda anterior cuando el nombre solo creció"""
+        return get_db_manager().directorio_usuarios().refinar(users, name)
+    
+    def show_name_suggestions(self, name: str, users: List[Dict]):
+        """Muestra las sugerencias de una búsqueda por nombre"""
         try:
-            db = get_db_manager()
-            users = db.buscar_usuarios_por_nombre(name)
-            
             if users:
                 # Limpiar y llenar la lista de sugerencias
                 self.name_suggestions.delete(0, tk.END)
@@ -545,27 +573,38 @@ class PaymentRegistrationWindow:
         )
         
         # Limpiar campos de búsqueda
+        self.name_search.cancelar()
         self.search_number_var.set("")
         self.search_name_var.set("")
         self.name_suggestions.pack_forget()
         
-        # Cargar meses pagados
-        self.load_paid_months()
+        # Cargar los meses pagados de todos los años
+        self.load_payment_calendar()
         
         # Habilitar procesamiento de pago
         self.update_payment_button_state()
     
-    def load_paid_months(self):
-        """Carga los meses ya pagados por el usuario"""
+    def load_payment_calendar(self):
+        """Carga de una vez los meses pagados por el usuario en todos los años"""
         if not self.current_user:
             return
         
         try:
             db = get_db_manager()
-            self.paid_months = db.obtener_pagos_usuario_anio(self.current_user['id'], self.current_year)
-            self.update_month_buttons()
+            self.payment_calendar = db.obtener_calendario_pagos_usuario(self.current_user['id'])
         except Exception as e:
+            self.payment_calendar = {}
             print(f"Error al cargar meses pagados: {e}")
+        
+        self.load_paid_months()
+    
+    def load_paid_months(self):
+        """Muestra los meses ya pagados del año actual, desde el calendario en memoria"""
+        if not self.current_user:
+            return
+        
+        self.paid_months = meses_de_mascara(self.payment_calendar.get(self.current_year, 0))
+        self.update_month_buttons()
     
     # === FUNCIONES DE SELECCIÓN DE AÑO ===
     
@@ -725,8 +764,7 @@ class PaymentRegistrationWindow:
         """Actualiza la visualización de la cuota mensual"""
         try:
             db = get_db_manager()
-            monthly_fee = db.obtener_configuracion('cuota_mensual')
-            monthly_fee = float(monthly_fee) if monthly_fee else 50.0
+            monthly_fee = db.obtener_configuracion_float('cuota_mensual', 50.0)
             
             self.monthly_fee_label.config(text=f"Cuota mensual: ${monthly_fee:.2f}")
             self.monthly_fee = monthly_fee
@@ -809,6 +847,11 @@ TOTAL A PAGAR: ${total:.2f}"""
             )
             
             if pago_id > 0:
+                # Marcar los meses en el calendario en memoria
+                self.payment_calendar[self.current_year] = (
+                    self.payment_calendar.get(self.current_year, 0) | mascara_de_meses(self.selected_months)
+                )
+                
                 messagebox.showinfo("Éxito", f"Pago registrado correctamente.\nID de pago: {pago_id}")
                 
                 # Preguntar si desea generar recibo
@@ -816,7 +859,7 @@ TOTAL A PAGAR: ${total:.2f}"""
                     self.generate_receipt(pago_id)
                 
                 # Limpiar formulario
-                self.load_paid_months()  # Recargar meses pagados
+                self.load_paid_months()  # Mostrar los meses recién pagados
                 self.clear_month_selection()
                 self.additional_concepts = []
                 self.concepts_listbox.delete(0, tk.END)
@@ -830,19 +873,21 @@ TOTAL A PAGAR: ${total:.2f}"""
             messagebox.showerror("Error", f"Error al procesar el pago: {str(e)}")
     
     def generate_receipt(self, pago_id: int):
-        """Genera el recibo de pago"""
+        """
+        Solicita el recibo de pago sin bloquear la ventana
+        
+        El PDF se genera en el hilo de recibos; al terminar, el resultado
+        llega por self.receipt_results y se muestra desde check_receipts.
+        """
         try:
-            from receipt_generator import ReceiptGenerator
-            
-            generator = ReceiptGenerator()
-            pdf_path = generator.generate_receipt(pago_id)
+            from receipt_generator import get_receipt_worker
             
-            if pdf_path:
-                # Preguntar si desea abrir el PDF
-                if messagebox.askyesno("Recibo Generado", 
-                                     f"Recibo guardado en:\n{pdf_path}\n\n¿Desea abrirlo?"):
-                    import os
-                    os.startfile(pdf_path)  # Windows
+            get_receipt_worker().submit(
+                pago_id, lambda *resultado: self.receipt_results.put(resultado)
+            )
+            self.pending_receipts += 1
+            if self.pending_receipts == 1:
+                self.root.after(100, self.check_receipts)
             
         except ImportError:
             messagebox.showinfo("Módulo no disponible", 
@@ -850,10 +895,43 @@ TOTAL A PAGAR: ${total:.2f}"""
         except Exception as e:
             messagebox.showerror("Error", f"Error al generar recibo: {str(e)}")
     
+    def check_receipts(self):
+        """Muestra los recibos terminados en segundo plano"""
+        try:
+            if not self.root.winfo_exists():
+                return
+        except tk.TclError:
+            return
+        
+        try:
+            while True:
+                pago_id, pdf_path, error = self.receipt_results.get_nowait()
+                self.pending_receipts -= 1
+                self.show_receipt_ready(pago_id, pdf_path, error)
+        except queue.Empty:
+            pass
+        
+        if self.pending_receipts:
+            self.root.after(100, self.check_receipts)
+    
+    def show_receipt_ready(self, pago_id: int, pdf_path: Optional[str], error: Optional[str]):
+        """Ofrece abrir un recibo recién generado"""
+        if not pdf_path:
+            messagebox.showerror("Error", f"Error al generar el recibo del pago {pago_id}: {error}",
+                                 parent=self.root)
+            return
+        
+        # Preguntar si desea abrir el PDF
+        if messagebox.askyesno("Recibo Generado", 
+                             f"Recibo guardado en:\n{pdf_path}\n\n¿Desea abrirlo?",
+                             parent=self.root):
+            os.startfile(pdf_path)  # Windows
+    
     def clear_all(self):
         """Limpia todo el formulario"""
         self.current_user = None
         self.paid_months = []
+        self.payment_calendar = {}
         self.selected_months = []
         self.additional_concepts = []
         
@@ -863,6 +941,7 @@ TOTAL A PAGAR: ${total:.2f}"""
             fg='#7f8c8d'
         )
         
+        self.name_search.cancelar()
         self.search_number_var.set("")
         self.search_name_var.set("")
         self.name_suggestions.pack_forget()
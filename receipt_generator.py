@@ -4,9 +4,17 @@
 Generador de recibos de pago para el sistema de agua potable
 """
 
+import hashlib
+import io
+import json
 import os
+import queue
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch, mm
@@ -14,11 +22,227 @@ from reportlab.lib import colors
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 from reportlab.pdfgen import canvas
+from reportlab.lib.utils import ImageReader, simpleSplit
+from reportlab import rl_config
 from database import get_db_manager
 
+# Guardar las imágenes en binario: la codificación ASCII85 (activa por
+# omisión) se hace en Python puro y domina el tiempo de cada recibo
+rl_config.useA85 = 0
+
+try:
+    from PIL import Image as PILImage
+except ImportError:
+    PILImage = None
+
+# Logo del recibo y su tamaño en puntos
+LOGO_PATH = "logo.jpg"
+LOGO_SIZE = 60
+
+# Píxeles por punto al reducir el logo (suficiente para impresión)
+LOGO_RESOLUCION = 4
+
+# Motores de generación; se elige con la clave 'motor_recibos' de configuración
+MOTOR_CANVAS = 'canvas'
+MOTOR_PLATYPUS = 'platypus'
+MOTOR_PREDETERMINADO = MOTOR_PLATYPUS
+
+# Formatos para imprimir varios recibos en un solo trabajo
+FORMATOS_LOTE = {
+    'carta': "Carta, un recibo por hoja",
+    'carta_2': "Carta, dos recibos por hoja",
+    'termica_80': "Térmica de 80 mm",
+    'termica_58': "Térmica de 58 mm",
+}
+
+# Versión del diseño de los recibos; incrementarla cuando cambie el diseño
+# para que los recibos guardados se vuelvan a generar
+PLANTILLA_VERSION = 1
+
+# Estilos de tabla, iguales para todos los recibos
+INFO_TABLE_STYLE = TableStyle([
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),  # Primera columna en bold
+    ('FONTNAME', (2, 0), (2, -1), 'Helvetica-Bold'),  # Tercera columna en bold
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('LEFTPADDING', (0, 0), (-1, -1), 0),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 5),
+    ('TOPPADDING', (0, 0), (-1, -1), 3),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+])
+
+DETAILS_TABLE_STYLE = TableStyle([
+    # Estilo del encabezado
+    ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    
+    # Estilo del contenido
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 9),
+    ('ALIGN', (0, 1), (0, -1), 'LEFT'),    # Concepto alineado a la izquierda
+    ('ALIGN', (1, 1), (-1, -1), 'CENTER'), # Resto centrado
+    ('ALIGN', (-1, 1), (-1, -1), 'RIGHT'), # Subtotal alineado a la derecha
+    
+    # Bordes
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('LINEBELOW', (0, 0), (-1, 0), 2, colors.darkblue),
+    
+    # Padding
+    ('LEFTPADDING', (0, 0), (-1, -1), 5),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 5),
+    ('TOPPADDING', (0, 0), (-1, -1), 5),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+    
+    # Alternar colores de fila
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+])
+
+TOTALS_TABLE_STYLE = TableStyle([
+    ('FONTNAME', (0, 0), (-1, -2), 'Helvetica'),
+    ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -2), 10),
+    ('FONTSIZE', (0, -1), (-1, -1), 14),
+    ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+    ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+    ('TEXTCOLOR', (0, -1), (-1, -1), colors.darkgreen),
+    ('LINEABOVE', (0, -1), (-1, -1), 2, colors.darkgreen),
+    ('LEFTPADDING', (0, 0), (-1, -1), 5),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 5),
+    ('TOPPADDING', (0, 0), (-1, -1), 3),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+])
+
+SIGNATURE_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+])
+
+# Cachés compartidas por todos los generadores del proceso
+_estilos = None
+_logo = None
+_logo_lock = threading.Lock()
+
+
+def obtener_estilos() -> Dict[str, ParagraphStyle]:
+    """Obtiene los estilos de párrafo del recibo, creándolos una sola vez"""
+    global _estilos
+    if _estilos is None:
+        styles = getSampleStyleSheet()
+        _estilos = {
+            'styles': styles,
+            
+            # Estilo para el título
+            'title': ParagraphStyle(
+                'CustomTitle',
+                parent=styles['Heading1'],
+                fontSize=16,
+                spaceAfter=6,
+                alignment=TA_CENTER,
+                textColor=colors.darkblue
+            ),
+            
+            # Estilo para subtítulos
+            'subtitle': ParagraphStyle(
+                'CustomSubtitle',
+                parent=styles['Heading2'],
+                fontSize=12,
+                spaceAfter=12,
+                alignment=TA_CENTER,
+                textColor=colors.darkblue
+            ),
+            
+            # Estilo para información del usuario
+            'user_info': ParagraphStyle(
+                'UserInfo',
+                parent=styles['Normal'],
+                fontSize=10,
+                spaceAfter=6,
+                alignment=TA_LEFT
+            ),
+            
+            # Estilo para totales
+            'total': ParagraphStyle(
+                'Total',
+                parent=styles['Normal'],
+                fontSize=12,
+                spaceAfter=6,
+                alignment=TA_RIGHT,
+                textColor=colors.darkgreen
+            ),
+            
+            # Estilo para el pie de página
+            'footer': ParagraphStyle(
+                'Footer',
+                parent=styles['Normal'],
+                fontSize=8,
+                alignment=TA_CENTER,
+                textColor=colors.grey
+            ),
+        }
+    return _estilos
+
+
+def obtener_logo() -> Optional[bytes]:
+    """
+    Obtiene el logo ya reducido al tamaño del recibo, como JPEG en memoria
+    
+    El archivo se decodifica y reduce una sola vez; sólo se vuelve a
+    procesar si cambia su fecha de modificación.
+    
+    Returns:
+        bytes: Imagen JPEG lista para insertar, None si no hay logo
+    """
+    global _logo
+    try:
+        mtime = os.path.getmtime(LOGO_PATH)
+    except OSError:
+        return None
+    
+    with _logo_lock:
+        if _logo is None or _logo[0] != mtime:
+            datos = None
+            try:
+                if PILImage is not None:
+                    lado = LOGO_SIZE * LOGO_RESOLUCION
+                    with PILImage.open(LOGO_PATH) as imagen:
+                        # Image.Resampling existe desde Pillow 9.1
+                        lanczos = getattr(PILImage, 'Resampling', PILImage).LANCZOS
+                        imagen = imagen.convert('RGB').resize((lado, lado), lanczos)
+                        buffer = io.BytesIO()
+                        imagen.save(buffer, format='JPEG', quality=90)
+                        datos = buffer.getvalue()
+                else:
+                    with open(LOGO_PATH, 'rb') as archivo:
+                        datos = archivo.read()
+            except Exception as e:
+                print(f"Error al cargar logo: {e}")
+            _logo = (mtime, datos)
+        return _logo[1]
+
+
+def _renderizar_en_proceso(pago_data: Dict, filepath: str, motor: str) -> Tuple[int, Optional[str]]:
+    """
+    Genera un recibo dentro de un proceso de trabajo
+    
+    Returns:
+        Tuple[int, Optional[str]]: (pago_id, mensaje de error o None)
+    """
+    try:
+        get_receipt_generator().render_receipt(pago_data, filepath, motor)
+        return pago_data['id'], None
+    except Exception as e:
+        return pago_data['id'], str(e)
+
+
 class ReceiptGenerator:
     def __init__(self):
-        self.styles = getSampleStyleSheet()
+        self.styles = obtener_estilos()['styles']
         self.create_custom_styles()
         
         # Configurar directorios
@@ -26,66 +250,29 @@ class ReceiptGenerator:
         self.ensure_directories()
     
     def create_custom_styles(self):
-        """Crea estilos personalizados para el recibo"""
-        # Estilo para el título
-        self.title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=self.styles['Heading1'],
-            fontSize=16,
-            spaceAfter=6,
-            alignment=TA_CENTER,
-            textColor=colors.darkblue
-        )
-        
-        # Estilo para subtítulos
-        self.subtitle_style = ParagraphStyle(
-            'CustomSubtitle',
-            parent=self.styles['Heading2'],
-            fontSize=12,
-            spaceAfter=12,
-            alignment=TA_CENTER,
-            textColor=colors.darkblue
-        )
-        
-        # Estilo para información del usuario
-        self.user_info_style = ParagraphStyle(
-            'UserInfo',
-            parent=self.styles['Normal'],
-            fontSize=10,
-            spaceAfter=6,
-            alignment=TA_LEFT
-        )
-        
-        # Estilo para totales
-        self.total_style = ParagraphStyle(
-            'Total',
-            parent=self.styles['Normal'],
-            fontSize=12,
-            spaceAfter=6,
-            alignment=TA_RIGHT,
-            textColor=colors.darkgreen
-        )
-        
-        # Estilo para el pie de página
-        self.footer_style = ParagraphStyle(
-            'Footer',
-            parent=self.styles['Normal'],
-            fontSize=8,
-            alignment=TA_CENTER,
-            textColor=colors.grey
-        )
+        """Asigna los estilos personalizados del recibo (compartidos entre instancias)"""
+        estilos = obtener_estilos()
+        self.title_style = estilos['title']
+        self.subtitle_style = estilos['subtitle']
+        self.user_info_style = estilos['user_info']
+        self.total_style = estilos['total']
+        self.footer_style = estilos['footer']
     
     def ensure_directories(self):
         """Asegura que existan los directorios necesarios"""
         if not os.path.exists(self.receipts_dir):
             os.makedirs(self.receipts_dir)
     
-    def generate_receipt(self, pago_id: int) -> Optional[str]:
+    def generate_receipt(self, pago_id: int, forzar: bool = False) -> Optional[str]:
         """
         Genera un recibo de pago en PDF
         
+        Si el recibo ya se generó con los mismos datos, plantilla y motor,
+        se devuelve el archivo existente sin volver a generarlo.
+        
         Args:
             pago_id: ID del pago para generar el recibo
+            forzar: Generarlo aunque exista uno vigente
             
         Returns:
             str: Ruta del archivo PDF generado, None si hay error
@@ -99,31 +286,16 @@ class ReceiptGenerator:
                 print(f"No se encontró el pago con ID {pago_id}")
                 return None
             
-            # Generar nombre del archivo
-            fecha = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"recibo_{pago_data['numero']}_{fecha}.pdf"
-            filepath = os.path.join(self.receipts_dir, filename)
-            
-            # Crear el documento PDF
-            doc = SimpleDocTemplate(
-                filepath,
-                pagesize=letter,
-                rightMargin=inch,
-                leftMargin=inch,
-                topMargin=inch,
-                bottomMargin=inch
-            )
-            
-            # Construir el contenido del recibo
-            story = []
-            story.extend(self.build_header(pago_data))
-            story.extend(self.build_user_info(pago_data))
-            story.extend(self.build_payment_details(pago_data))
-            story.extend(self.build_totals(pago_data))
-            story.extend(self.build_footer(pago_data))
-            
-            # Generar el PDF
-            doc.build(story)
+            motor = self.configured_engine()
+            huella = self.receipt_fingerprint(pago_data, motor)
+            registro = db.obtener_recibos_generados([pago_id]).get(pago_id)
+            if not forzar and self._receipt_is_current(registro, huella):
+                return registro['archivo']
+            
+            filepath = self.receipt_filepath(pago_data)
+            self.render_receipt(pago_data, filepath, motor)
+            self._replace_receipt(registro, filepath)
+            db.registrar_recibos_generados([(pago_id, huella, filepath)])
             
             return filepath
             
@@ -131,15 +303,706 @@ class ReceiptGenerator:
             print(f"Error al generar recibo: {e}")
             return None
     
+    def receipt_fingerprint(self, pago_data: Dict, motor: str) -> str:
+        """
+        Huella de un recibo: datos del pago, versión de plantilla, motor y logo
+        
+        Args:
+            pago_data: Pago con el formato de obtener_detalle_pago
+            motor: Motor de generación
+            
+        Returns:
+            str: Hash SHA-256 en hexadecimal
+        """
+        try:
+            logo = os.path.getmtime(LOGO_PATH)
+        except OSError:
+            logo = None
+        
+        # Los detalles se ordenan de forma canónica para que la huella no
+        # dependa de la consulta con que se obtuvo el pago
+        pago = dict(pago_data)
+        pago['detalles'] = sorted(
+            pago_data.get('detalles', []),
+            key=lambda detalle: json.dumps(detalle, sort_keys=True, default=str)
+        )
+        
+        contenido = json.dumps(
+            {'plantilla': PLANTILLA_VERSION, 'motor': motor, 'logo': logo, 'pago': pago},
+            sort_keys=True, default=str
+        )
+        return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+    
+    def _receipt_is_current(self, registro: Optional[Dict], huella: str) -> bool:
+        """Indica si el recibo registrado corresponde a la huella y su archivo existe"""
+        return bool(registro) and registro['huella'] == huella and os.path.exists(registro['archivo'])
+    
+    def _replace_receipt(self, registro: Optional[Dict], filepath: str):
+        """Borra el archivo anterior de un recibo si tenía otro nombre"""
+        if registro and os.path.abspath(registro['archivo']) != os.path.abspath(filepath):
+            try:
+                os.remove(registro['archivo'])
+            except OSError:
+                pass
+    
+    def prune_receipts(self) -> int:
+        """
+        Elimina los recibos individuales que ya no están registrados
+        
+        Borra del directorio de recibos los archivos recibo_*.pdf que no
+        corresponden al registro de recibos generados (por ejemplo, copias
+        anteriores con fecha en el nombre) y quita del registro los recibos
+        cuyo archivo ya no existe. Los PDF consolidados no se tocan.
+        
+        Returns:
+            int: Número de archivos eliminados
+        """
+        db = get_db_manager()
+        registros = db.obtener_recibos_generados()
+        
+        faltantes = [pago_id for pago_id, registro in registros.items()
+                     if not os.path.exists(registro['archivo'])]
+        db.eliminar_recibos_generados(faltantes)
+        
+        vigentes = {
+            os.path.normcase(os.path.abspath(registro['archivo']))
+            for registro in registros.values()
+        }
+        
+        eliminados = 0
+        for nombre in os.listdir(self.receipts_dir):
+            if not (nombre.startswith('recibo_') and nombre.endswith('.pdf')):
+                continue
+            
+            ruta = os.path.abspath(os.path.join(self.receipts_dir, nombre))
+            if os.path.normcase(ruta) in vigentes:
+                continue
+            try:
+                os.remove(ruta)
+                eliminados += 1
+            except OSError as e:
+                print(f"No se pudo eliminar {ruta}: {e}")
+        
+        return eliminados
+    
+    def configured_engine(self) -> str:
+        """Motor de generación elegido en la configuración ('canvas' o 'platypus')"""
+        motor = get_db_manager().obtener_configuracion('motor_recibos')
+        return motor if motor in (MOTOR_CANVAS, MOTOR_PLATYPUS) else MOTOR_PREDETERMINADO
+    
+    def render_receipt(self, pago_data: Dict, filepath: str, motor: Optional[str] = None):
+        """
+        Escribe el PDF de un recibo a partir de los datos del pago
+        
+        Con el motor 'canvas' el recibo se dibuja directamente; si el
+        contenido no cabe en una página se usa el motor 'platypus'.
+        
+        Args:
+            pago_data: Pago con el formato de obtener_detalle_pago
+            filepath: Ruta del archivo PDF a generar
+            motor: Motor a usar (por defecto, el de la configuración)
+        """
+        motor = motor or self.configured_engine()
+        if motor == MOTOR_CANVAS and self.render_receipt_canvas(pago_data, filepath):
+            return
+        self.render_receipt_platypus(pago_data, filepath)
+    
+    def render_receipt_platypus(self, pago_data: Dict, filepath: str):
+        """Escribe el recibo con SimpleDocTemplate y flowables de platypus"""
+        # Crear el documento PDF
+        doc = SimpleDocTemplate(
+            filepath,
+            pagesize=letter,
+            rightMargin=inch,
+            leftMargin=inch,
+            topMargin=inch,
+            bottomMargin=inch
+        )
+        
+        # Construir el contenido del recibo
+        story = []
+        story.extend(self.build_header(pago_data))
+        story.extend(self.build_user_info(pago_data))
+        story.extend(self.build_payment_details(pago_data))
+        story.extend(self.build_totals(pago_data))
+        story.extend(self.build_footer(pago_data))
+        
+        # Generar el PDF
+        doc.build(story)
+    
+    def render_receipt_canvas(self, pago_data: Dict, filepath: str) -> bool:
+        """
+        Dibuja el recibo directamente sobre un canvas con coordenadas fijas
+        
+        Reproduce el diseño de render_receipt_platypus sin pasar por el
+        cálculo de flowables. El archivo sólo se escribe si todo el
+        contenido cabe en una página.
+        
+        Args:
+            pago_data: Pago con el formato de obtener_detalle_pago
+            filepath: Ruta del archivo PDF a generar
+            
+        Returns:
+            bool: True si se generó el recibo, False si no cabe en una página
+        """
+        c = canvas.Canvas(filepath, pagesize=letter)
+        if self.draw_receipt(c, pago_data, self.logo_reader()) < inch:
+            return False
+        
+        c.showPage()
+        c.save()
+        return True
+    
+    def logo_reader(self) -> Optional[ImageReader]:
+        """
+        Lector del logo para dibujarlo en un canvas
+        
+        Conviene usar el mismo lector para todos los recibos de un documento:
+        reportlab reconoce la imagen repetida y la incluye una sola vez.
+        """
+        logo_data = obtener_logo()
+        return ImageReader(io.BytesIO(logo_data)) if logo_data else None
+    
+    def draw_receipt(self, c, pago_data: Dict, logo: Optional[ImageReader] = None) -> float:
+        """
+        Dibuja un recibo en coordenadas de una página carta
+        
+        El contenido empieza en el margen superior y no se corta: quien
+        llama decide si cabe, comparando la posición final con el margen
+        inferior.
+        
+        Args:
+            c: Canvas (o formulario) donde dibujar
+            pago_data: Pago con el formato de obtener_detalle_pago
+            logo: Lector del logo, de logo_reader()
+            
+        Returns:
+            float: Posición vertical donde termina el contenido
+        """
+        ancho, alto = letter
+        izquierda = inch
+        y = alto - inch
+        
+        # Encabezado
+        if logo is not None:
+            try:
+                c.drawImage(logo, (ancho - LOGO_SIZE) / 2, y - LOGO_SIZE, LOGO_SIZE, LOGO_SIZE)
+                y -= LOGO_SIZE + 10
+            except Exception:
+                pass  # Si no se puede cargar, continuar sin logo
+        
+        y = self._canvas_title(c, "COMITÉ DE AGUA POTABLE", 16, y - 10, 6, ancho)
+        y = self._canvas_title(c, "RECIBO DE PAGO", 12, y - 8, 12, ancho)
+        y -= 20
+        
+        # Información del recibo y usuario
+        fecha_pago = datetime.strptime(pago_data['fecha_pago'], '%Y-%m-%d %H:%M:%S')
+        info_data = [
+            ['Recibo No.:', str(pago_data['id']), 'Fecha:', fecha_pago.strftime('%d/%m/%Y %H:%M')],
+            ['Usuario No.:', str(pago_data['numero']), 'Nombre:', pago_data['nombre']],
+            ['Dirección:', pago_data['direccion'] or 'No especificada', '', '']
+        ]
+        anchos = [80, 120, 60, 120]
+        x_tabla = (ancho - sum(anchos)) / 2
+        c.setFillColor(colors.black)
+        for fila in info_data:
+            x = x_tabla
+            for col, (texto, ancho_col) in enumerate(zip(fila, anchos)):
+                c.setFont('Helvetica-Bold' if col in (0, 2) else 'Helvetica', 10)
+                c.drawString(x, y - 3 - 10, texto)
+                x += ancho_col
+            y -= 18
+        y -= 20
+        
+        # Detalle del pago
+        y = self._canvas_title(c, "DETALLE DEL PAGO", 12, y - 8, 12, ancho)
+        y -= 10
+        
+        anchos = [150, 80, 80, 60, 80]
+        x_tabla = (ancho - sum(anchos)) / 2
+        filas = [['Concepto', 'Mes/Año', 'Precio', 'Cantidad', 'Subtotal']]
+        filas.extend(self.detail_rows(pago_data))
+        alto_filas = [22] + [20.8] * (len(filas) - 1)
+        
+        y_tabla = y
+        for num, (fila, alto_fila) in enumerate(zip(filas, alto_filas)):
+            fondo = colors.darkblue if num == 0 else (colors.white if num % 2 else colors.lightgrey)
+            c.setFillColor(fondo)
+            c.rect(x_tabla, y - alto_fila, sum(anchos), alto_fila, stroke=0, fill=1)
+            
+            c.setFillColor(colors.whitesmoke if num == 0 else colors.black)
+            c.setFont('Helvetica-Bold' if num == 0 else 'Helvetica', 10 if num == 0 else 9)
+            base = y - alto_fila + 5 + 2
+            x = x_tabla
+            for col, (texto, ancho_col) in enumerate(zip(fila, anchos)):
+                if num == 0 or col in (1, 2, 3):
+                    c.drawCentredString(x + ancho_col / 2, base, texto)
+                elif col == 0:
+                    c.drawString(x + 5, base, texto)
+                else:
+                    c.drawRightString(x + ancho_col - 5, base, texto)
+                x += ancho_col
+            y -= alto_fila
+        
+        # Bordes de la tabla
+        c.setStrokeColor(colors.black)
+        c.setLineWidth(1)
+        x = x_tabla
+        for ancho_col in [0] + anchos:
+            x += ancho_col
+            c.line(x, y_tabla, x, y)
+        linea = y_tabla
+        for alto_fila in [0] + alto_filas:
+            linea -= alto_fila
+            c.line(x_tabla, linea, x_tabla + sum(anchos), linea)
+        c.setStrokeColor(colors.darkblue)
+        c.setLineWidth(2)
+        c.line(x_tabla, y_tabla - alto_filas[0], x_tabla + sum(anchos), y_tabla - alto_filas[0])
+        y -= 20
+        
+        # Totales
+        totals_data = self.totals_rows(pago_data)
+        anchos = [300, 100]
+        x_tabla = (ancho - sum(anchos)) / 2
+        for num, (etiqueta, valor) in enumerate(totals_data):
+            ultima = num == len(totals_data) - 1
+            tamano = 14 if ultima else 10
+            alto_fila = tamano * 1.2 + 6
+            if ultima:
+                c.setStrokeColor(colors.darkgreen)
+                c.setLineWidth(2)
+                c.line(x_tabla, y, x_tabla + sum(anchos), y)
+                c.setFillColor(colors.darkgreen)
+            else:
+                c.setFillColor(colors.black)
+            c.setFont('Helvetica-Bold' if ultima else 'Helvetica', tamano)
+            c.drawRightString(x_tabla + anchos[0] - 5, y - 3 - tamano, etiqueta)
+            c.drawRightString(x_tabla + sum(anchos) - 5, y - 3 - tamano, valor)
+            y -= alto_fila
+        y -= 30
+        
+        # Observaciones si las hay
+        if pago_data.get('observaciones'):
+            y = self._canvas_title(c, "OBSERVACIONES:", 12, y - 8, 12, ancho)
+            c.setFillColor(colors.black)
+            c.setFont('Helvetica', 10)
+            for linea_obs in simpleSplit(pago_data['observaciones'], 'Helvetica', 10, ancho - 2 * inch):
+                y -= 12
+                c.drawString(izquierda, y, linea_obs)
+            y -= 6 + 20
+        
+        # Línea de firma
+        y -= 30
+        c.setFillColor(colors.black)
+        c.setFont('Helvetica', 10)
+        c.drawCentredString(ancho / 2, y - 12, '_' * 50)
+        y -= 18
+        c.drawString(izquierda, y - 12, "Firma del Cobrador")
+        y -= 18 + 20
+        
+        # Pie de página
+        c.setFillColor(colors.grey)
+        c.setFont('Helvetica', 8)
+        c.drawCentredString(
+            ancho / 2, y - 8,
+            f"Recibo generado el {datetime.now().strftime('%d/%m/%Y a las %H:%M')}"
+        )
+        y -= 10
+        
+        return y
+    
+    def _canvas_title(self, c, texto: str, tamano: int, y: float, espacio: float, ancho: float) -> float:
+        """Dibuja un título centrado en azul y devuelve la nueva posición vertical"""
+        c.setFillColor(colors.darkblue)
+        c.setFont('Helvetica-Bold', tamano)
+        c.drawCentredString(ancho / 2, y - tamano, texto)
+        return y - tamano * 1.2 - espacio
+    
+    def receipt_filepath(self, pago_data: Dict) -> str:
+        """Ruta determinista del recibo de un pago"""
+        filename = f"recibo_{pago_data['numero']}_{pago_data['id']}.pdf"
+        return os.path.abspath(os.path.join(self.receipts_dir, filename))
+    
+    def generate_receipts(self, pago_ids: List[int], workers: Optional[int] = None,
+                          progreso: Optional[Callable[[int, int], None]] = None,
+                          forzar: bool = False) -> Dict:
+        """
+        Genera los recibos de varios pagos en paralelo
+        
+        Los datos de todos los pagos se obtienen con una sola consulta por
+        lote y los PDF se generan en un ProcessPoolExecutor. Cada recibo se
+        guarda como recibo_{numero}_{pago_id}.pdf; los que ya están vigentes
+        en el registro de recibos generados no se vuelven a generar.
+        
+        Args:
+            pago_ids: IDs de los pagos
+            workers: Procesos a usar (por defecto, uno por CPU)
+            progreso: Función opcional llamada con (recibos_terminados, total)
+            forzar: Generar también los recibos vigentes
+            
+        Returns:
+            Dict: {'generados': {pago_id: ruta}, 'fallidos': {pago_id: error}}
+        """
+        resultado = {'generados': {}, 'fallidos': {}}
+        pago_ids = list(dict.fromkeys(pago_ids))
+        total = len(pago_ids)
+        if not total:
+            return resultado
+        
+        db = get_db_manager()
+        pagos = db.obtener_detalles_pagos(pago_ids)
+        registros = db.obtener_recibos_generados(list(pagos))
+        motor = self.configured_engine()
+        for pago_id in pago_ids:
+            if pago_id not in pagos:
+                resultado['fallidos'][pago_id] = "No se encontró el pago"
+        
+        # Separar los recibos vigentes de los que hay que generar
+        trabajos = []
+        huellas = {}
+        for pago_id, pago in pagos.items():
+            huella = self.receipt_fingerprint(pago, motor)
+            registro = registros.get(pago_id)
+            if not forzar and self._receipt_is_current(registro, huella):
+                resultado['generados'][pago_id] = registro['archivo']
+            else:
+                huellas[pago_id] = huella
+                trabajos.append((pago, self.receipt_filepath(pago)))
+        
+        terminados = len(resultado['fallidos']) + len(resultado['generados'])
+        nuevos = []
+        
+        def registrar(pago_id: int, error: Optional[str], filepath: str):
+            nonlocal terminados
+            terminados += 1
+            if error:
+                resultado['fallidos'][pago_id] = error
+            else:
+                resultado['generados'][pago_id] = filepath
+                self._replace_receipt(registros.get(pago_id), filepath)
+                nuevos.append((pago_id, huellas[pago_id], filepath))
+            if progreso:
+                progreso(terminados, total)
+        
+        workers = workers or os.cpu_count() or 1
+        if workers <= 1 or len(trabajos) <= 1:
+            # Sin paralelismo no vale la pena arrancar procesos
+            for pago_data, filepath in trabajos:
+                try:
+                    self.render_receipt(pago_data, filepath, motor)
+                    registrar(pago_data['id'], None, filepath)
+                except Exception as e:
+                    registrar(pago_data['id'], str(e), filepath)
+            db.registrar_recibos_generados(nuevos)
+            return resultado
+        
+        with ProcessPoolExecutor(max_workers=min(workers, len(trabajos))) as executor:
+            futuros = {
+                executor.submit(_renderizar_en_proceso, pago_data, filepath, motor): (pago_data['id'], filepath)
+                for pago_data, filepath in trabajos
+            }
+            for futuro in as_completed(futuros):
+                pago_id, filepath = futuros[futuro]
+                try:
+                    _, error = futuro.result()
+                except Exception as e:
+                    error = f"Error en el proceso de trabajo: {e}"
+                registrar(pago_id, error, filepath)
+        
+        db.registrar_recibos_generados(nuevos)
+        return resultado
+    
+    def _iterar_pagos(self, pago_ids: List[int], tamano_lote: int = 200) -> Iterator[Dict]:
+        """Recorre los pagos en el orden recibido, consultándolos por lotes"""
+        db = get_db_manager()
+        pago_ids = list(dict.fromkeys(pago_ids))
+        
+        for inicio in range(0, len(pago_ids), tamano_lote):
+            lote = pago_ids[inicio:inicio + tamano_lote]
+            pagos = db.obtener_detalles_pagos(lote)
+            for pago_id in lote:
+                if pago_id in pagos:
+                    yield pagos[pago_id]
+                else:
+                    print(f"No se encontró el pago con ID {pago_id}")
+    
+    def generate_consolidated_pdf(self, pago_ids: List[int], filepath: Optional[str] = None,
+                                  por_pagina: int = 1,
+                                  progreso: Optional[Callable[[int, int], None]] = None) -> Optional[str]:
+        """
+        Genera un solo PDF tamaño carta con los recibos de varios pagos
+        
+        Los pagos se consultan por lotes y se dibujan en un mismo canvas en
+        una sola pasada, de modo que se imprimen como un solo trabajo. Con
+        dos recibos por página cada uno se reduce para ocupar media hoja y
+        se marca una línea de corte.
+        
+        Args:
+            pago_ids: IDs de los pagos, en el orden en que se imprimirán
+            filepath: Ruta del PDF (por defecto, en el directorio de recibos)
+            por_pagina: Recibos por página (1 o 2)
+            progreso: Función opcional llamada con (recibos_terminados, total)
+            
+        Returns:
+            str: Ruta del archivo PDF generado, None si hay error o no hay pagos
+        """
+        if por_pagina not in (1, 2):
+            raise ValueError("por_pagina debe ser 1 o 2")
+        
+        try:
+            if filepath is None:
+                fecha = datetime.now().strftime("%Y%m%d_%H%M%S")
+                filepath = os.path.join(self.receipts_dir, f"recibos_{fecha}.pdf")
+            
+            ancho, alto = letter
+            margen = 0.5 * inch
+            alto_espacio = (alto - 2 * margen) / por_pagina
+            total = len(set(pago_ids))
+            
+            c = canvas.Canvas(filepath, pagesize=letter)
+            logo = self.logo_reader()
+            generados = 0
+            posicion = 0
+            
+            for pago_data in self._iterar_pagos(pago_ids):
+                # Dibujar el recibo en un formulario para conocer su altura
+                nombre = f"recibo_{pago_data['id']}"
+                c.beginForm(nombre, lowerx=0, lowery=-alto, upperx=ancho, uppery=alto)
+                fin = self.draw_receipt(c, pago_data, logo)
+                c.endForm()
+                
+                # Reducir sólo lo necesario para que quepa en su espacio
+                alto_contenido = alto - inch - fin
+                escala = min(1.0, (alto_espacio - 10) / alto_contenido,
+                             (ancho - 2 * margen) / (ancho - 2 * inch))
+                tope = alto - margen - posicion * alto_espacio
+                
+                c.saveState()
+                c.translate(ancho / 2 * (1 - escala), tope - escala * (alto - inch))
+                c.scale(escala, escala)
+                c.doForm(nombre)
+                c.restoreState()
+                
+                generados += 1
+                posicion += 1
+                if posicion == por_pagina:
+                    c.showPage()
+                    posicion = 0
+                else:
+                    # Línea de corte entre recibos
+                    c.saveState()
+                    c.setStrokeColor(colors.grey)
+                    c.setDash(4, 4)
+                    c.line(margen, tope - alto_espacio, ancho - margen, tope - alto_espacio)
+                    c.restoreState()
+                
+                if progreso:
+                    progreso(generados, total)
+            
+            if not generados:
+                return None
+            
+            c.save()
+            return filepath
+            
+        except Exception as e:
+            print(f"Error al generar recibos consolidados: {e}")
+            return None
+    
+    def generate_thermal_pdf(self, pago_ids: List[int], filepath: Optional[str] = None,
+                             ancho_mm: int = 80,
+                             progreso: Optional[Callable[[int, int], None]] = None) -> Optional[str]:
+        """
+        Genera los recibos de varios pagos en formato de impresora térmica
+        
+        Cada recibo ocupa una página del ancho del rollo (58 u 80 mm) y de
+        la altura justa de su contenido. Todo se genera en un solo PDF y en
+        una sola pasada.
+        
+        Args:
+            pago_ids: IDs de los pagos, en el orden en que se imprimirán
+            filepath: Ruta del PDF (por defecto, en el directorio de recibos)
+            ancho_mm: Ancho del papel en milímetros (58 u 80)
+            progreso: Función opcional llamada con (recibos_terminados, total)
+            
+        Returns:
+            str: Ruta del archivo PDF generado, None si hay error o no hay pagos
+        """
+        if ancho_mm not in (58, 80):
+            raise ValueError("ancho_mm debe ser 58 u 80")
+        
+        try:
+            if filepath is None:
+                fecha = datetime.now().strftime("%Y%m%d_%H%M%S")
+                filepath = os.path.join(self.receipts_dir, f"recibos_{ancho_mm}mm_{fecha}.pdf")
+            
+            ancho = ancho_mm * mm
+            margen = 3 * mm
+            total = len(set(pago_ids))
+            
+            c = canvas.Canvas(filepath, pagesize=(ancho, 100 * mm))
+            generados = 0
+            
+            for pago_data in self._iterar_pagos(pago_ids):
+                # El recibo se dibuja hacia abajo desde y=0 en un formulario
+                nombre = f"recibo_{pago_data['id']}"
+                c.beginForm(nombre, lowerx=0, lowery=-10000, upperx=ancho, uppery=0)
+                alto_contenido = self.draw_thermal_receipt(c, pago_data, ancho, margen)
+                c.endForm()
+                
+                alto_pagina = alto_contenido + 2 * margen
+                c.setPageSize((ancho, alto_pagina))
+                c.saveState()
+                c.translate(0, alto_pagina - margen)
+                c.doForm(nombre)
+                c.restoreState()
+                c.showPage()
+                
+                generados += 1
+                if progreso:
+                    progreso(generados, total)
+            
+            if not generados:
+                return None
+            
+            c.save()
+            return filepath
+            
+        except Exception as e:
+            print(f"Error al generar recibos térmicos: {e}")
+            return None
+    
+    def generate_batch_pdf(self, pago_ids: List[int], formato: str = 'carta',
+                           progreso: Optional[Callable[[int, int], None]] = None) -> Optional[str]:
+        """
+        Genera un solo PDF con los recibos de varios pagos en el formato dado
+        
+        Args:
+            pago_ids: IDs de los pagos, en el orden en que se imprimirán
+            formato: Clave de FORMATOS_LOTE
+            progreso: Función opcional llamada con (recibos_terminados, total)
+            
+        Returns:
+            str: Ruta del archivo PDF generado, None si hay error o no hay pagos
+        """
+        if formato not in FORMATOS_LOTE:
+            raise ValueError(f"Formato de impresión desconocido: {formato}")
+        
+        if formato.startswith('termica_'):
+            return self.generate_thermal_pdf(pago_ids, ancho_mm=int(formato[len('termica_'):]),
+                                             progreso=progreso)
+        return self.generate_consolidated_pdf(pago_ids, por_pagina=2 if formato == 'carta_2' else 1,
+                                              progreso=progreso)
+    
+    def draw_thermal_receipt(self, c, pago_data: Dict, ancho: float, margen: float) -> float:
+        """
+        Dibuja un recibo angosto para impresora térmica
+        
+        El contenido empieza en y=0 y avanza hacia abajo; no incluye el logo
+        porque las impresoras térmicas lo reproducen mal.
+        
+        Args:
+            c: Canvas (o formulario) donde dibujar
+            pago_data: Pago con el formato de obtener_detalle_pago
+            ancho: Ancho del papel en puntos
+            margen: Margen lateral en puntos
+            
+        Returns:
+            float: Altura total del contenido en puntos
+        """
+        util = ancho - 2 * margen
+        tamano = 8 if ancho >= 80 * mm else 7
+        y = 0
+        
+        def escribir(texto: str, tamano_linea: float = tamano, negrita: bool = False,
+                     centrado: bool = False):
+            nonlocal y
+            fuente = 'Helvetica-Bold' if negrita else 'Helvetica'
+            c.setFont(fuente, tamano_linea)
+            for linea in simpleSplit(texto, fuente, tamano_linea, util) or ['']:
+                y -= tamano_linea * 1.25
+                if centrado:
+                    c.drawCentredString(ancho / 2, y, linea)
+                else:
+                    c.drawString(margen, y, linea)
+        
+        def columnas(izquierda: str, derecha: str, tamano_linea: float = tamano,
+                     negrita: bool = False):
+            nonlocal y
+            fuente = 'Helvetica-Bold' if negrita else 'Helvetica'
+            c.setFont(fuente, tamano_linea)
+            ancho_derecha = c.stringWidth(derecha, fuente, tamano_linea)
+            lineas = simpleSplit(izquierda, fuente, tamano_linea, util - ancho_derecha - 4) or ['']
+            for num, linea in enumerate(lineas):
+                y -= tamano_linea * 1.25
+                c.drawString(margen, y, linea)
+                if num == 0:
+                    c.drawRightString(ancho - margen, y, derecha)
+        
+        def separador():
+            nonlocal y
+            y -= tamano * 0.6
+            c.setDash(2, 2)
+            c.line(margen, y, ancho - margen, y)
+            c.setDash()
+            y -= tamano * 0.2
+        
+        c.setFillColor(colors.black)
+        c.setStrokeColor(colors.black)
+        c.setLineWidth(0.5)
+        
+        # Encabezado
+        escribir("COMITÉ DE AGUA POTABLE", tamano + 2, negrita=True, centrado=True)
+        escribir("RECIBO DE PAGO", tamano + 1, negrita=True, centrado=True)
+        separador()
+        
+        # Información del recibo y usuario
+        fecha_pago = datetime.strptime(pago_data['fecha_pago'], '%Y-%m-%d %H:%M:%S')
+        escribir(f"Recibo No.: {pago_data['id']}")
+        escribir(f"Fecha: {fecha_pago.strftime('%d/%m/%Y %H:%M')}")
+        escribir(f"Usuario No.: {pago_data['numero']}")
+        escribir(f"Nombre: {pago_data['nombre']}")
+        escribir(f"Dirección: {pago_data['direccion'] or 'No especificada'}")
+        separador()
+        
+        # Detalle del pago
+        for concepto, periodo, precio, cantidad, subtotal in self.detail_rows(pago_data):
+            descripcion = f"{concepto} {periodo}"
+            if cantidad != '1':
+                descripcion += f" ({cantidad} x {precio})"
+            columnas(descripcion, subtotal)
+        separador()
+        
+        # Totales
+        totals_data = [fila for fila in self.totals_rows(pago_data) if fila[0]]
+        for num, (etiqueta, valor) in enumerate(totals_data):
+            ultima = num == len(totals_data) - 1
+            columnas(etiqueta, valor, tamano + 2 if ultima else tamano, negrita=ultima)
+        
+        # Observaciones si las hay
+        if pago_data.get('observaciones'):
+            separador()
+            escribir("Observaciones:", negrita=True)
+            escribir(pago_data['observaciones'])
+        
+        # Firma y pie
+        y -= tamano * 3
+        escribir('_' * 30, centrado=True)
+        escribir("Firma del Cobrador", centrado=True)
+        escribir(f"Recibo generado el {datetime.now().strftime('%d/%m/%Y a las %H:%M')}",
+                 tamano - 1, centrado=True)
+        
+        return -y
+    
     def build_header(self, pago_data: Dict) -> list:
         """Construye el encabezado del recibo"""
         elements = []
         
-        # Intentar cargar el logo
-        logo_path = "logo.jpg"
-        if os.path.exists(logo_path):
+        # Logo precargado en memoria
+        logo_data = obtener_logo()
+        if logo_data:
             try:
-                logo = Image(logo_path, width=60, height=60)
+                logo = Image(io.BytesIO(logo_data), width=LOGO_SIZE, height=LOGO_SIZE)
                 elements.append(logo)
                 elements.append(Spacer(1, 10))
             except:
@@ -172,18 +1035,7 @@ class ReceiptGenerator:
         ]
         
         info_table = Table(info_data, colWidths=[80, 120, 60, 120])
-        info_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),  # Primera columna en bold
-            ('FONTNAME', (2, 0), (2, -1), 'Helvetica-Bold'),  # Tercera columna en bold
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('LEFTPADDING', (0, 0), (-1, -1), 0),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 5),
-            ('TOPPADDING', (0, 0), (-1, -1), 3),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-        ]))
+        info_table.setStyle(INFO_TABLE_STYLE)
         
         elements.append(info_table)
         elements.append(Spacer(1, 20))
@@ -201,6 +1053,20 @@ class ReceiptGenerator:
         
         # Preparar datos para la tabla
         table_data = [['Concepto', 'Mes/Año', 'Precio', 'Cantidad', 'Subtotal']]
+        table_data.extend(self.detail_rows(pago_data))
+        
+        # Crear la tabla
+        details_table = Table(table_data, colWidths=[150, 80, 80, 60, 80])
+        details_table.setStyle(DETAILS_TABLE_STYLE)
+        
+        elements.append(details_table)
+        elements.append(Spacer(1, 20))
+        
+        return elements
+    
+    def detail_rows(self, pago_data: Dict) -> List[List[str]]:
+        """Filas de la tabla de detalle: mensualidades ordenadas y luego otros conceptos"""
+        filas = []
         
         # Agrupar detalles por tipo
         mensualidades = []
@@ -219,7 +1085,7 @@ class ReceiptGenerator:
             
             for detalle in mensualidades:
                 mes_nombre = self.get_month_name(detalle['mes'])
-                table_data.append([
+                filas.append([
                     'Cuota Mensual',
                     f"{mes_nombre} {detalle['anio']}",
                     f"${detalle['precio']:.2f}",
@@ -229,7 +1095,7 @@ class ReceiptGenerator:
         
         # Agregar otros conceptos
         for detalle in otros_conceptos:
-            table_data.append([
+            filas.append([
                 detalle['concepto'],
                 str(detalle['anio']),
                 f"${detalle['precio']:.2f}",
@@ -237,46 +1103,25 @@ class ReceiptGenerator:
                 f"${detalle['precio'] * detalle['cantidad']:.2f}"
             ])
         
-        # Crear la tabla
-        details_table = Table(table_data, colWidths=[150, 80, 80, 60, 80])
-        details_table.setStyle(TableStyle([
-            # Estilo del encabezado
-            ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            
-            # Estilo del contenido
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-            ('ALIGN', (0, 1), (0, -1), 'LEFT'),    # Concepto alineado a la izquierda
-            ('ALIGN', (1, 1), (-1, -1), 'CENTER'), # Resto centrado
-            ('ALIGN', (-1, 1), (-1, -1), 'RIGHT'), # Subtotal alineado a la derecha
-            
-            # Bordes
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('LINEBELOW', (0, 0), (-1, 0), 2, colors.darkblue),
-            
-            # Padding
-            ('LEFTPADDING', (0, 0), (-1, -1), 5),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 5),
-            ('TOPPADDING', (0, 0), (-1, -1), 5),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-            
-            # Alternar colores de fila
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
-        ]))
-        
-        elements.append(details_table)
-        elements.append(Spacer(1, 20))
-        
-        return elements
+        return filas
     
     def build_totals(self, pago_data: Dict) -> list:
         """Construye la sección de totales"""
         elements = []
         
+        totals_data = self.totals_rows(pago_data)
+        
+        # Crear tabla
+        totals_table = Table(totals_data, colWidths=[300, 100])
+        totals_table.setStyle(TOTALS_TABLE_STYLE)
+        
+        elements.append(totals_table)
+        elements.append(Spacer(1, 30))
+        
+        return elements
+    
+    def totals_rows(self, pago_data: Dict) -> List[List[str]]:
+        """Filas de la tabla de totales; la última es el total a pagar"""
         # Calcular totales por categoría
         total_mensualidades = 0
         total_otros = 0
@@ -300,27 +1145,7 @@ class ReceiptGenerator:
         totals_data.append(['', ''])  # Línea en blanco
         totals_data.append(['TOTAL A PAGAR:', f"${pago_data['total']:.2f}"])
         
-        # Crear tabla
-        totals_table = Table(totals_data, colWidths=[300, 100])
-        totals_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (-1, -2), 'Helvetica'),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -2), 10),
-            ('FONTSIZE', (0, -1), (-1, -1), 14),
-            ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-            ('TEXTCOLOR', (0, -1), (-1, -1), colors.darkgreen),
-            ('LINEABOVE', (0, -1), (-1, -1), 2, colors.darkgreen),
-            ('LEFTPADDING', (0, 0), (-1, -1), 5),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 5),
-            ('TOPPADDING', (0, 0), (-1, -1), 3),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-        ]))
-        
-        elements.append(totals_table)
-        elements.append(Spacer(1, 30))
-        
-        return elements
+        return totals_data
     
     def build_footer(self, pago_data: Dict) -> list:
         """Construye el pie del recibo"""
@@ -339,11 +1164,7 @@ class ReceiptGenerator:
         elements.append(Spacer(1, 30))
         
         signature_line = Table([['_' * 50]], colWidths=[300])
-        signature_line.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ]))
+        signature_line.setStyle(SIGNATURE_TABLE_STYLE)
         elements.append(signature_line)
         
         signature_text = Paragraph("Firma del Cobrador", self.user_info_style)
@@ -387,9 +1208,122 @@ class ReceiptGenerator:
             return False
 
 
+def comparar_motores(pago_ids: List[int], repeticiones: int = 5) -> Dict[str, float]:
+    """
+    Mide el tiempo promedio por recibo de cada motor de generación
+    
+    Cada motor genera primero todos los recibos una vez sin medir, para que
+    ninguno pague el costo de arranque del otro. Después los motores se
+    alternan en cada repetición (invirtiendo el orden) para que la carga del
+    equipo afecte a ambos por igual. Los PDF se escriben en un directorio
+    temporal que se elimina al final.
+    
+    Args:
+        pago_ids: IDs de los pagos a usar en la prueba
+        repeticiones: Veces que se genera cada recibo por motor
+        
+    Returns:
+        Dict[str, float]: Milisegundos promedio por recibo para cada motor
+    """
+    generator = get_receipt_generator()
+    pagos = list(get_db_manager().obtener_detalles_pagos(pago_ids).values())
+    if not pagos:
+        return {}
+    
+    motores = [MOTOR_PLATYPUS, MOTOR_CANVAS]
+    segundos = {motor: 0.0 for motor in motores}
+    
+    with tempfile.TemporaryDirectory() as directorio:
+        def generar(motor: str) -> float:
+            inicio = time.perf_counter()
+            for pago_data in pagos:
+                filepath = os.path.join(directorio, f"{motor}_{pago_data['id']}.pdf")
+                generator.render_receipt(pago_data, filepath, motor)
+            return time.perf_counter() - inicio
+        
+        # Calentar las cachés de estilos, logo y fuentes de ambos motores
+        for motor in motores:
+            generar(motor)
+        
+        for repeticion in range(repeticiones):
+            for motor in (motores if repeticion % 2 == 0 else reversed(motores)):
+                segundos[motor] += generar(motor)
+    
+    return {motor: total * 1000 / (repeticiones * len(pagos)) for motor, total in segundos.items()}
+
+
+class ReceiptWorker:
+    """
+    Genera recibos en un hilo de trabajo, en orden de llegada
+    
+    El callback se ejecuta en el hilo de trabajo; las ventanas de Tk deben
+    pasar el resultado a su propio hilo (por ejemplo, con una cola revisada
+    mediante root.after) antes de tocar la interfaz.
+    """
+    
+    def __init__(self, generator: Optional[ReceiptGenerator] = None):
+        self.generator = generator
+        self.cola = queue.Queue()
+        self.hilo = None
+        self._lock = threading.Lock()
+    
+    def submit(self, pago_id: int, callback: Callable[[int, Optional[str], Optional[str]], None]):
+        """
+        Encola la generación del recibo de un pago
+        
+        Args:
+            pago_id: ID del pago
+            callback: Función llamada con (pago_id, ruta del PDF o None, error o None)
+        """
+        self.cola.put((pago_id, callback))
+        
+        with self._lock:
+            if self.hilo is None or not self.hilo.is_alive():
+                self.hilo = threading.Thread(target=self._trabajar, daemon=True)
+                self.hilo.start()
+    
+    def _trabajar(self):
+        """Atiende la cola de recibos pendientes"""
+        generator = self.generator or get_receipt_generator()
+        
+        while True:
+            pago_id, callback = self.cola.get()
+            try:
+                ruta = generator.generate_receipt(pago_id)
+                error = None if ruta else "No se pudo generar el recibo"
+            except Exception as e:
+                ruta, error = None, str(e)
+            
+            try:
+                callback(pago_id, ruta, error)
+            except Exception as e:
+                print(f"Error al notificar el recibo {pago_id}: {e}")
+            finally:
+                self.cola.task_done()
+
+
+# Instancias globales del generador y del hilo de recibos
+_receipt_generator = None
+_receipt_worker = None
+
+def get_receipt_generator() -> ReceiptGenerator:
+    """Obtiene una instancia global del generador de recibos"""
+    global _receipt_generator
+    if _receipt_generator is None:
+        _receipt_generator = ReceiptGenerator()
+    return _receipt_generator
+
+def get_receipt_worker() -> ReceiptWorker:
+    """Obtiene el hilo global de generación de recibos"""
+    global _receipt_worker
+    if _receipt_worker is None:
+        _receipt_worker = ReceiptWorker()
+    return _receipt_worker
+
+
 def main():
     """Función de prueba"""
-    generator = ReceiptGenerator()
+    generator = get_receipt_generator()
     
     # Crear un pago de prueba
     db = get_db_manager()
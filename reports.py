@@ -0,0 +1,956 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Módulo de reportes y estadísticas del sistema de agua potable
+
+Cada reporte se calcula con una sola consulta agrupada sobre pagos y
+detalle_pagos. Los resultados se guardan en memoria por período y se
+descartan cuando se registra un pago que cae en ese período.
+
+Los adeudos (morosos) se calculan sobre una matriz de máscaras de 12 bits
+por usuario y año, con NumPy si está instalado.
+"""
+
+import csv
+import queue
+import threading
+import tkinter as tk
+from array import array
+from tkinter import ttk, messagebox, filedialog
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter, landscape
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from database import get_db_manager, meses_de_mascara, DatabaseManager
+from receipt_generator import get_receipt_generator, FORMATOS_LOTE
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MESES = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
+         'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+
+# Máscara con los 12 meses de un año; el bit (mes - 1) representa cada mes
+MASCARA_ANIO = (1 << 12) - 1
+
+# Cantidad de meses marcados en cada máscara posible
+BITS_POR_MASCARA = [bin(mascara).count('1') for mascara in range(MASCARA_ANIO + 1)]
+
+# Reportes que dependen de la fecha del pago; la cobranza depende del año
+# de los meses pagados
+REPORTES_POR_FECHA = ('dia', 'mes', 'concepto')
+
+
+def mascara_desde(inicio: int, anio: int) -> int:
+    """
+    Máscara de los meses de un año a partir de un mes dado
+    
+    Args:
+        inicio: Índice del primer mes (anio * 12 + mes - 1)
+        anio: Año de la máscara
+    """
+    return (MASCARA_ANIO << min(max(inicio - anio * 12, 0), 12)) & MASCARA_ANIO
+
+
+def _rango_fechas(anio: int, mes: Optional[int] = None) -> Tuple[str, str]:
+    """
+    Calcula el rango [inicio, fin) de fechas de un año o de un mes
+    
+    Se compara contra el texto de fecha_pago para aprovechar su índice.
+    """
+    if mes is None:
+        return f"{anio:04d}-01-01", f"{anio + 1:04d}-01-01"
+    if mes == 12:
+        return f"{anio:04d}-12-01", f"{anio + 1:04d}-01-01"
+    return f"{anio:04d}-{mes:02d}-01", f"{anio:04d}-{mes + 1:02d}-01"
+
+
+class ReportEngine:
+    """Calcula los reportes de ingresos y cobranza con caché por período"""
+    
+    def __init__(self, db: Optional[DatabaseManager] = None):
+        self.db = db or get_db_manager()
+        self._cache = {}  # (reporte, anio, mes) -> resultado
+        self._version = 0  # Aumenta con cada invalidación
+        self._lock = threading.Lock()
+        self.db.agregar_observador_pagos(self._al_registrar_pagos)
+        self.db.agregar_observador_usuarios(self._al_modificar_usuarios)
+        self.db.agregar_observador_caches(self.invalidar)
+    
+    def invalidar(self):
+        """Descarta todos los reportes en memoria"""
+        with self._lock:
+            self._cache.clear()
+            self._version += 1
+    
+    def _al_registrar_pagos(self, periodos: set):
+        """
+        Descarta los reportes de los períodos afectados por pagos nuevos
+        
+        Args:
+            periodos: Tuplas (fecha 'AAAA-MM-DD' del pago, año de los detalles)
+        """
+        fechas = set()
+        anios = set()
+        for fecha, anio in periodos:
+            fechas.add((int(fecha[:4]), int(fecha[5:7])))
+            anios.add(anio)
+        
+        with self._lock:
+            self._version += 1
+            for clave in list(self._cache):
+                reporte, anio, mes = clave
+                if reporte in REPORTES_POR_FECHA:
+                    afectado = any(anio == a and mes in (None, m) for a, m in fechas)
+                elif reporte == 'cobranza_alta':
+                    # Un pago puede adelantar el alta de un usuario en años posteriores
+                    afectado = any(anio >= a for a in anios)
+                else:
+                    afectado = anio in anios
+                if afectado:
+                    del self._cache[clave]
+    
+    def _al_modificar_usuarios(self):
+        """Descarta las tasas de cobranza, que dependen de cuántos usuarios están activos"""
+        with self._lock:
+            self._version += 1
+            for clave in list(self._cache):
+                if clave[0] not in REPORTES_POR_FECHA:
+                    del self._cache[clave]
+    
+    def _consultar(self, clave: Tuple[str, int, Optional[int]], calcular) -> object:
+        """Devuelve el reporte de la caché o lo calcula y lo guarda"""
+        with self._lock:
+            if clave in self._cache:
+                return self._cache[clave]
+            version = self._version
+        
+        resultado = calcular()
+        
+        # Si llegaron pagos mientras se calculaba, el resultado puede estar
+        # incompleto: se devuelve pero no se guarda
+        with self._lock:
+            if version == self._version:
+                self._cache[clave] = resultado
+        return resultado
+    
+    def ingresos_por_dia(self, anio: int, mes: int) -> List[Dict]:
+        """
+        Obtiene los ingresos de cada día de un mes
+        
+        Returns:
+            List[Dict]: Filas con fecha, pagos y total, en orden de fecha
+        """
+        def calcular():
+            inicio, fin = _rango_fechas(anio, mes)
+            with self.db.connection(perfil='reporting') as conn:
+                cursor = conn.execute('''
+                    SELECT substr(fecha_pago, 1, 10) AS fecha,
+                           COUNT(*) AS pagos,
+                           SUM(total) AS total
+                    FROM pagos
+                    WHERE fecha_pago >= ? AND fecha_pago < ?
+                    GROUP BY substr(fecha_pago, 1, 10)
+                    ORDER BY fecha
+                ''', (inicio, fin))
+                return [dict(row) for row in cursor]
+        
+        return self._consultar(('dia', anio, mes), calcular)
+    
+    def ingresos_por_mes(self, anio: int) -> List[Dict]:
+        """
+        Obtiene los ingresos de cada mes de un año
+        
+        Returns:
+            List[Dict]: Filas con mes (1-12), pagos y total, en orden de mes
+        """
+        def calcular():
+            inicio, fin = _rango_fechas(anio)
+            with self.db.connection(perfil='reporting') as conn:
+                cursor = conn.execute('''
+                    SELECT CAST(substr(fecha_pago, 6, 2) AS INTEGER) AS mes,
+                           COUNT(*) AS pagos,
+                           SUM(total) AS total
+                    FROM pagos
+                    WHERE fecha_pago >= ? AND fecha_pago < ?
+                    GROUP BY mes
+                    ORDER BY mes
+                ''', (inicio, fin))
+                return [dict(row) for row in cursor]
+        
+        return self._consultar(('mes', anio, None), calcular)
+    
+    def ingresos_por_concepto(self, anio: int, mes: Optional[int] = None) -> List[Dict]:
+        """
+        Obtiene los ingresos por concepto de un año o de un mes
+        
+        Returns:
+            List[Dict]: Filas con concepto, cantidad y total, de mayor a menor total
+        """
+        def calcular():
+            inicio, fin = _rango_fechas(anio, mes)
+            with self.db.connection(perfil='reporting') as conn:
+                cursor = conn.execute('''
+                    SELECT dp.concepto,
+                           SUM(COALESCE(dp.cantidad, 1)) AS cantidad,
+                           SUM(dp.precio * COALESCE(dp.cantidad, 1)) AS total
+                    FROM pagos p
+                    JOIN detalle_pagos dp ON dp.pago_id = p.id
+                    WHERE p.fecha_pago >= ? AND p.fecha_pago < ?
+                    GROUP BY dp.concepto
+                    ORDER BY total DESC
+                ''', (inicio, fin))
+                return [dict(row) for row in cursor]
+        
+        return self._consultar(('concepto', anio, mes), calcular)
+    
+    def tasa_cobranza(self, anio: int, fecha_corte: Optional[datetime] = None,
+                      desde_alta: bool = False) -> Dict:
+        """
+        Calcula qué parte de las mensualidades vencidas de un año pagaron los usuarios activos
+        
+        Los meses esperados son los mismos que cobra DelinquencyEngine: hasta
+        el mes de la fecha de corte y, con desde_alta, desde el alta de cada
+        usuario.
+        
+        Args:
+            anio: Año a revisar
+            fecha_corte: Fecha hasta la que se cobran meses (por defecto, hoy)
+            desde_alta: Contar a cada usuario solo desde su alta
+        
+        Returns:
+            Dict: usuarios_activos, meses_pagados, meses_esperados, tasa (0-1),
+                por_mes con los usuarios que pagaron cada mes vencido y
+                esperados_por_mes con los que debían pagarlo
+        """
+        fecha_corte = fecha_corte or datetime.now()
+        reporte = 'cobranza_alta' if desde_alta else 'cobranza'
+        
+        def calcular():
+            morosidad = DelinquencyEngine(self.db)
+            usuarios = self.db.directorio_usuarios().todos('Activo')
+            inicios = morosidad.meses_inicio(usuarios, desde_alta)
+            esperada = morosidad.mascaras_esperadas(anio, anio, fecha_corte)[0]
+            pagadas = {
+                usuario_id: mascara & MASCARA_ANIO
+                for usuario_id, _, mascara in self.db.obtener_estado_mensual_rango(anio, anio)
+            }
+            
+            por_mes = {mes: 0 for mes in range(1, 13)}
+            esperados_por_mes = {mes: 0 for mes in range(1, 13)}
+            pagados = esperados = 0
+            for usuario, inicio in zip(usuarios, inicios):
+                debidos = esperada & mascara_desde(inicio, anio)
+                pagada = pagadas.get(usuario['id'], 0)
+                esperados += BITS_POR_MASCARA[debidos]
+                pagados += BITS_POR_MASCARA[debidos & pagada]
+                for mes in meses_de_mascara(debidos):
+                    esperados_por_mes[mes] += 1
+                    if pagada >> (mes - 1) & 1:
+                        por_mes[mes] += 1
+            
+            return {
+                'anio': anio,
+                'usuarios_activos': len(usuarios),
+                'meses_pagados': pagados,
+                'meses_esperados': esperados,
+                'tasa': pagados / esperados if esperados else 0.0,
+                'por_mes': por_mes,
+                'esperados_por_mes': esperados_por_mes,
+            }
+        
+        # En el año en curso los meses esperados cambian con el mes de corte
+        mes_corte = fecha_corte.month if anio == fecha_corte.year else None
+        return self._consultar((reporte, anio, mes_corte), calcular)
+
+
+def describir_adeudos(adeudos: Dict[int, List[int]]) -> str:
+    """Describe los meses adeudados, p. ej. '2024: Ene, Feb; 2025: Mar'"""
+    return '; '.join(
+        f"{anio}: {', '.join(MESES[mes - 1][:3] for mes in meses)}"
+        for anio, meses in sorted(adeudos.items())
+    )
+
+
+class DelinquencyEngine:
+    """
+    Calcula los meses y montos que adeudan los usuarios activos
+    
+    Las máscaras de meses pagados de estado_mensual se cargan con una sola
+    consulta en una matriz (una fila por usuario, una columna por año). Los
+    adeudos son los bits esperados que no están pagados; opcionalmente solo
+    se cobra desde el alta de cada usuario (ver meses_inicio).
+    """
+    
+    def __init__(self, db: Optional[DatabaseManager] = None):
+        self.db = db or get_db_manager()
+    
+    @staticmethod
+    def mascaras_esperadas(anio_inicio: int, anio_fin: int, fecha_corte: datetime) -> List[int]:
+        """
+        Calcula los meses que debían estar pagados en cada año del rango
+        
+        Se cobran todos los meses hasta el mes de la fecha de corte, inclusive.
+        """
+        mascaras = []
+        for anio in range(anio_inicio, anio_fin + 1):
+            if anio < fecha_corte.year:
+                mascaras.append(MASCARA_ANIO)
+            elif anio == fecha_corte.year:
+                mascaras.append((1 << fecha_corte.month) - 1)
+            else:
+                mascaras.append(0)
+        return mascaras
+    
+    @staticmethod
+    def mes_registro(usuario: Dict) -> int:
+        """
+        Mes de registro de un usuario como índice absoluto (anio * 12 + mes - 1)
+        
+        Returns:
+            int: Índice del mes de alta, o 0 si no tiene una fecha válida
+                (entonces se cobran todos los meses del rango)
+        """
+        fecha = str(usuario.get('fecha_registro') or '')
+        try:
+            return int(fecha[:4]) * 12 + int(fecha[5:7]) - 1
+        except ValueError:
+            return 0
+    
+    def meses_inicio(self, usuarios: List[Dict], desde_alta: bool = False) -> List[int]:
+        """
+        Calcula desde qué mes se le cobra a cada usuario
+        
+        fecha_registro es el momento en que se capturó el usuario; en un
+        padrón importado es el día de la importación aunque haya pagos de años
+        anteriores. Por eso el alta es el mes de registro o el primer mes
+        pagado, el que sea anterior.
+        
+        Args:
+            usuarios: Usuarios a revisar
+            desde_alta: Si es False se cobra desde el inicio del rango a todos
+            
+        Returns:
+            List[int]: Índice del mes (anio * 12 + mes - 1) por usuario, en el
+                mismo orden; 0 cobra todos los meses del rango
+        """
+        if not desde_alta:
+            return [0] * len(usuarios)
+        
+        primeros = self.db.obtener_primeros_meses_pagados()
+        inicios = []
+        for usuario in usuarios:
+            inicio = self.mes_registro(usuario)
+            primero = primeros.get(usuario['id'])
+            inicios.append(inicio if primero is None else min(inicio, primero))
+        return inicios
+    
+    def calcular(self, anio_inicio: int, anio_fin: int,
+                 fecha_corte: Optional[datetime] = None,
+                 desde_alta: bool = False) -> List[Dict]:
+        """
+        Calcula los adeudos de todos los usuarios activos en un rango de años
+        
+        Args:
+            anio_inicio: Primer año a revisar
+            anio_fin: Último año a revisar (inclusive)
+            fecha_corte: Fecha hasta la que se cobran meses (por defecto, hoy)
+            desde_alta: Cobrar a cada usuario solo desde su alta (ver meses_inicio)
+            
+        Returns:
+            List[Dict]: Usuarios con adeudos, con sus datos más meses_adeudados,
+                monto y adeudos ({anio: [meses]}); de mayor a menor adeudo
+        """
+        if anio_inicio > anio_fin:
+            raise ValueError("El año inicial no puede ser mayor que el final")
+        
+        fecha_corte = fecha_corte or datetime.now()
+        usuarios = self.db.directorio_usuarios().todos('Activo')
+        if not usuarios:
+            return []
+        
+        esperadas = self.mascaras_esperadas(anio_inicio, anio_fin, fecha_corte)
+        pagados = self.db.obtener_estado_mensual_rango(anio_inicio, anio_fin)
+        cuota_mensual = self.db.obtener_configuracion_float('cuota_mensual', 50.0)
+        
+        inicios = self.meses_inicio(usuarios, desde_alta)
+        
+        calcular_adeudos = self._adeudos_numpy if np is not None else self._adeudos_array
+        adeudos, conteos = calcular_adeudos(usuarios, inicios, anio_inicio, esperadas, pagados)
+        
+        morosos = []
+        for usuario, mascaras, conteo in zip(usuarios, adeudos, conteos):
+            if not conteo:
+                continue
+            usuario['meses_adeudados'] = conteo
+            usuario['monto'] = conteo * cuota_mensual
+            usuario['adeudos'] = {
+                anio_inicio + columna: meses_de_mascara(mascara)
+                for columna, mascara in enumerate(mascaras) if mascara
+            }
+            morosos.append(usuario)
+        
+        morosos.sort(key=lambda u: (-u['meses_adeudados'], u['numero']))
+        return morosos
+    
+    @staticmethod
+    def _adeudos_numpy(usuarios: List[Dict], inicios: List[int], anio_inicio: int,
+                       esperadas: List[int],
+                       pagados: List[Tuple[int, int, int]]) -> Tuple[List[List[int]], List[int]]:
+        """Calcula las máscaras adeudadas y su conteo con operaciones sobre la matriz"""
+        ids = np.array([u['id'] for u in usuarios], dtype=np.int64)
+        pagadas = np.zeros((len(usuarios), len(esperadas)), dtype=np.uint16)
+        
+        if pagados:
+            datos = np.array(pagados, dtype=np.int64)
+            
+            # Traducir usuario_id a fila; los usuarios no activos quedan en -1
+            filas_por_id = np.full(max(int(ids.max()), int(datos[:, 0].max())) + 1, -1, dtype=np.int64)
+            filas_por_id[ids] = np.arange(len(ids))
+            filas = filas_por_id[datos[:, 0]]
+            
+            # Hay una sola fila por usuario y año, así que basta con asignar
+            validos = filas >= 0
+            pagadas[filas[validos], datos[validos, 1] - anio_inicio] = datos[validos, 2] & MASCARA_ANIO
+        
+        # Meses desde el registro: se recorre la máscara del año tantos bits
+        # como meses del año pasaron antes del alta
+        primeros = np.arange(anio_inicio, anio_inicio + len(esperadas), dtype=np.int64) * 12
+        recorrido = np.clip(np.array(inicios, dtype=np.int64)[:, None] - primeros[None, :], 0, 12)
+        desde_registro = (np.left_shift(MASCARA_ANIO, recorrido) & MASCARA_ANIO).astype(np.uint16)
+        
+        adeudos = np.array(esperadas, dtype=np.uint16) & desde_registro & ~pagadas
+        conteos = np.array(BITS_POR_MASCARA, dtype=np.uint8)[adeudos].sum(axis=1)
+        return adeudos.tolist(), conteos.tolist()
+    
+    @staticmethod
+    def _adeudos_array(usuarios: List[Dict], inicios: List[int], anio_inicio: int,
+                       esperadas: List[int], pagados: List[Tuple[int, int, int]]) -> Tuple[List[List[int]], List[int]]:
+        """Calcula las máscaras adeudadas y su conteo sin NumPy"""
+        columnas = len(esperadas)
+        filas_por_id = {u['id']: fila for fila, u in enumerate(usuarios)}
+        pagadas = array('H', bytes(2 * len(usuarios) * columnas))
+        
+        for usuario_id, anio, mascara in pagados:
+            fila = filas_por_id.get(usuario_id)
+            if fila is not None:
+                pagadas[fila * columnas + anio - anio_inicio] = mascara & MASCARA_ANIO
+        
+        adeudos = []
+        for fila, mes_alta in enumerate(inicios):
+            base = fila * columnas
+            adeudos.append([
+                esperada & ~pagadas[base + columna] & mascara_desde(mes_alta, anio_inicio + columna)
+                for columna, esperada in enumerate(esperadas)
+            ])
+        conteos = [sum(BITS_POR_MASCARA[mascara] for mascara in fila) for fila in adeudos]
+        return adeudos, conteos
+    
+    def exportar_csv(self, morosos: List[Dict], ruta: str):
+        """Exporta la lista de morosos a CSV (UTF-8 con BOM, legible en Excel)"""
+        with open(ruta, 'w', newline='', encoding='utf-8-sig') as archivo:
+            writer = csv.writer(archivo)
+            writer.writerow(['numero', 'nombre', 'direccion', 'telefono',
+                             'meses_adeudados', 'monto', 'detalle'])
+            for usuario in morosos:
+                writer.writerow([
+                    usuario['numero'],
+                    usuario['nombre'],
+                    usuario.get('direccion') or '',
+                    usuario.get('telefono') or '',
+                    usuario['meses_adeudados'],
+                    f"{usuario['monto']:.2f}",
+                    describir_adeudos(usuario['adeudos'])
+                ])
+    
+    def exportar_pdf(self, morosos: List[Dict], ruta: str, titulo: str = "Usuarios con Adeudos"):
+        """Exporta la lista de morosos a PDF como una tabla"""
+        estilos = getSampleStyleSheet()
+        doc = SimpleDocTemplate(ruta, pagesize=landscape(letter),
+                                leftMargin=0.5 * inch, rightMargin=0.5 * inch,
+                                topMargin=0.5 * inch, bottomMargin=0.5 * inch)
+        
+        filas = [['Núm.', 'Nombre', 'Teléfono', 'Meses', 'Monto', 'Meses adeudados']]
+        for usuario in morosos:
+            filas.append([
+                str(usuario['numero']),
+                Paragraph(escape(usuario['nombre']), estilos['BodyText']),
+                usuario.get('telefono') or '',
+                str(usuario['meses_adeudados']),
+                f"${usuario['monto']:.2f}",
+                Paragraph(describir_adeudos(usuario['adeudos']), estilos['BodyText'])
+            ])
+        
+        tabla = Table(filas, colWidths=[0.6 * inch, 2.4 * inch, 1.2 * inch, 0.7 * inch, 1 * inch, 4.1 * inch],
+                      repeatRows=1)
+        tabla.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#9b59b6')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('ALIGN', (3, 1), (4, -1), 'RIGHT'),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f4ecf7')]),
+        ]))
+        
+        total = sum(usuario['monto'] for usuario in morosos)
+        doc.build([
+            Paragraph(titulo, estilos['Title']),
+            Paragraph(f"Generado el {datetime.now().strftime('%d/%m/%Y %H:%M')} • "
+                      f"{len(morosos)} usuarios • Total adeudado: ${total:.2f}", estilos['Normal']),
+            Spacer(1, 0.2 * inch),
+            tabla
+        ])
+
+
+# Instancia global del motor de reportes
+_report_engine = None
+
+def get_report_engine() -> ReportEngine:
+    """Obtiene una instancia global del motor de reportes"""
+    global _report_engine
+    if _report_engine is None:
+        _report_engine = ReportEngine()
+    return _report_engine
+
+
+class ReportsWindow:
+    def __init__(self, parent=None):
+        # Crear ventana principal o usar la proporcionada
+        if parent:
+            self.root = tk.Toplevel(parent)
+        else:
+            self.root = tk.Tk()
+        
+        self.root.title("Reportes y Estadísticas")
+        self.root.geometry("1000x700")
+        self.root.resizable(True, True)
+        
+        # Variables
+        self.engine = get_report_engine()
+        self.delinquency = DelinquencyEngine()
+        self.delinquents = []
+        self.year_var = tk.IntVar(value=datetime.now().year)
+        self.from_year_var = tk.IntVar(value=datetime.now().year)
+        self.since_signup_var = tk.BooleanVar(value=False)
+        self.month_var = tk.StringVar(value=MESES[datetime.now().month - 1])
+        self.print_format_var = tk.StringVar(value=FORMATOS_LOTE['carta'])
+        self.print_results = queue.Queue()
+        
+        # Configurar la interfaz
+        self.setup_ui()
+        
+        # Cargar datos iniciales
+        self.load_reports()
+    
+    def setup_ui(self):
+        """Configura la interfaz de usuario"""
+        main_frame = tk.Frame(self.root)
+        main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        # Título
+        title_label = tk.Label(
+            main_frame,
+            text="Reportes y Estadísticas",
+            font=('Arial', 16, 'bold'),
+            fg='#2c3e50'
+        )
+        title_label.pack(pady=(0, 10))
+        
+        self.create_period_section(main_frame)
+        
+        # Crear notebook con pestañas
+        self.notebook = ttk.Notebook(main_frame)
+        self.notebook.pack(fill=tk.BOTH, expand=True)
+        
+        self.monthly_tree = self.create_report_tab(
+            "Ingresos por Mes",
+            (('mes', 'Mes', 150), ('pagos', 'Pagos', 100), ('total', 'Total', 120))
+        )
+        self.daily_tree = self.create_report_tab(
+            "Ingresos por Día",
+            (('fecha', 'Fecha', 150), ('pagos', 'Pagos', 100), ('total', 'Total', 120))
+        )
+        self.create_batch_print_controls(self.daily_tree)
+        self.concepts_tree = self.create_report_tab(
+            "Ingresos por Concepto",
+            (('concepto', 'Concepto', 250), ('cantidad', 'Cantidad', 100), ('total', 'Total', 120))
+        )
+        self.collection_tree = self.create_report_tab(
+            "Cobranza",
+            (('mes', 'Mes', 150), ('pagados', 'Usuarios al Corriente', 160), ('tasa', 'Cobranza', 120))
+        )
+        self.create_delinquency_tab()
+        
+        self.summary_label = tk.Label(main_frame, text="", font=('Arial', 11, 'bold'), fg='#2c3e50')
+        self.summary_label.pack(anchor='w', pady=(10, 0))
+        
+        # Botón cerrar
+        buttons_frame = tk.Frame(main_frame)
+        buttons_frame.pack(fill=tk.X, pady=(10, 0))
+        
+        close_btn = tk.Button(
+            buttons_frame,
+            text="Cerrar",
+            command=self.root.destroy,
+            bg='#95a5a6',
+            fg='white',
+            font=('Arial', 12),
+            height=2
+        )
+        close_btn.pack(side=tk.RIGHT)
+    
+    def create_period_section(self, parent):
+        """Crea los controles para elegir el período"""
+        period_frame = tk.LabelFrame(parent, text="Período", font=('Arial', 12, 'bold'))
+        period_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        inner_frame = tk.Frame(period_frame)
+        inner_frame.pack(fill=tk.X, padx=10, pady=10)
+        
+        tk.Label(inner_frame, text="Año:", font=('Arial', 11)).pack(side=tk.LEFT)
+        year_spin = tk.Spinbox(
+            inner_frame,
+            from_=2000,
+            to=2100,
+            textvariable=self.year_var,
+            width=6,
+            font=('Arial', 11),
+            command=self.load_reports
+        )
+        year_spin.pack(side=tk.LEFT, padx=(5, 15))
+        year_spin.bind('<Return>', lambda e: self.load_reports())
+        
+        tk.Label(inner_frame, text="Mes:", font=('Arial', 11)).pack(side=tk.LEFT)
+        month_combo = ttk.Combobox(
+            inner_frame,
+            textvariable=self.month_var,
+            values=MESES,
+            state='readonly',
+            width=12
+        )
+        month_combo.pack(side=tk.LEFT, padx=(5, 15))
+        month_combo.bind('<<ComboboxSelected>>', lambda e: self.load_reports())
+        
+        refresh_btn = tk.Button(
+            inner_frame,
+            text="Actualizar",
+            command=self.refresh_reports,
+            bg='#9b59b6',
+            fg='white',
+            font=('Arial', 10, 'bold')
+        )
+        refresh_btn.pack(side=tk.LEFT)
+    
+    def create_report_tab(self, title: str, columns: Tuple[Tuple[str, str, int], ...]) -> ttk.Treeview:
+        """Crea una pestaña con una tabla para un reporte"""
+        tab_frame = tk.Frame(self.notebook)
+        self.notebook.add(tab_frame, text=title)
+        
+        tree = ttk.Treeview(tab_frame, columns=[c[0] for c in columns], show='headings')
+        for column, heading, width in columns:
+            tree.heading(column, text=heading)
+            tree.column(column, width=width, anchor='w' if column == 'concepto' else 'center')
+        
+        v_scrollbar = ttk.Scrollbar(tab_frame, orient=tk.VERTICAL, command=tree.yview)
+        tree.configure(yscrollcommand=v_scrollbar.set)
+        
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(10, 0), pady=10)
+        v_scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=10)
+        return tree
+    
+    def create_batch_print_controls(self, tree: ttk.Treeview):
+        """Agrega a la pestaña de ingresos por día los controles para imprimir sus recibos"""
+        controls_frame = tk.Frame(tree.master)
+        controls_frame.pack(fill=tk.X, padx=10, pady=(10, 0), before=tree)
+        
+        tk.Label(controls_frame, text="Formato:", font=('Arial', 11)).pack(side=tk.LEFT)
+        format_combo = ttk.Combobox(
+            controls_frame,
+            textvariable=self.print_format_var,
+            values=list(FORMATOS_LOTE.values()),
+            state='readonly',
+            width=26
+        )
+        format_combo.pack(side=tk.LEFT, padx=(5, 10))
+        
+        self.print_btn = tk.Button(
+            controls_frame,
+            text="Imprimir Recibos",
+            command=self.print_receipts,
+            bg='#3498db',
+            fg='white',
+            font=('Arial', 10, 'bold')
+        )
+        self.print_btn.pack(side=tk.LEFT)
+        
+        tk.Label(controls_frame, text="Días seleccionados, o todo el mes si no hay selección",
+                 font=('Arial', 10), fg='#7f8c8d').pack(side=tk.LEFT, padx=(10, 0))
+    
+    def create_delinquency_tab(self):
+        """Crea la pestaña de usuarios con adeudos"""
+        tab_frame = tk.Frame(self.notebook)
+        self.notebook.add(tab_frame, text="Morosos")
+        
+        controls_frame = tk.Frame(tab_frame)
+        controls_frame.pack(fill=tk.X, padx=10, pady=(10, 0))
+        
+        tk.Label(controls_frame, text="Adeudos desde el año:", font=('Arial', 11)).pack(side=tk.LEFT)
+        from_spin = tk.Spinbox(
+            controls_frame,
+            from_=2000,
+            to=2100,
+            textvariable=self.from_year_var,
+            width=6,
+            font=('Arial', 11),
+            command=self.load_delinquents
+        )
+        from_spin.pack(side=tk.LEFT, padx=(5, 5))
+        from_spin.bind('<Return>', lambda e: self.load_delinquents())
+        
+        tk.Label(controls_frame, text="hasta el año del período", font=('Arial', 10),
+                 fg='#7f8c8d').pack(side=tk.LEFT)
+        
+        since_signup_check = tk.Checkbutton(
+            controls_frame,
+            text="Cobrar desde el alta de cada usuario",
+            variable=self.since_signup_var,
+            command=self.load_reports,
+            font=('Arial', 10)
+        )
+        since_signup_check.pack(side=tk.LEFT, padx=(15, 0))
+        
+        pdf_btn = tk.Button(
+            controls_frame,
+            text="Exportar PDF",
+            command=self.export_delinquents_pdf,
+            bg='#e74c3c',
+            fg='white',
+            font=('Arial', 10)
+        )
+        pdf_btn.pack(side=tk.RIGHT)
+        
+        csv_btn = tk.Button(
+            controls_frame,
+            text="Exportar CSV",
+            command=self.export_delinquents_csv,
+            bg='#27ae60',
+            fg='white',
+            font=('Arial', 10)
+        )
+        csv_btn.pack(side=tk.RIGHT, padx=5)
+        
+        tree_frame = tk.Frame(tab_frame)
+        tree_frame.pack(fill=tk.BOTH, expand=True)
+        
+        columns = ('numero', 'nombre', 'meses', 'monto', 'detalle')
+        self.delinquents_tree = ttk.Treeview(tree_frame, columns=columns, show='headings')
+        
+        self.delinquents_tree.heading('numero', text='Número')
+        self.delinquents_tree.heading('nombre', text='Nombre')
+        self.delinquents_tree.heading('meses', text='Meses')
+        self.delinquents_tree.heading('monto', text='Adeudo')
+        self.delinquents_tree.heading('detalle', text='Meses Adeudados')
+        
+        self.delinquents_tree.column('numero', width=70, anchor='center')
+        self.delinquents_tree.column('nombre', width=220)
+        self.delinquents_tree.column('meses', width=70, anchor='center')
+        self.delinquents_tree.column('monto', width=100, anchor='center')
+        self.delinquents_tree.column('detalle', width=400)
+        
+        v_scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.delinquents_tree.yview)
+        self.delinquents_tree.configure(yscrollcommand=v_scrollbar.set)
+        
+        self.delinquents_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(10, 0), pady=10)
+        v_scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=10)
+    
+    def fill_tree(self, tree: ttk.Treeview, rows: List[tuple]):
+        """Reemplaza las filas de una tabla"""
+        tree.delete(*tree.get_children())
+        for row in rows:
+            tree.insert('', 'end', values=row)
+    
+    def refresh_reports(self):
+        """Vuelve a calcular los reportes desde la base de datos"""
+        self.engine.invalidar()
+        self.load_reports()
+    
+    def load_reports(self):
+        """Muestra los reportes del período seleccionado"""
+        try:
+            anio = int(self.year_var.get())
+        except (tk.TclError, ValueError):
+            messagebox.showerror("Error", "Ingrese un año válido", parent=self.root)
+            return
+        mes = MESES.index(self.month_var.get()) + 1
+        
+        try:
+            mensual = self.engine.ingresos_por_mes(anio)
+            diario = self.engine.ingresos_por_dia(anio, mes)
+            conceptos = self.engine.ingresos_por_concepto(anio, mes)
+            cobranza = self.engine.tasa_cobranza(anio, desde_alta=self.since_signup_var.get())
+        except Exception as e:
+            messagebox.showerror("Error", f"Error al generar reportes: {str(e)}", parent=self.root)
+            return
+        
+        self.fill_tree(self.monthly_tree, [
+            (MESES[fila['mes'] - 1], fila['pagos'], f"${fila['total']:.2f}") for fila in mensual
+        ])
+        self.fill_tree(self.daily_tree, [
+            (fila['fecha'], fila['pagos'], f"${fila['total']:.2f}") for fila in diario
+        ])
+        self.fill_tree(self.concepts_tree, [
+            (fila['concepto'], fila['cantidad'], f"${fila['total']:.2f}") for fila in conceptos
+        ])
+        
+        esperados_por_mes = cobranza['esperados_por_mes']
+        self.fill_tree(self.collection_tree, [
+            (MESES[m - 1], f"{pagados} de {esperados_por_mes[m]}",
+             f"{pagados / esperados_por_mes[m]:.0%}" if esperados_por_mes[m] else "-")
+            for m, pagados in sorted(cobranza['por_mes'].items())
+        ])
+        
+        self.load_delinquents()
+        
+        total_anio = sum(fila['total'] for fila in mensual)
+        self.summary_label.config(
+            text=f"Ingresos {anio}: ${total_anio:.2f}   •   "
+                 f"Cobranza {anio}: {cobranza['tasa']:.1%} "
+                 f"({cobranza['meses_pagados']} de {cobranza['meses_esperados']} mensualidades)"
+        )
+
+    
+    def load_delinquents(self):
+        """Calcula los adeudos entre el año inicial y el año del período"""
+        try:
+            anio_inicio = int(self.from_year_var.get())
+            anio_fin = int(self.year_var.get())
+            self.delinquents = self.delinquency.calcular(
+                anio_inicio, anio_fin, desde_alta=self.since_signup_var.get())
+        except (tk.TclError, ValueError) as e:
+            messagebox.showerror("Error", f"Rango de años inválido: {str(e)}", parent=self.root)
+            return
+        except Exception as e:
+            messagebox.showerror("Error", f"Error al calcular adeudos: {str(e)}", parent=self.root)
+            return
+        
+        self.fill_tree(self.delinquents_tree, [
+            (u['numero'], u['nombre'], u['meses_adeudados'], f"${u['monto']:.2f}",
+             describir_adeudos(u['adeudos']))
+            for u in self.delinquents
+        ])
+    
+    def selected_payment_ids(self) -> List[int]:
+        """IDs de los pagos de los días seleccionados, o de todo el mes del período"""
+        db = get_db_manager()
+        dias = [self.daily_tree.item(item, 'values')[0] for item in self.daily_tree.selection()]
+        if not dias:
+            inicio, fin = _rango_fechas(int(self.year_var.get()), MESES.index(self.month_var.get()) + 1)
+            return db.obtener_ids_pagos_periodo(inicio, fin)
+        
+        pago_ids = []
+        for dia in sorted(dias):
+            siguiente = (datetime.strptime(dia, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+            pago_ids.extend(db.obtener_ids_pagos_periodo(dia, siguiente))
+        return pago_ids
+    
+    def print_receipts(self):
+        """
+        Imprime los recibos del período como un solo trabajo
+        
+        El PDF se genera en otro hilo; el resultado llega por
+        self.print_results y se envía a la impresora desde check_print.
+        """
+        try:
+            pago_ids = self.selected_payment_ids()
+        except (tk.TclError, ValueError) as e:
+            messagebox.showerror("Error", f"Período inválido: {str(e)}", parent=self.root)
+            return
+        
+        if not pago_ids:
+            messagebox.showinfo("Sin datos", "No hay pagos en el período seleccionado", parent=self.root)
+            return
+        
+        formato = next(clave for clave, descripcion in FORMATOS_LOTE.items()
+                       if descripcion == self.print_format_var.get())
+        
+        def generar():
+            try:
+                self.print_results.put((get_receipt_generator().generate_batch_pdf(pago_ids, formato), None))
+            except Exception as e:
+                self.print_results.put((None, str(e)))
+        
+        self.print_btn.config(state='disabled', text=f"Generando {len(pago_ids)} recibos...")
+        threading.Thread(target=generar, daemon=True).start()
+        self.root.after(100, self.check_print)
+    
+    def check_print(self):
+        """Envía a la impresora el PDF terminado en segundo plano"""
+        try:
+            if not self.root.winfo_exists():
+                return
+        except tk.TclError:
+            return
+        
+        try:
+            filepath, error = self.print_results.get_nowait()
+        except queue.Empty:
+            self.root.after(100, self.check_print)
+            return
+        
+        self.print_btn.config(state='normal', text="Imprimir Recibos")
+        if not filepath:
+            messagebox.showerror("Error", f"No se pudieron generar los recibos: {error or 'ver el registro'}",
+                                 parent=self.root)
+        elif not get_receipt_generator().print_receipt(filepath):
+            messagebox.showwarning("Impresión", f"No se pudo enviar a la impresora. Recibos guardados en:\n{filepath}",
+                                   parent=self.root)
+    
+    def export_delinquents_csv(self):
+        """Guarda la lista de morosos en un archivo CSV"""
+        self.export_delinquents("CSV", ".csv", self.delinquency.exportar_csv)
+    
+    def export_delinquents_pdf(self):
+        """Guarda la lista de morosos en un archivo PDF"""
+        self.export_delinquents("PDF", ".pdf", self.delinquency.exportar_pdf)
+    
+    def export_delinquents(self, tipo: str, extension: str, exportar):
+        """Pide la ruta del archivo y exporta la lista de morosos"""
+        if not self.delinquents:
+            messagebox.showinfo("Sin datos", "No hay usuarios con adeudos en el rango", parent=self.root)
+            return
+        
+        ruta = filedialog.asksaveasfilename(
+            parent=self.root,
+            title=f"Exportar morosos a {tipo}",
+            defaultextension=extension,
+            initialfile=f"morosos_{self.from_year_var.get()}_{self.year_var.get()}{extension}",
+            filetypes=[(f"Archivos {tipo}", f"*{extension}"), ("Todos los archivos", "*.*")]
+        )
+        if not ruta:
+            return
+        
+        try:
+            exportar(self.delinquents, ruta)
+            messagebox.showinfo("Exportación completa", f"Archivo guardado en:\n{ruta}", parent=self.root)
+        except Exception as e:
+            messagebox.showerror("Error", f"Error al exportar: {str(e)}", parent=self.root)
+
+
+def main():
+    """Función principal para probar el módulo"""
+    root = tk.Tk()
+    root.withdraw()  # Ocultar la ventana principal
+    
+    app = ReportsWindow()
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
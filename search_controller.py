@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Búsqueda mientras se escribe para las ventanas de Tk
+
+La búsqueda espera a que el usuario deje de teclear, se ejecuta fuera del
+hilo de la interfaz y descarta los resultados que ya no corresponden al
+texto actual. Si el texto nuevo solo agrega caracteres al anterior, se
+filtran en memoria los resultados previos en lugar de volver a buscar.
+"""
+
+import queue
+import threading
+import tkinter as tk
+from typing import Callable, Hashable, List, Optional
+from database import normalizar_texto
+
+# Espera tras la última tecla antes de buscar, en milisegundos
+RETRASO_BUSQUEDA_MS = 250
+
+# Intervalo para revisar si terminó una búsqueda en segundo plano
+INTERVALO_REVISION_MS = 30
+
+
+class DebouncedSearch:
+    """
+    Controlador de búsqueda con espera, cancelación y refinamiento incremental
+    
+    Ejemplo:
+        busqueda = DebouncedSearch(self.root, buscar, mostrar, refinar=refinar)
+        entry.bind('<KeyRelease>', lambda e: busqueda.solicitar(var.get()))
+    """
+    
+    def __init__(self, root: tk.Misc, buscar: Callable[[str, Hashable], List],
+                 mostrar: Callable[[str, List], None],
+                 refinar: Optional[Callable[[List, str, Hashable], List]] = None,
+                 retraso_ms: int = RETRASO_BUSQUEDA_MS):
+        """
+        Args:
+            root: Ventana en cuyo ciclo de eventos se programan las búsquedas
+            buscar: Función (texto, contexto) -> resultados; corre en otro
+                hilo, así que no debe tocar widgets
+            mostrar: Función (texto, resultados) llamada en el hilo de la interfaz
+            refinar: Función (resultados previos, texto, contexto) -> resultados
+                para filtrar en memoria cuando el texto solo creció
+            retraso_ms: Espera tras la última tecla antes de buscar
+        """
+        self.root = root
+        self.buscar = buscar
+        self.mostrar = mostrar
+        self.refinar = refinar
+        self.retraso_ms = retraso_ms
+        
+        self.generacion = 0  # Aumenta con cada búsqueda; descarta las anteriores
+        self._pendiente = None  # Búsqueda programada con root.after
+        self._revision = None  # Revisión programada de resultados
+        self._en_curso = 0  # Búsquedas corriendo en segundo plano
+        self._resultados = queue.Queue()
+        self._ultima = None  # (texto, contexto, resultados) de la última búsqueda mostrada
+    
+    def solicitar(self, texto: str, contexto: Hashable = None):
+        """
+        Programa una búsqueda; reinicia la espera si ya había una programada
+        
+        Args:
+            texto: Texto a buscar
+            contexto: Otros filtros (p. ej. el estado); el refinamiento en
+                memoria solo se usa si no cambiaron
+        """
+        if self._pendiente is not None:
+            self.root.after_cancel(self._pendiente)
+        self._pendiente = self.root.after(self.retraso_ms, self._ejecutar, texto, contexto)
+    
+    def cancelar(self):
+        """Cancela la búsqueda programada y descarta las que estén en curso"""
+        if self._pendiente is not None:
+            self.root.after_cancel(self._pendiente)
+            self._pendiente = None
+        self.generacion += 1
+    
+    def invalidar(self):
+        """Cancela y olvida los últimos resultados (p. ej. tras modificar datos)"""
+        self.cancelar()
+        self._ultima = None
+    
+    def _es_refinamiento(self, texto: str, contexto: Hashable) -> bool:
+        """Indica si el texto solo agrega caracteres a la última búsqueda mostrada"""
+        if self.refinar is None or self._ultima is None:
+            return False
+        
+        texto_anterior, contexto_anterior, _ = self._ultima
+        return (contexto == contexto_anterior and
+                normalizar_texto(texto).strip().startswith(normalizar_texto(texto_anterior).strip()))
+    
+    def _ventana_activa(self) -> bool:
+        """Indica si la ventana sigue abierta"""
+        try:
+            return bool(self.root.winfo_exists())
+        except tk.TclError:
+            return False
+    
+    def _ejecutar(self, texto: str, contexto: Hashable):
+        """Inicia la búsqueda programada"""
+        self._pendiente = None
+        if not self._ventana_activa():
+            return
+        
+        self.generacion += 1
+        generacion = self.generacion
+        
+        if self._es_refinamiento(texto, contexto):
+            try:
+                resultados = self.refinar(self._ultima[2], texto, contexto)
+            except Exception as e:
+                print(f"Error al refinar la búsqueda: {e}")
+            else:
+                self._entregar(generacion, texto, contexto, resultados)
+                return
+        
+        self._en_curso += 1
+        threading.Thread(
+            target=self._buscar_en_hilo, args=(generacion, texto, contexto), daemon=True
+        ).start()
+        
+        if self._revision is None:
+            self._revision = self.root.after(INTERVALO_REVISION_MS, self._revisar)
+    
+    def _buscar_en_hilo(self, generacion: int, texto: str, contexto: Hashable):
+        """Ejecuta la búsqueda fuera del hilo de la interfaz"""
+        try:
+            resultados, error = self.buscar(texto, contexto), None
+        except Exception as e:
+            resultados, error = None, e
+        self._resultados.put((generacion, texto, contexto, resultados, error))
+    
+    def _revisar(self):
+        """Muestra los resultados terminados, si siguen vigentes"""
+        self._revision = None
+        if not self._ventana_activa():
+            return
+        
+        try:
+            while True:
+                generacion, texto, contexto, resultados, error = self._resultados.get_nowait()
+                self._en_curso -= 1
+                if error is not None:
+                    print(f"Error en la búsqueda: {error}")
+                else:
+                    self._entregar(generacion, texto, contexto, resultados)
+        except queue.Empty:
+            pass
+        
+        if self._en_curso:
+            self._revision = self.root.after(INTERVALO_REVISION_MS, self._revisar)
+    
+    def _entregar(self, generacion: int, texto: str, contexto: Hashable, resultados: List):
+        """Muestra los resultados si corresponden a la búsqueda más reciente"""
+        if generacion != self.generacion:
+            return
+        
+        self._ultima = (texto, contexto, resultados)
+        self.mostrar(texto, resultados)
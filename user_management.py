@@ -7,7 +7,8 @@ Módulo de gestión de usuarios para el sistema de agua potable
 import tkinter as tk
 from tkinter import ttk, messagebox
 from database import get_db_manager
-from typing import Dict, List, Optional
+from search_controller import DebouncedSearch
+from typing import Dict, List, Optional, Tuple
 
 class UserManagementWindow:
     def __init__(self, parent=None):
@@ -29,6 +30,10 @@ class UserManagementWindow:
         # Configurar la interfaz
         self.setup_ui()
         
+        # Búsqueda mientras se escribe
+        self.user_search = DebouncedSearch(self.root, self.search_users, self.show_users,
+                                           refinar=self.narrow_users)
+        
         # Cargar datos iniciales
         self.refresh_users_list()
     
@@ -294,50 +299,75 @@ class UserManagementWindow:
         close_btn.pack(side=tk.RIGHT)
     
     def refresh_users_list(self):
-        """Actualiza la lista de usuarios"""
+        """Actualiza la lista de usuarios de inmediato (p. ej. tras guardar cambios)"""
+        if hasattr(self, 'user_search'):
+            self.user_search.invalidar()
+        
         try:
-            db = get_db_manager()
-            
-            # Obtener filtros
-            search_number = self.search_number_var.get().strip() if hasattr(self, 'search_number_var') else ""
-            search_name = self.search_name_var.get().strip() if hasattr(self, 'search_name_var') else ""
-            status_filter = self.status_filter_var.get() if hasattr(self, 'status_filter_var') else "Todos"
-            
-            # Obtener usuarios
-            if search_number:
-                try:
-                    numero = int(search_number)
-                    user = db.buscar_usuario_por_numero(numero)
-                    self.users_data = [user] if user else []
-                except ValueError:
-                    self.users_data = []
-            elif search_name:
-                self.users_data = db.buscar_usuarios_por_nombre(search_name)
-            else:
-                self.users_data = db.obtener_todos_usuarios()
-            
-            # Aplicar filtro de estado
-            if status_filter != "Todos":
-                self.users_data = [user for user in self.users_data if user['estado'] == status_filter]
-            
-            # Limpiar el Treeview
-            for item in self.users_tree.get_children():
-                self.users_tree.delete(item)
-            
-            # Llenar el Treeview
-            for user in self.users_data:
-                self.users_tree.insert('', 'end', values=(
-                    user['numero'],
-                    user['nombre'],
-                    user['estado']
-                ))
-                
+            search_number, search_name, estado = self.get_search_filters()
+            self.show_users(search_name, self.search_users(search_name, (search_number, estado)))
         except Exception as e:
             messagebox.showerror("Error", f"Error al cargar usuarios: {str(e)}")
     
+    def get_search_filters(self) -> Tuple[str, str, Optional[str]]:
+        """Obtiene el número, el nombre y el estado buscados"""
+        search_number = self.search_number_var.get().strip() if hasattr(self, 'search_number_var') else ""
+        search_name = self.search_name_var.get().strip() if hasattr(self, 'search_name_var') else ""
+        status_filter = self.status_filter_var.get() if hasattr(self, 'status_filter_var') else "Todos"
+        return search_number, search_name, None if status_filter == "Todos" else status_filter
+    
+    def search_users(self, search_name: str, filtros: Tuple[str, Optional[str]]) -> List[Dict]:
+        """
+        Busca usuarios en el directorio en memoria
+        
+        Puede correr fuera del hilo de la interfaz, así que no toca widgets.
+        
+        Args:
+            search_name: Nombre buscado
+            filtros: Tupla (número buscado, estado o None)
+        """
+        search_number, estado = filtros
+        directorio = get_db_manager().directorio_usuarios()
+        
+        if search_number:
+            try:
+                user = directorio.obtener_por_numero(int(search_number))
+            except ValueError:
+                return []
+            return [user] if user and (estado is None or user['estado'] == estado) else []
+        elif search_name:
+            return directorio.buscar(search_name, estado=estado)
+        else:
+            return directorio.todos(estado=estado)
+    
+    def narrow_users(self, users: List[Dict], search_name: str,
+                     filtros: Tuple[str, Optional[str]]) -> List[Dict]:
+        """Filtra en memoria la búsqueda anterior cuando el nombre solo creció"""
+        search_number, estado = filtros
+        if search_number:
+            return users  # La búsqueda por número no depende del nombre
+        return get_db_manager().directorio_usuarios().refinar(users, search_name, estado=estado)
+    
+    def show_users(self, search_name: str, users: List[Dict]):
+        """Muestra los usuarios encontrados"""
+        self.users_data = users
+        
+        # Limpiar el Treeview
+        for item in self.users_tree.get_children():
+            self.users_tree.delete(item)
+        
+        # Llenar el Treeview
+        for user in self.users_data:
+            self.users_tree.insert('', 'end', values=(
+                user['numero'],
+                user['nombre'],
+                user['estado']
+            ))
+    
     def on_search_change(self, event=None):
         """Maneja los cambios en los campos de búsqueda"""
-        self.refresh_users_list()
+        search_number, search_name, estado = self.get_search_filters()
+        self.user_search.solicitar(search_name, (search_number, estado))
     
     def clear_search(self):
         """Limpia los campos de búsqueda"""
@@ -487,7 +517,9 @@ class UserManagementWindow:
         
         try:
             db = get_db_manager()
-            pagos = db.obtener_historial_pagos_usuario(self.current_user['id'])
+            pagos = db.obtener_historial_pagos_usuario(
+                self.current_user['id'], limit=PaymentHistoryWindow.PAGE_SIZE
+            )
             
             # Crear ventana de historial
             PaymentHistoryWindow(self.root, self.current_user, pagos)
@@ -651,6 +683,9 @@ class NewUserDialog:
 
 
 class PaymentHistoryWindow:
+    # Pagos cargados por página; los más antiguos se piden bajo demanda
+    PAGE_SIZE = 50
+    
     def __init__(self, parent, user: Dict, payments: List[Dict]):
         self.root = tk.Toplevel(parent)
         self.root.title(f"Historial de Pagos - {user['nombre']}")
@@ -658,9 +693,10 @@ class PaymentHistoryWindow:
         self.root.transient(parent)
         
         self.user = user
-        self.payments = payments
+        self.payments = []
         
         self.setup_ui()
+        self.add_payments(payments)
     
     def setup_ui(self):
         """Configura la interfaz del historial"""
@@ -677,27 +713,56 @@ class PaymentHistoryWindow:
         )
         title_label.pack(pady=(0, 10))
         
+        # Botones inferiores (se empaquetan antes que la lista para que
+        # siempre queden visibles)
+        buttons_frame = tk.Frame(main_frame)
+        buttons_frame.pack(side=tk.BOTTOM, fill=tk.X, pady=(10, 0))
+        
+        # Botón para cargar la siguiente página de pagos antiguos
+        self.load_more_btn = tk.Button(
+            buttons_frame,
+            text="Cargar pagos anteriores",
+            command=self.load_more,
+            bg='#3498db',
+            fg='white',
+            font=('Arial', 11)
+        )
+        
+        # Botón cerrar
+        close_btn = tk.Button(
+            buttons_frame,
+            text="Cerrar",
+            command=self.root.destroy,
+            bg='#95a5a6',
+            fg='white',
+            font=('Arial', 11)
+        )
+        close_btn.pack(side=tk.RIGHT)
+        
         # Lista de pagos
         columns = ('fecha', 'total', 'detalles')
-        tree = ttk.Treeview(main_frame, columns=columns, show='headings', height=20)
+        self.tree = ttk.Treeview(main_frame, columns=columns, show='headings', height=20)
         
-        tree.heading('fecha', text='Fecha')
-        tree.heading('total', text='Total')
-        tree.heading('detalles', text='Detalles')
+        self.tree.heading('fecha', text='Fecha')
+        self.tree.heading('total', text='Total')
+        self.tree.heading('detalles', text='Detalles')
         
-        tree.column('fecha', width=150)
-        tree.column('total', width=100, anchor='center')
-        tree.column('detalles', width=400)
+        self.tree.column('fecha', width=150)
+        self.tree.column('total', width=100, anchor='center')
+        self.tree.column('detalles', width=400)
         
         # Scrollbar
-        scrollbar = ttk.Scrollbar(main_frame, orient=tk.VERTICAL, command=tree.yview)
-        tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar = ttk.Scrollbar(main_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
         
-        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+    
+    def add_payments(self, payments: List[Dict]):
+        """Agrega una página de pagos al final de la lista"""
+        self.payments.extend(payments)
         
-        # Llenar con datos
-        for pago in self.payments:
+        for pago in payments:
             fecha = pago['fecha_pago'][:16] if pago['fecha_pago'] else 'N/A'  # Solo fecha y hora
             total = f"${pago['total']:.2f}"
             
@@ -711,18 +776,32 @@ class PaymentHistoryWindow:
             
             detalles_str = ", ".join(detalles)
             
-            tree.insert('', 'end', values=(fecha, total, detalles_str))
+            self.tree.insert('', 'end', values=(fecha, total, detalles_str))
         
-        # Botón cerrar
-        close_btn = tk.Button(
-            main_frame,
-            text="Cerrar",
-            command=self.root.destroy,
-            bg='#95a5a6',
-            fg='white',
-            font=('Arial', 11)
-        )
-        close_btn.pack(pady=(10, 0))
+        # Una página incompleta indica que ya no hay pagos más antiguos
+        if len(payments) < self.PAGE_SIZE:
+            self.load_more_btn.pack_forget()
+        else:
+            self.load_more_btn.pack(side=tk.LEFT)
+    
+    def load_more(self):
+        """Carga la siguiente página de pagos más antiguos"""
+        if not self.payments:
+            return
+        
+        try:
+            ultimo = self.payments[-1]
+            db = get_db_manager()
+            pagos = db.obtener_historial_pagos_usuario(
+                self.user['id'],
+                limit=self.PAGE_SIZE,
+                before_date=ultimo['fecha_pago'],
+                before_id=ultimo['id']
+            )
+            self.add_payments(pagos)
+            
+        except Exception as e:
+            messagebox.showerror("Error", f"Error al obtener historial: {str(e)}")
     
     # === FUNCIONES DE NAVEGACIÓN ===
     